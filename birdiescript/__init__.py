@@ -10,6 +10,7 @@ from __future__ import (absolute_import, division, generators, nested_scopes,
 from .__version__ import *
 from .core import *
 from .builtins import *
+from .api import BScript, BResult, compile
 
 __author__ = 'Remy Oukaour'
 __copyright__ = 'Copyright 2014 Remy Oukaour.'
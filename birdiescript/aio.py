@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Run Birdiescript scripts in an asyncio event loop.
+
+    >>> import asyncio, birdiescript.aio
+    >>> run = birdiescript.aio.run('>n 0.5Sp`!`+', stdin='hi')
+    >>> asyncio.get_event_loop().run_until_complete(run).stack
+    [`hi!`]
+
+Scripts run on the resumable engine, so any number of them can share one
+thread. Each gives control back to the event loop every few tokens, and
+whenever it reads input, sleeps, runs a command, or reads a file or URL.
+Standard input may be a string or an asyncio.StreamReader. Cancelling the
+task stops the script between two tokens.
+
+This module needs Python 3.5 or later, so the package does not import it.
+"""
+
+
+#################### Imports ####################
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import shlex      # split
+import codecs     # getincrementaldecoder
+import asyncio    # sleep, create_subprocess_exec, StreamReader, get_event_loop
+import functools  # partial
+import subprocess # PIPE
+
+from .core import *
+from .api import BScript
+from .runner import exit_status
+from .engine import perform as perform_blocking, flatten, execute_steps
+
+
+#################### Settings ####################
+
+# Tokens a script runs before giving control back to the event loop
+yield_every = 100
+
+# Bytes read from an input stream at a time
+read_size = 4096
+
+
+#################### Requests ####################
+
+class BAsyncInput(object):
+	"""Text read from an asyncio.StreamReader and decoded incrementally."""
+
+	def __init__(self, reader, encoding='utf-8'):
+		self.reader = reader
+		self.decoder = codecs.getincrementaldecoder(encoding)('replace')
+		self.buffer = ''
+		self.eof = False
+
+	async def fill(self):
+		data = await self.reader.read(read_size)
+		self.eof = not data
+		self.buffer += self.decoder.decode(data, self.eof)
+
+	async def read(self, n=-1):
+		while not self.eof and (n < 0 or len(self.buffer) < n):
+			await self.fill()
+		if n < 0:
+			n = len(self.buffer)
+		(rv, self.buffer) = (self.buffer[:n], self.buffer[n:])
+		return rv
+
+	async def readline(self):
+		while not self.eof and '\n' not in self.buffer:
+			await self.fill()
+		n = self.buffer.find('\n') + 1 or len(self.buffer)
+		(rv, self.buffer) = (self.buffer[:n], self.buffer[n:])
+		return rv
+
+async def run_command(cmd, env=None):
+	"""Run a system command like the >x builtin, without blocking."""
+	try:
+		process = await asyncio.create_subprocess_exec(*shlex.split(cmd),
+			stdout=subprocess.PIPE, env=env)
+	except EnvironmentError as ex:
+		return BInt(ex.errno)
+	except asyncio.CancelledError:
+		raise
+	except Exception:
+		return BInt(-1)
+	try:
+		(rv, _) = await process.communicate()
+	except BaseException:
+		if process.returncode is None:
+			process.kill()
+		raise
+	if process.returncode:
+		return BInt(-process.returncode)
+	return BStr(rv)
+
+async def perform(request, stdin):
+	"""Carry out a request without blocking the event loop."""
+	if request.kind == 'read' and isinstance(stdin, BAsyncInput):
+		return await stdin.read(*request.args)
+	elif request.kind == 'readline' and isinstance(stdin, BAsyncInput):
+		return await stdin.readline()
+	elif request.kind == 'sleep' and request.args[0] >= 0:
+		await asyncio.sleep(*request.args)
+	elif request.kind == 'exec':
+		return await run_command(*request.args)
+	elif request.kind == 'call':
+		loop = asyncio.get_event_loop()
+		return await loop.run_in_executor(None, functools.partial(
+			*request.args))
+	else:
+		# Reads from a string, and invalid sleeps, do not wait
+		return perform_blocking(request, stdin)
+
+
+#################### Running scripts ####################
+
+async def run(script, stdin='', argv=(), stack=(), stdout=None,
+	encoding='utf-8', printstack=False, seed=None):
+	"""
+	Run a script, compiled or as source, like BScript.run(), and return a
+	BResult. Standard input may also be an asyncio.StreamReader.
+	"""
+	if not isinstance(script, BScript):
+		script = BScript(script)
+	reader = None
+	if isinstance(stdin, asyncio.StreamReader):
+		(reader, stdin) = (BAsyncInput(stdin, encoding), '')
+	(context, output) = script.context(stdin, argv, stack, stdout, encoding,
+		seed)
+	reader = reader or context.reader()
+	steps = flatten(execute_steps(context, printstack))
+	(reply, ticks, status) = (None, 0, 0)
+	try:
+		while True:
+			try:
+				item = steps.send(reply)
+			except StopIteration:
+				break
+			reply = None
+			if item is not None:
+				reply = await perform(item, reader)
+				continue
+			ticks += 1
+			if ticks >= yield_every:
+				ticks = 0
+				await asyncio.sleep(0)
+	except SystemExit as ex:
+		status = exit_status(ex)
+	finally:
+		steps.close()
+	return script.result(context, output, status)
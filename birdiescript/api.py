@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Embed Birdiescript in Python programs.
+
+A script is tokenized once by compile(), and can then be run any number of
+times with its own standard input, arguments and initial stack:
+
+    >>> import birdiescript
+    >>> script = birdiescript.compile('>m>m+')
+    >>> result = script.run(stdin='3 4')
+    >>> result.stack
+    [7]
+
+Output is collected in the result, or written to a given stream. Each run
+has its own random number generator, and its environment variable changes
+stay within the run, so independent scripts can run concurrently in
+threads. Runs do not touch sys.stdin, sys.stdout or os.environ.
+"""
+
+
+#################### Imports ####################
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import io # StringIO
+
+from .core import *
+from .runner import BOutput, exit_status
+
+
+#################### Compiled scripts ####################
+
+class BResult(object):
+	"""The final stack, output and exit status of a script run."""
+
+	def __init__(self, stack, output, status):
+		self.stack = stack
+		self.output = output
+		self.status = status
+
+	def __repr__(self):
+		return 'BResult({!r}, {!r}, {!r})'.format(self.stack, self.output,
+			self.status)
+
+class BScript(object):
+	"""A tokenized script that can be run repeatedly."""
+
+	def __init__(self, source, filename=''):
+		self.source = source
+		self.filename = filename
+		self.tokens = BContext.tokenized(source)
+
+	def __repr__(self):
+		return 'BScript({!r})'.format(self.source)
+
+	def context(self, stdin='', argv=(), stack=(), stdout=None,
+		encoding='utf-8', seed=None):
+		"""
+		Return a fresh context with an isolated state to run the script in,
+		and the sink that collects its output, or None if it writes to a
+		given stream.
+		"""
+		if not hasattr(stdin, 'read'):
+			stdin = io.StringIO(stdin)
+		output = None
+		if stdout is None:
+			output = stdout = BOutput(encoding)
+		state = BState.isolated(seed, stdin, stdout)
+		context = BContext(self.source, encoding, state=state)
+		context.tokens = list(self.tokens)
+		predefine_variables(context, self.filename, self.source, list(argv))
+		context.stack = [BType.from_python(x) for x in stack]
+		return (context, output)
+
+	def result(self, context, output, status):
+		"""Return the BResult of a run in a context from context()."""
+		if output is not None:
+			output = output.getvalue()
+		return BResult(context.stack, output, status)
+
+	def run(self, stdin='', argv=(), stack=(), stdout=None, encoding='utf-8',
+		printstack=False, seed=None):
+		"""
+		Run the script and return a BResult. Standard input may be a string
+		or a readable stream. The initial stack may hold Birdiescript or
+		Python values. If stdout is a writable stream, output is written to
+		it instead of being collected in the result. The random number
+		generator is seeded with seed, or from the system if it is None.
+
+		Errors in the script are raised as exceptions; if the script exits,
+		its exit status is recorded in the result.
+		"""
+		(context, output) = self.context(stdin, argv, stack, stdout,
+			encoding, seed)
+		status = 0
+		try:
+			context.execute(printstack=printstack)
+		except SystemExit as ex:
+			status = exit_status(ex)
+		return self.result(context, output, status)
+
+def compile(source, filename=''):
+	"""Tokenize a script once, for running with BScript.run()."""
+	return BScript(source, filename)
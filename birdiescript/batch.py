@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+Run many Birdiescript jobs in parallel worker processes.
+
+A manifest is a JSON Lines file with one job per line:
+
+    {"script": "sum.bs", "args": ["3"], "stdin": "in/1.txt",
+     "expected": "out/1.txt"}
+
+Only "script" is required. Paths are relative to the manifest. Each
+distinct script is read and tokenized once, and the jobs are fanned out to
+a process pool. A JSON Lines report with each job's output, exit status,
+timing and verdict is printed in manifest order.
+"""
+
+
+#################### Imports ####################
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import sys             # stdout, exit
+import os              # path
+import io              # open
+import json            # dumps, loads
+import time            # time
+import signal          # signal, setitimer, SIGALRM
+import multiprocessing # Pool, cpu_count
+
+from .core import *
+from .runner import run_captured
+
+
+#################### Manifests ####################
+
+def read_manifest(path):
+	"""Return the jobs in a manifest, with paths resolved against it."""
+	base = os.path.dirname(os.path.abspath(path))
+	def resolve(p):
+		return None if p is None else os.path.join(base, p)
+	jobs = []
+	with io.open(path, 'r', encoding='utf-8') as file:
+		for (n, line) in enumerate(file):
+			if not line.strip():
+				continue
+			entry = json.loads(line)
+			if 'script' not in entry:
+				msg = 'manifest line {}: missing script'.format(n + 1)
+				raise ValueError(msg)
+			jobs.append({
+				'index': len(jobs),
+				'script': resolve(entry['script']),
+				'args': [str(a) for a in entry.get('args', [])],
+				'stdin': resolve(entry.get('stdin', None)),
+				'expected': resolve(entry.get('expected', None)),
+			})
+	return jobs
+
+def compile_scripts(jobs, encoding):
+	"""
+	Read and tokenize each distinct script once. Scripts that cannot be read
+	or tokenized map to an error message instead.
+	"""
+	programs = {}
+	for job in jobs:
+		path = job['script']
+		if path in programs:
+			continue
+		try:
+			source = read_script(path, encoding)
+			programs[path] = (source, BContext.tokenized(source), None)
+		except Exception as ex:
+			programs[path] = (None, None, 'Error: {}\n'.format(ex))
+	return programs
+
+
+#################### Workers ####################
+
+class BJobTimeout(BaseException):
+	"""A batch job took too long."""
+	pass
+
+# Set in each worker process by init_worker
+worker_state = {}
+
+def job_alarm(signum, frame):
+	# Keep firing until the timeout escapes any bare except clauses
+	signal.setitimer(signal.ITIMER_REAL, 0.05)
+	raise BJobTimeout()
+
+def init_worker(programs, encoding, timeout):
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	worker_state['programs'] = programs
+	worker_state['encoding'] = encoding
+	worker_state['timeout'] = timeout
+	if timeout is not None:
+		signal.signal(signal.SIGALRM, job_alarm)
+
+def read_text(path, encoding):
+	if path is None:
+		return None
+	with io.open(path, 'r', encoding=encoding) as file:
+		return file.read()
+
+def job_inputs(job, encoding):
+	"""Return a job's standard input and expected output, if any."""
+	stdin = read_text(job['stdin'], encoding) or ''
+	expected = read_text(job['expected'], encoding)
+	return (stdin, expected)
+
+def job_result(job):
+	return {'index': job['index'], 'script': job['script'],
+		'args': job['args'], 'stdout': '', 'status': None, 'time': 0.0,
+		'timeout': False, 'passed': None}
+
+def failed_result(job, message):
+	result = job_result(job)
+	result['stdout'] = message
+	result['status'] = 1
+	return result
+
+def run_program(job, source, tokens, stdin, expected, encoding, timeout):
+	"""Run a job's script on its input, and return the job's result."""
+	result = job_result(job)
+	start = time.time()
+	try:
+		if timeout is not None:
+			signal.setitimer(signal.ITIMER_REAL, timeout)
+		try:
+			(result['stdout'], result['status']) = run_captured(
+				job['script'], source, job['args'], encoding, stdin,
+				tokens=tokens)
+		finally:
+			if timeout is not None:
+				signal.setitimer(signal.ITIMER_REAL, 0)
+	except BJobTimeout:
+		result['timeout'] = True
+	result['time'] = round(time.time() - start, 6)
+	if expected is not None:
+		result['passed'] = (not result['timeout'] and
+			result['stdout'] == expected)
+	return result
+
+def run_job(job):
+	programs = worker_state['programs']
+	encoding = worker_state['encoding']
+	timeout = worker_state['timeout']
+	(source, tokens, error) = programs[job['script']]
+	if error is None:
+		try:
+			(stdin, expected) = job_inputs(job, encoding)
+		except (IOError, OSError) as ex:
+			error = 'Error: {}\n'.format(ex)
+	if error is not None:
+		return failed_result(job, error)
+	return run_program(job, source, tokens, stdin, expected, encoding,
+		timeout)
+
+
+#################### Batch runs ####################
+
+def load_manifest(manifest):
+	"""Read a manifest's jobs, or print an error and exit."""
+	try:
+		return read_manifest(manifest)
+	except Exception as ex:
+		colors.set_colors(ALERT_COLORS)
+		print('Error: {}'.format(ex))
+		colors.set_colors(colors.DEFAULT_COLORS)
+		sys.exit(1)
+
+def report(result):
+	"""
+	Print a job's result, and return whether the job failed: it timed out,
+	did not produce its expected output, or had none to produce and exited
+	with an error, as it does if its script or input cannot be read.
+	"""
+	print(str(json.dumps(result, sort_keys=True)))
+	sys.stdout.flush()
+	return bool(result['timeout'] or result['passed'] is False or
+		result['passed'] is None and result['status'])
+
+def run_batch(manifest, encoding='utf-8', workers=None, timeout=None):
+	"""
+	Run every job in a manifest, print a JSON Lines report, and exit with
+	status 1 if any job failed.
+	"""
+	jobs = load_manifest(manifest)
+	programs = compile_scripts(jobs, encoding)
+	workers = workers or multiprocessing.cpu_count()
+	pool = multiprocessing.Pool(workers, init_worker,
+		(programs, encoding, timeout))
+	failed = False
+	try:
+		for result in pool.imap(run_job, jobs):
+			failed = report(result) or failed
+	except BaseException:
+		pool.terminate()
+		raise
+	else:
+		pool.close()
+	finally:
+		pool.join()
+	if failed:
+		sys.exit(1)
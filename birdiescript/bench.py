@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark builtins on large values.
+
+Each case is a script run on an initial stack of large values. It is timed,
+and its peak memory allocation is traced where the tracemalloc module is
+available (Python 3.4 and later). The values are built before the script
+runs, so only the work the script does is measured.
+"""
+
+
+#################### Imports ####################
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import sys    # stdout
+import time   # time
+import random # Random
+
+try:
+	import tracemalloc # start, stop, get_traced_memory
+except ImportError:
+	tracemalloc = None
+
+from .core import *
+from .api import BScript
+from . import fusion
+from .verify import BDiscard
+
+
+#################### Measuring ####################
+
+# Times each case is run; the fastest run is reported
+default_repeats = 3
+
+def measure(script, make_stack, repeats=default_repeats):
+	"""
+	Run a script on an initial stack from make_stack(); return its fastest
+	time in seconds, and its peak allocation in bytes, or None if it cannot
+	be traced.
+	"""
+	best = None
+	for _ in range(repeats):
+		stack = make_stack()
+		start = time.time()
+		script.run(stack=stack)
+		elapsed = time.time() - start
+		best = elapsed if best is None else min(best, elapsed)
+	peak = None
+	if tracemalloc is not None:
+		stack = make_stack()
+		tracemalloc.start()
+		try:
+			script.run(stack=stack)
+			(_, peak) = tracemalloc.get_traced_memory()
+		finally:
+			tracemalloc.stop()
+	return (best, peak)
+
+def describe(elapsed, peak):
+	if peak is None:
+		return '{:9.3f}ms'.format(1000 * elapsed)
+	return '{:9.3f}ms {:9.1f}KiB'.format(1000 * elapsed, peak / 1024)
+
+
+#################### Large strings ####################
+
+# Name, script, and the strings pushed after the large one
+string_cases = [
+	('Difference', '-', ['aeiou']),
+	('Unique', 'Q', []),
+	('Sort', 'S', []),
+	('Find', '{122=}F', []),
+	('First', '(', []),
+	('Last', ')', []),
+	('Get', '500[g', []),
+	('Set', '500 120[s', []),
+	('Delete', '500[d', []),
+	('Slice', '[1 1m 2]Ss', []),
+	('Translate', 'Y', ['abc', 'xyz']),
+	('Equal', ',=', []),
+	('Less', ',<', []),
+]
+
+def code_points(s):
+	return BList([BInt(ord(c)) for c in s])
+
+def strings(size, seed=None):
+	"""
+	Run each string case on a string of a number of characters, and on the
+	same characters as a list of code points, which is how strings were
+	handled before their builtins worked on them directly.
+	"""
+	rng = random.Random(seed)
+	alphabet = 'abcdefghijklmnopqrstuvwxyz '
+	text = ''.join(rng.choice(alphabet) for _ in range(size))
+	print('Strings of {} characters ({}):'.format(size, 'time, peak '
+		'allocation' if tracemalloc is not None else 'time'))
+	print('{:12} {:>22} {:>22}'.format('', 'string', 'code points'))
+	for (name, source, args) in string_cases:
+		script = BScript(source)
+		as_string = lambda: [BStr(text)] + [BStr(a) for a in args]
+		as_list = lambda: [code_points(text)] + [code_points(a) for a in args]
+		print('{:12} {:>22} {:>22}'.format(name,
+			describe(*measure(script, as_string)),
+			describe(*measure(script, as_list))))
+
+
+#################### Linear algebra ####################
+
+# Name, builtin, and the operands it takes: a matrix, a vector, or a number
+linalg_cases = [
+	('Product', '*m', ['matrix', 'matrix']),
+	('Power', '^m', ['matrix', 8]),
+	('Sum', '+m', ['matrix', 'matrix']),
+	('Hadamard', '*h', ['matrix', 'matrix']),
+	('Trace', 'Trc', ['matrix']),
+	('Identity', 'Id', ['size']),
+	('Vector sum', '+v', ['vector', 'vector']),
+	('Dot', '*d', ['vector', 'vector']),
+	('Outer', '*o', ['vector', 'vector']),
+	('L^1 norm', '#m', ['vector']),
+	('L^2 norm', '#v', ['vector']),
+	('L^3 norm', '#l', ['vector', 3]),
+]
+
+def linalg(size, seed=None):
+	"""
+	Run each linear algebra builtin on integer matrices of size by size
+	and vectors of size, natively and by its Birdiescript definition.
+	"""
+	rng = random.Random(seed)
+	def vector():
+		return [BInt(rng.randrange(-9, 10)) for _ in range(size)]
+	matrices = [BList([BList(vector()) for _ in range(size)])
+		for _ in range(2)]
+	vectors = [BList(vector()) for _ in range(2)]
+	print('Matrices of {0} by {0} and vectors of {0} ({1}):'.format(size,
+		'time, peak allocation' if tracemalloc is not None else 'time'))
+	print('{:12} {:>22} {:>22}'.format('', 'native', 'definition'))
+	for (name, builtin, operands) in linalg_cases:
+		def make_stack():
+			(m, v) = (iter(matrices), iter(vectors))
+			stack = []
+			for x in operands:
+				if x == 'matrix':
+					stack.append(next(m).copy())
+				elif x == 'vector':
+					stack.append(next(v).copy())
+				else:
+					stack.append(BInt(size if x == 'size' else x))
+			return stack
+		native = BScript(builtin)
+		definition = BScript(builtins[builtin].code)
+		print('{:12} {:>22} {:>22}'.format(name,
+			describe(*measure(native, make_stack)),
+			describe(*measure(definition, make_stack, 1))))
+
+
+#################### Chains ####################
+
+# Name, and a chain run on a number or on a list of that many numbers
+chain_cases = [
+	('Map sum', '{,*}|+s', 'number'),
+	('Map filter', '{,*}|{3%}&+s', 'number'),
+	('Filter fold', '{2%}&{+}*', 'list'),
+	('Four stages', '{1+}|{2%}&{,*}|+s', 'list'),
+	('Map each', '{2*}|{,}-', 'list'),
+]
+
+def chains(size, seed=None):
+	"""
+	Run each chain of higher-order builtins on a sequence of size numbers,
+	fused into one loop and stage by stage.
+	"""
+	rng = random.Random(seed)
+	numbers = BList([BInt(rng.randrange(size)) for _ in range(size)])
+	print('Chains over {} numbers ({}):'.format(size, 'time, peak '
+		'allocation' if tracemalloc is not None else 'time'))
+	print('{:12} {:>22} {:>22}'.format('', 'fused', 'stage by stage'))
+	for (name, source, operand) in chain_cases:
+		script = BScript(source)
+		if operand == 'number':
+			make_stack = lambda: [BInt(size)]
+		else:
+			make_stack = lambda: [numbers.copy()]
+		fused = describe(*measure(script, make_stack, 1))
+		fusion.enabled = False
+		try:
+			staged = describe(*measure(script, make_stack, 1))
+		finally:
+			fusion.enabled = True
+		print('{:12} {:>22} {:>22}'.format(name, fused, staged))
+
+
+#################### Ropes ####################
+
+# Name, script run on a string and a number, and whether the string is
+# empty or of that many characters
+rope_cases = [
+	('Append', "{'a+}*", 'empty'),
+	('Prepend', "{'a$+}*", 'empty'),
+	('Append, print', "{'a+}* p", 'empty'),
+	('Drop first', '{(;}*', 'full'),
+	('Drop last', '{);}*', 'full'),
+]
+
+# Plain strings are copied on every join, so they are only timed up to this
+# many characters
+plain_limit = 10**6
+
+def ropes(size, seed=None):
+	"""
+	Run each rope case on strings of size characters, built or taken apart
+	one character at a time, joined with ropes and as plain strings.
+	"""
+	rng = random.Random(seed)
+	alphabet = 'abcdefghijklmnopqrstuvwxyz '
+	text = ''.join(rng.choice(alphabet) for _ in range(size))
+	print('Strings of {} characters ({}):'.format(size, 'time, peak '
+		'allocation' if tracemalloc is not None else 'time'))
+	print('{:14} {:>22} {:>22}'.format('', 'rope', 'plain'))
+	for (name, source, operand) in rope_cases:
+		script = BScript(source)
+		if operand == 'empty':
+			with_rope = as_plain = lambda: [BStr(), BInt(size)]
+		else:
+			with_rope = lambda: [BRopeStr(rope=BRope.of(text)), BInt(size)]
+			as_plain = lambda: [BStr(text), BInt(size)]
+		roped = describe(*measure(script, with_rope, 1))
+		plain = '-'
+		if size <= plain_limit:
+			BRopeStr.enabled = False
+			try:
+				plain = describe(*measure(script, as_plain, 1))
+			finally:
+				BRopeStr.enabled = True
+		print('{:14} {:>22} {:>22}'.format(name, roped, plain))
+	point = crossover()
+	if point is None:
+		print('Appending to a rope is slower up to {} characters'.format(
+			crossover_limit))
+	else:
+		print('Appending to a rope is faster from about {} characters '
+			'(ropes are joined from {})'.format(point, BRopeStr.threshold))
+
+# Characters appended to a string of each length to compare ropes with plain
+# strings, and the longest length compared
+crossover_appends = 2000
+crossover_limit = 2**22
+
+def appending(s, join):
+	"""Return the fastest time to append characters to a string with join."""
+	best = None
+	for _ in range(default_repeats):
+		(x, c) = (s, BStr('a'))
+		start = time.time()
+		for _ in range(crossover_appends):
+			x = join(x, c)
+		elapsed = time.time() - start
+		best = elapsed if best is None else min(best, elapsed)
+	return best
+
+def crossover():
+	"""
+	Return the shortest length, doubling from one text chunk, at which
+	appending characters one at a time to a rope is faster than appending
+	them to a plain string, or None if it is slower up to the limit. Only
+	the joins are timed, since the rest of a script costs the same either
+	way.
+	"""
+	size = BRope.text_chunk_size
+	while size <= crossover_limit:
+		text = 'a' * size
+		roped = appending(BRopeStr(rope=BRope.of(text)), BRopeStr.joined)
+		plain = appending(BStr(text), lambda a, b: BStr(a.value + b.value))
+		if roped < plain:
+			return size
+		size *= 2
+	return None
+
+
+#################### Memoization ####################
+
+# Recursive Fibonacci, which is bound to F before it is called
+fibonacci = '{,2<{}{,(F$2-F+}I}'
+
+# Naive recursion takes exponential time, so it is only timed up to this
+# many numbers
+naive_limit = 20
+
+def memo(size):
+	"""
+	Compute Fibonacci numbers up to the size-th recursively, with a memoized
+	block and with a plain one.
+	"""
+	memoized = BScript(fibonacci + '1 0Mm:F;F')
+	naive = BScript(fibonacci + ':F;F')
+	print('Fibonacci numbers ({}):'.format('time, peak allocation'
+		if tracemalloc is not None else 'time'))
+	print('{:12} {:>22} {:>22}'.format('', 'memoized', 'naive'))
+	for n in sorted(set(max(1, size * i // 4) for i in range(1, 5))):
+		make_stack = lambda: [BInt(n)]
+		plain = '-'
+		if n <= naive_limit:
+			plain = describe(*measure(naive, make_stack, 1))
+		print('{:12} {:>22} {:>22}'.format('F({})'.format(n),
+			describe(*measure(memoized, make_stack)), plain))
+
+
+#################### Dispatch ####################
+
+# Name, and a block applied a number of times to the number 1
+dispatch_cases = [
+	('Increment', '{)}*'),
+	('Arithmetic', '{,*7%)}*'),
+	('Stack', '{..;;}*'),
+	('Variables', '{:X;X)}*'),
+	('Blocks', '{{)}_}*'),
+]
+
+class BTraced(object):
+	"""A script run through the trace path, with its tracing discarded."""
+	
+	def __init__(self, script):
+		self.script = script
+	
+	def run(self, stack=()):
+		(context, _) = self.script.context(stack=stack)
+		context.debug = True
+		stdout = sys.stdout
+		sys.stdout = BDiscard()
+		try:
+			context.execute()
+		finally:
+			sys.stdout = stdout
+
+def dispatch(size):
+	"""
+	Run each block size times through the dispatch loop and through the
+	trace path that --debug takes.
+	"""
+	print('Blocks applied {} times ({}):'.format(size, 'time, peak '
+		'allocation' if tracemalloc is not None else 'time'))
+	print('{:12} {:>22} {:>22}'.format('', 'dispatch', 'trace'))
+	for (name, source) in dispatch_cases:
+		script = BScript(source)
+		make_stack = lambda: [BInt(1), BInt(size)]
+		print('{:12} {:>22} {:>22}'.format(name,
+			describe(*measure(script, make_stack)),
+			describe(*measure(BTraced(script), make_stack, 1))))
+
+
+#################### Profiles ####################
+
+# Name, and a block applied a number of times to the number 1
+profile_cases = [
+	('Integers', '{3*1-7%}*'),
+	('Modulo', '{,*7%)}*'),
+	('Floats', '{.5 .5+;}*'),
+	('Compare', '{,3<;}*'),
+	('Mixed', '{1.5+.5-}*'),
+]
+
+class BProfiled(object):
+	"""A script run with a type profile of an earlier run of it."""
+	
+	def __init__(self, script, make_stack):
+		self.script = script
+		self.profile = BProfile()
+		self.run(make_stack())
+		self.profile.record = False
+	
+	def run(self, stack=()):
+		(context, _) = self.script.context(stack=stack)
+		self.profile.attach(context.tokens)
+		context.profile = self.profile
+		context.execute()
+
+def profiled(size):
+	"""
+	Run each block size times with builtins specialized by a type profile
+	recorded on an earlier run, and with the generic builtins.
+	"""
+	print('Blocks applied {} times ({}):'.format(size, 'time, peak '
+		'allocation' if tracemalloc is not None else 'time'))
+	print('{:12} {:>22} {:>22}'.format('', 'profiled', 'generic'))
+	for (name, source) in profile_cases:
+		script = BScript(source)
+		make_stack = lambda: [BInt(1), BInt(size)]
+		print('{:12} {:>22} {:>22}'.format(name,
+			describe(*measure(BProfiled(script, make_stack), make_stack)),
+			describe(*measure(script, make_stack))))
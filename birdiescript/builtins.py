@@ -10,10 +10,20 @@ from __future__ import (absolute_import, division, generators, nested_scopes,
 	print_function, unicode_literals, with_statement)
 
 from .core import *
+from .parallel import parallel_apply, parallel_search, candidate, is_pure
+from .combinatorics import (space_size, candidates, BCandidates,
+	BRepeatedCandidates, BProduct)
+from . import linalg
+from . import fusion
 
 
 #################### Utility functions ####################
 
+# Whether unfolds make streams, and builtins with definitions compute
+# natively where they can; the verifier turns these off
+lazy_unfolds = True
+natively = True
+
 def merge_flags(af, bf):
 	"""Return merged regex flags."""
 	flags = af | bf
@@ -27,7 +37,264 @@ def areinstances(objects, classes):
 	"""Return whether all of the objects are instances of the classes."""
 	return all(isinstance(obj, classes) for obj in objects)
 
-def signature(*types):
+def packed(*values):
+	"""Return whether all of the values are vectors with packed numbers."""
+	return all(isinstance(v, BVector) and v.packed is not None for v in values)
+
+def lazy(*values):
+	"""Return whether all of the values are lists with uncomputed items."""
+	return all(isinstance(v, BLazyList) and v.source is not None
+		for v in values)
+
+def roped(*values):
+	"""Return whether all of the values are lists backed by ropes."""
+	return all(isinstance(v, BRopeList) and v.rope is not None
+		for v in values)
+
+def snapshot(s):
+	"""
+	Iterate over the items a sequence has now, even if it is changed in place
+	meanwhile.
+	"""
+	if packed(s) or lazy(s) or roped(s):
+		# Their items are never changed in place
+		return s.elements()
+	return iter(s.simplify().value[:])
+
+def streaming(*values):
+	"""Return whether all of the values are streams with unproduced items."""
+	return all(isinstance(v, BStream) and v.source is not None
+		for v in values)
+
+def isolation(context):
+	"""
+	Return an isolation which applies functions above the top of the
+	context's stack as it is now, without defining their arguments in a
+	shared scope, for a stream to apply them to its items later.
+	"""
+	return fusion.BIsolation(context, context.stack, restoring=True)
+
+def isolated_result(f, isolation, *operands):
+	"""
+	Return the one value a function leaves when applied to operands on a
+	stack of their own. Raise a BTypeError if it leaves another number of
+	values or reaches below its operands, which a stream cannot reproduce
+	once its items are being asked for.
+	"""
+	try:
+		results = isolation.apply(f, *operands)
+	except fusion.BFusionFallback:
+		results = None
+	if results is None or len(results) != 1:
+		raise BTypeError(f, operands)
+	return results[0]
+
+def neutral(f, isolation, *operands):
+	"""
+	Return whether a function leaves one value when applied to operands on a
+	stack of their own, without reaching below them.
+	"""
+	try:
+		isolated_result(f, isolation, *operands)
+	except Exception:
+		return False
+	return True
+
+def shared(f):
+	"""Return whether a function defines its arguments in a shared scope."""
+	return isinstance(f, BBlock) and not f.scoped
+
+def lazily(f, s, context, results=1):
+	"""
+	Return whether a function can be applied to the items of a stream as
+	they are asked for, which is only done if it affects nothing but the
+	stack and the copies of the items it is applied to, so nothing else
+	happens out of order, and if on the first item it stays on a stack of
+	its own and leaves one value, or any number of them for a map, so it
+	cannot depend on what is below the stream.
+	"""
+	if not streaming(s) or not is_pure(f, context, copies=True):
+		return False
+	if not s.source.produce(s.start + 1):
+		return True
+	x = s.source.items[s.start].copy()
+	if results is None:
+		try:
+			isolation(context).apply(f, x)
+		except Exception:
+			return False
+		return True
+	return neutral(f, isolation(context), x)
+
+def unfolds_lazily(p, f, context):
+	"""
+	Return whether an unfold can make its values as they are asked for,
+	which is only done if its predicate and unspool functions affect
+	nothing but the stack and the copies of the values they are applied
+	to, and define their arguments in scopes of their own, as they would
+	otherwise be left with different ones, and on the seed value each
+	stays on a stack of its own and leaves one value.
+	"""
+	if (not lazy_unfolds or not context.stack or shared(p) or shared(f) or
+		not is_pure(p, context, copies=True) or
+		not is_pure(f, context, copies=True)):
+		return False
+	x = context.stack[-1]
+	return (neutral(p, isolation(context), x.copy()) and
+		neutral(f, isolation(context), x.copy()))
+
+def mapped(f, s, isolation):
+	"""
+	Iterate over the results of a function on copies of the items of a
+	sequence.
+	"""
+	for x in s.elements():
+		try:
+			results = isolation.apply(f, x.copy())
+		except fusion.BFusionFallback:
+			raise BTypeError(f, (x,))
+		for y in results:
+			yield y
+
+def filtered(f, s, isolation):
+	"""Iterate over the items of a sequence which pass a predicate."""
+	for x in s.elements():
+		if isolated_result(f, isolation, x.copy()):
+			yield x
+
+def dropped_while(f, s, isolation):
+	"""Iterate over the items of a sequence from the first to fail a test."""
+	xs = s.elements()
+	for x in xs:
+		if not isolated_result(f, isolation, x.copy()):
+			yield x
+			break
+	for x in xs:
+		yield x
+
+def unfolded(p, f, x, isolation):
+	"""
+	Iterate over a seed value and the values an unspool function makes
+	from it, while they pass a predicate, which is applied above the value
+	as an eager unfold would apply it.
+	"""
+	(below, depth) = (isolation.below, isolation.depth)
+	while True:
+		isolation.rebase(below + [x], depth + 1)
+		passed = isolated_result(p, isolation, x.copy())
+		isolation.rebase(below, depth)
+		if not passed:
+			return
+		yield x
+		x = isolated_result(f, isolation, x.copy())
+
+def iterated(f, x, isolation):
+	"""Iterate over a value and the results of applying a function again."""
+	while True:
+		yield x
+		x = isolated_result(f, isolation, x.copy())
+
+# The loops of the higher-order builtins, which their step versions in the
+# engine share: each pushes the operands of a function and yields it, for
+# the caller to apply before the loop goes on.
+
+def repeating(f, n, context):
+	"""Apply a function a number of times."""
+	for _ in range(n):
+		yield f
+
+def folding(f, s, context):
+	"""Fold a sequence with a binary function."""
+	xs = snapshot(s)
+	try:
+		context.push(next(xs))
+	except StopIteration:
+		raise IndexError('pop from empty list')
+	for x in xs:
+		context.push(x)
+		yield f
+
+def eaching(f, xs, context):
+	"""Apply a function to each item."""
+	for x in xs:
+		context.push(x)
+		yield f
+
+def mapping(f, xs, context, results):
+	"""Apply a function to each item, adding what it leaves to results."""
+	for x in xs:
+		n = len(context.stack)
+		context.push(x)
+		yield f
+		results.extend(context.pop_till(n))
+
+def filtering(f, xs, context, results):
+	"""Apply a predicate to each item, adding those that pass to results."""
+	for x in xs:
+		context.push(x)
+		yield f
+		if context.pop():
+			results.append(x)
+
+def upto(n):
+	"""Iterate over the integers in the interval [0, N) of a number."""
+	return (BInt(x) for x in range(int(n.simplify().value)))
+
+def apply_definition(self, context):
+	"""Apply the Birdiescript code that defines a builtin."""
+	if self.tokens is None:
+		self.tokens = BContext.tokenized(self.code)
+	context.apply_code(self.code, self.tokens)
+
+def native_or_code(self, context, f, arity, code=None):
+	"""
+	Replace a builtin's operands with the result of a native function of
+	them, or if it has none or fails on them, or they are not all on the
+	stack, apply code, or else the builtin's definition, to the stack as it
+	is instead.
+	"""
+	c = None
+	n = len(context.stack)
+	if natively and n >= arity:
+		try:
+			c = f(*context.stack[n-arity:])
+		except ArithmeticError:
+			pass
+	if c is not None:
+		context.pop_n(arity)
+		context.push(c)
+	elif code is None:
+		apply_definition(self, context)
+	else:
+		context.apply_code(code)
+
+def apply_keys(f, items, context):
+	"""Return the key a function gives for each item."""
+	keys = []
+	for x in items:
+		context.push(x)
+		f.apply(context)
+		keys.append(context.pop())
+	return keys
+
+def extreme_by(f, s, context, better, name):
+	"""
+	Return the item of a sequence with the extreme key a function gives,
+	streaming the items. An item replaces the extreme one so far if
+	better(its key, the extreme key); name is 'max' or 'min', for errors.
+	"""
+	(extreme, ek) = (None, None)
+	for x in s.elements():
+		context.push(x)
+		f.apply(context)
+		k = context.pop()
+		if extreme is None or better(k, ek):
+			(extreme, ek) = (x, k)
+	if extreme is None:
+		raise ValueError(name + '() arg is an empty sequence')
+	return extreme
+
+def signature(*types, **options):
 	"""
 	Return a decorator which allows a function to be decorated with a builtin.
 	
@@ -41,12 +308,18 @@ def signature(*types):
 		d = BInt(a.value // b.value)
 		m = BInt(a.value % b.value)
 		return (d, m)
+	
+	With state=True, the function is passed the interpreter's BState before
+	its arguments.
 	"""
 	arity = len(types)
+	stateful = options.get('state', False)
 	def decorator(func):
 		@functools.wraps(func)
 		def builtin_apply(self, context, looping=False):
 			def apply_with(args):
+				if stateful:
+					args = [context.state] + args
 				results = func(*args)
 				if isinstance(results, BType):
 					results = (results,)
@@ -146,10 +419,7 @@ def builtin_pop(a):
 @signature(_)
 def builtin_dup(a):
 	"""Modify the stack: ( a -- a a )."""
-	if isinstance(a, BBuiltin):
-		a2 = a
-	else:
-		a2 = type(a)(a.value)
+	a2 = a.copy()
 	return (a, a2)
 
 BBuiltin('″', 'Trip', code=',,', doc="""Modify the stack: ( a -- a a a ).""")
@@ -162,7 +432,7 @@ BBuiltin(',q', 'Qdup', code=r',\,It',
 @signature(_, _)
 def builtin_over(a, b):
 	"""Modify the stack: ( a b -- a b a )."""
-	a2 = type(a)(a.value)
+	a2 = a.copy()
 	return (a, b, a2)
 
 @BBuiltin('$', 'Swap', code='1@k')
@@ -190,7 +460,7 @@ def builtin_nip(a, b):
 @signature(_, _)
 def builtin_tuck(a, b):
 	"""Modify the stack: ( a b -- b a b )."""
-	b2 = type(b)(b.value)
+	b2 = b.copy()
 	return (b2, a, b)
 
 BBuiltin(',p', 'Dupbelow', code='?$', altcode='$,@',
@@ -206,16 +476,16 @@ BBuiltin(';t', 'Poptwo', code=';;',
 @signature(_, _)
 def builtin_2dup(a, b):
 	"""Modify the stack: ( a b -- a b a b )."""
-	b2 = type(b)(b.value)
-	a2 = type(a)(a.value)
+	b2 = b.copy()
+	a2 = a.copy()
 	return (a, b, a2, b2)
 
 @BBuiltin('?t', 'Overtwo', code='3?k3?k')
 @signature(_, _, _, _)
 def builtin_2over(a, b, c, d):
 	"""Modify the stack: ( a b c d -- a b c d a b )."""
-	b2 = type(b)(b.value)
-	a2 = type(a)(a.value)
+	b2 = b.copy()
+	a2 = a.copy()
 	return (a, b, c, d, a2, b2)
 
 @BBuiltin('$t', 'Swaptwo', code='3@k3@k')
@@ -246,8 +516,8 @@ def builtin_2nip(a, b, c, d):
 @signature(_, _, _, _)
 def builtin_2tuck(a, b, c, d):
 	"""Modify the stack: ( a b c d -- c d a b c d )."""
-	c2 = type(c)(c.value)
-	d2 = type(d)(d.value)
+	c2 = c.copy()
+	d2 = d.copy()
 	return (c2, d2, a, b, c, d)
 
 BBuiltin(',pt', 'Dupbelowtwo', code='?t$t',
@@ -263,9 +533,9 @@ BBuiltin(';h', 'Popthree', code=';;;',
 @signature(_, _, _)
 def builtin_3dup(a, b, c):
 	"""Modify the stack: ( a b c -- a b c a b c )."""
-	c2 = type(c)(c.value)
-	b2 = type(b)(b.value)
-	a2 = type(a)(a.value)
+	c2 = c.copy()
+	b2 = b.copy()
+	a2 = a.copy()
 	return (a, b, c, a2, b2, c2)
 
 BBuiltin(';f', 'Popfour', code=';;;;',
@@ -275,10 +545,10 @@ BBuiltin(';f', 'Popfour', code=';;;;',
 @signature(_, _, _, _)
 def builtin_4dup(a, b, c, d):
 	"""Modify the stack: ( a b c d -- a b c d a b c d )."""
-	d2 = type(d)(d.value)
-	c2 = type(c)(c.value)
-	b2 = type(b)(b.value)
-	a2 = type(a)(a.value)
+	d2 = d.copy()
+	c2 = c.copy()
+	b2 = b.copy()
+	a2 = a.copy()
 	return (a, b, c, d, a2, b2, c2, d2)
 
 BBuiltin(';v', 'Popfive', code=';;;;;',
@@ -288,11 +558,11 @@ BBuiltin(';v', 'Popfive', code=';;;;;',
 @signature(_, _, _, _, _)
 def builtin_5dup(a, b, c, d, e):
 	"""Modify the stack: ( a b c d e -- a b c d e a b c d e )."""
-	e2 = type(e)(e.value)
-	d2 = type(d)(d.value)
-	c2 = type(c)(c.value)
-	b2 = type(b)(b.value)
-	a2 = type(a)(a.value)
+	e2 = e.copy()
+	d2 = d.copy()
+	c2 = c.copy()
+	b2 = b.copy()
+	a2 = a.copy()
 	return (a, b, c, d, e, a2, b2, c2, d2, e2)
 
 BBuiltin(';x', 'Popsix', code=';;;;;;',
@@ -302,12 +572,12 @@ BBuiltin(';x', 'Popsix', code=';;;;;;',
 @signature(_, _, _, _, _, _)
 def builtin_6dup(a, b, c, d, e, f):
 	"""Modify the stack: ( a b c d e f -- a b c d e f a b c d e f )."""
-	f2 = type(f)(f.value)
-	e2 = type(e)(e.value)
-	d2 = type(d)(d.value)
-	c2 = type(c)(c.value)
-	b2 = type(b)(b.value)
-	a2 = type(a)(a.value)
+	f2 = f.copy()
+	e2 = e.copy()
+	d2 = d.copy()
+	c2 = c.copy()
+	b2 = b.copy()
+	a2 = a.copy()
 	return (a, b, c, d, e, f, a2, b2, c2, d2, e2, f2)
 
 @BBuiltin(',k', 'Pick')
@@ -442,7 +712,18 @@ def builtin_add_overloaded(self, context, looping=False):
 		context.push(c)
 	elif areinstances((aa, bb), BSeq):
 		# Concatenate two sequences
-		c = type(aa)(aa.value + bb.value)
+		c = None
+		if packed(aa, bb) and aa.box is bb.box:
+			try:
+				c = BVector(packed=aa.packed_array() + bb.packed_array())
+			except OverflowError:
+				pass
+		if c is None:
+			c = BRopeList.joined(aa, bb)
+		if c is None:
+			c = BRopeStr.joined(aa, bb)
+		if c is None:
+			c = type(aa)(aa.value + bb.value)
 		context.push(c)
 	elif areinstances((aa, bb), BProc):
 		# Compose two procedures
@@ -473,6 +754,10 @@ def builtin_subtract_overloaded(self, context, looping=False):
 		# Subtract two numbers
 		c = type(aa)(aa.value - bb.value)
 		context.push(c)
+	elif areinstances((aa, bb), BStr):
+		# Asymmetric difference for two strings
+		bv = set(bb.value)
+		context.push(BStr(''.join(c for c in aa.value if c not in bv)))
 	elif areinstances((aa, bb), BSeq):
 		# Asymmetric difference for two sequences
 		av = aa.simplify().value
@@ -482,15 +767,12 @@ def builtin_subtract_overloaded(self, context, looping=False):
 		context.push(c)
 	elif isinstance(a, BCallable) and isinstance(b, BSeq):
 		# Execute block with each item in sequence
-		for x in b.simplify().value:
-			context.push(x)
-			a.apply(context)
+		for f in eaching(a, b.elements(), context):
+			f.apply(context)
 	elif isinstance(a, BCallable) and isinstance(b, BNum):
 		# Execute block with each item in [0, N)
-		bv = int(b.simplify().value)
-		for x in range(bv):
-			context.push(BInt(x))
-			a.apply(context)
+		for f in eaching(a, upto(b), context):
+			f.apply(context)
 	else:
 		raise BTypeError(self, (a, b))
 
@@ -529,12 +811,11 @@ def builtin_multiply_overloaded(self, context, looping=False):
 		if isinstance(a, BList):
 			if isinstance(b, BList):
 				# Join list with list
-				av = a.value[:]
 				cv = []
-				while av:
-					cv.append(av.pop(0))
-					if av:
+				for (i, x) in enumerate(snapshot(a)):
+					if i:
 						cv.extend(b.value)
+					cv.append(x)
 				context.push(BList(cv))
 			elif isinstance(b, BStr):
 				# Join list with string
@@ -584,16 +865,12 @@ def builtin_multiply_overloaded(self, context, looping=False):
 				context.push(BRegex(cv))
 	elif isinstance(a, BCallable) and isinstance(b, BNum):
 		# Execute block a number of times
-		n = int(b.simplify().value)
-		for i in range(n):
-			a.apply(context)
+		for f in repeating(a, int(b.simplify().value), context):
+			f.apply(context)
 	elif isinstance(a, BCallable) and isinstance(b, BSeq):
 		# Fold sequence with function
-		bv = b.simplify().value[:]
-		context.push(bv.pop(0))
-		while bv:
-			context.push(bv.pop(0))
-			a.apply(context)
+		for f in folding(a, b, context):
+			f.apply(context)
 	elif areinstances((a, b), BCallable):
 		# Combine two unary functions: ( a b -- F(a) G(b) )
 		c = BProc()
@@ -695,12 +972,16 @@ def builtin_divide_overloaded(self, context, looping=False):
 		for x in range(1, bv):
 			context.push(BInt(x))
 			a.apply(context)
+	elif areinstances((a, b), BCallable) and unfolds_lazily(a, b, context):
+		# Unfold with predicate and unspool functions, as they are asked for
+		x = context.pop()
+		context.push(BStream(source=unfolded(a, b, x, isolation(context))))
 	elif areinstances((a, b), BCallable):
 		# Unfold with predicate and unspool functions
 		cv = []
 		while not context.broken:
 			x = context.top()
-			x2 = type(x)(x.value)
+			x2 = x.copy()
 			context.push(x2)
 			a.apply(context)
 			if not context.pop():
@@ -750,6 +1031,10 @@ def builtin_modulo_overloaded(self, context, looping=False):
 				c = BRegex(cv)
 			except:
 				c = BStr(pv)
+		elif packed(a):
+			c = BVector(packed=a.packed[::i])
+		elif lazy(a) or roped(a) or isinstance(a, BStr):
+			c = a.window(slice(None, None, i))
 		else:
 			cv = a.value[::i]
 			c = type(a)(cv)
@@ -776,12 +1061,15 @@ def builtin_modulo_overloaded(self, context, looping=False):
 		context.push(c)
 	elif isinstance(a, BCallable) and isinstance(b, BSeq):
 		# Scan sequence with function
-		bv = b.simplify().value[:]
+		bv = snapshot(b)
 		cv = []
-		context.push(bv.pop(0))
+		try:
+			context.push(next(bv))
+		except StopIteration:
+			raise IndexError('pop from empty list')
 		cv.append(context.top())
-		while bv:
-			context.push(bv.pop(0))
+		for x in bv:
+			context.push(x)
 			a.apply(context)
 			cv.append(context.top())
 		context.pop()
@@ -844,26 +1132,26 @@ def builtin_bitwise_and_overloaded(self, context, looping=False):
 			raise BTypeError(self, (a, b))
 		c = type(aa)(cv)
 		context.push(c)
+	elif isinstance(a, BCallable) and lazily(a, b, context):
+		# Filter stream by predicate function
+		context.push(BStream(source=filtered(a, b, isolation(context))))
+	elif (isinstance(a, BCallable) and isinstance(b, (BSeq, BNum)) and
+		fusion.run_chain(self, 'filter', a, b, context)):
+		# Filter by predicate function, and apply the functions after it, in
+		# one loop
+		pass
 	elif isinstance(a, BCallable) and isinstance(b, BSeq):
 		# Filter sequence by predicate function
 		cv = []
-		bv = b.simplify().value
-		for x in bv:
-			context.push(x)
-			a.apply(context)
-			if context.pop():
-				cv.append(x)
+		for f in filtering(a, b.elements(), context, cv):
+			f.apply(context)
 		c = BList(cv).convert(b)
 		context.push(c)
 	elif isinstance(a, BCallable) and isinstance(b, BNum):
 		# Filter [0, N) by predicate function
 		cv = []
-		bv = int(b.simplify().value)
-		for x in range(bv):
-			context.push(BInt(x))
-			a.apply(context)
-			if context.pop():
-				cv.append(BInt(x))
+		for f in filtering(a, upto(b), context, cv):
+			f.apply(context)
 		context.push(BList(cv))
 	elif areinstances((a, b), BCallable):
 		# Combine two unary functions ( a -- F(a) G(a) )
@@ -917,25 +1205,25 @@ def builtin_bitwise_or_overloaded(self, context, looping=False):
 			raise BTypeError(self, (a, b))
 		c = type(aa)(cv)
 		context.push(c)
+	elif isinstance(a, BCallable) and lazily(a, b, context, None):
+		# Map function onto stream
+		context.push(BStream(source=mapped(a, b, isolation(context))))
+	elif (isinstance(a, BCallable) and isinstance(b, (BSeq, BNum)) and
+		fusion.run_chain(self, 'map', a, b, context)):
+		# Map function, and the functions after it, in one loop
+		pass
 	elif isinstance(a, BCallable) and isinstance(b, BSeq):
 		# Map function onto sequence
 		cv = []
-		for x in b.simplify().value:
-			n = len(context.stack)
-			context.push(x)
-			a.apply(context)
-			cv.extend(context.pop_till(n))
-		context.push(BList(cv))
+		for f in mapping(a, b.elements(), context, cv):
+			f.apply(context)
+		context.push(BVector.of(cv))
 	elif isinstance(a, BCallable) and isinstance(b, BNum):
 		# Map function onto sequence
 		cv = []
-		bv = int(b.simplify().value)
-		for x in range(bv):
-			n = len(context.stack)
-			context.push(BInt(x))
-			a.apply(context)
-			cv.extend(context.pop_till(n))
-		context.push(BList(cv))
+		for f in mapping(a, upto(b), context, cv):
+			f.apply(context)
+		context.push(BVector.of(cv))
 	elif areinstances((a, b), BCallable):
 		# Combine two binary functions: ( a b -- F(a,b) G(a,b) )
 		c = BProc()
@@ -1067,6 +1355,12 @@ def builtin_less_than_overloaded(self, context, looping=False):
 					c = BRegex(cv)
 				except:
 					c = BStr(pv)
+			elif packed(a):
+				c = BVector(packed=a.packed[:i])
+			elif lazy(a) or roped(a) or isinstance(a, BStr):
+				c = a.window(slice(None, i))
+			elif streaming(a) and i >= 0:
+				c = a.take(i)
 			else:
 				cv = a.value[:i]
 				c = type(a)(cv)
@@ -1076,8 +1370,7 @@ def builtin_less_than_overloaded(self, context, looping=False):
 	elif isinstance(a, BCallable) and isinstance(b, BSeq):
 		# Take the first items of a sequence which pass a predicate function
 		cv = []
-		bv = b.simplify().value
-		for x in bv:
+		for x in b.elements():
 			context.push(x)
 			a.apply(context)
 			if not context.pop():
@@ -1116,18 +1409,26 @@ def builtin_greater_than_overloaded(self, context, looping=False):
 					c = BRegex(cv)
 				except:
 					c = BStr(pv)
+			elif packed(a):
+				c = BVector(packed=a.packed[i:])
+			elif lazy(a) or roped(a) or isinstance(a, BStr):
+				c = a.window(slice(i, None))
+			elif streaming(a) and i >= 0:
+				c = a.drop(i)
 			else:
 				cv = a.value[i:]
 				c = type(a)(cv)
 			context.push(c)
 		except IndexError:
 			pass
+	elif isinstance(a, BCallable) and lazily(a, b, context):
+		# Drop the first items of a stream which pass a predicate function
+		context.push(BStream(source=dropped_while(a, b, isolation(context))))
 	elif isinstance(a, BCallable) and isinstance(b, BSeq):
 		# Drop the first items of a sequence which pass a predicate function
 		cv = []
-		bv = b.simplify().value
 		failed = False
-		for x in bv:
+		for x in b.elements():
 			context.push(x)
 			a.apply(context)
 			if not context.pop():
@@ -1210,6 +1511,10 @@ def builtin_abs_overloaded(a):
 	elif isinstance(a, BRegex):
 		# Length of regex
 		return BInt(len(a.value.pattern))
+	elif packed(a):
+		return BInt(len(a.packed))
+	elif lazy(a) or roped(a) or isinstance(a, BStr):
+		return BInt(a.size())
 	elif isinstance(a, BSeq):
 		# Length of sequence
 		return BInt(len(a.value))
@@ -1220,7 +1525,8 @@ def builtin_abs_overloaded(a):
 		b.value.extend(a.convert(BFunc()).value)
 		return b
 
-@BBuiltin('(', 'Decr', 'Decrement', 'Pred', 'First', 'Uncons', '∇', '₀', '₋')
+@BBuiltin('(', 'Decr', 'Decrement', 'Pred', 'First', 'Uncons', '∇',
+	'₀', '₋', mutating=True)
 def builtin_decrement_overloaded(self, context, looping=False):
 	"""
 	Decrement a number by 1.
@@ -1232,23 +1538,36 @@ def builtin_decrement_overloaded(self, context, looping=False):
 		# Decrement a number by 1
 		b = type(a)(a.value - 1)
 		context.push(b)
+	elif streaming(a):
+		# Move the first item of a stream to the top of the stack
+		context.push(a)
+		if a:
+			b = a.item(0)
+			a.start += 1
+			a.changed()
+			context.push(b)
+	elif roped(a):
+		# Move the first item of a rope to the top of the stack
+		context.push(a)
+		if a:
+			b = a.item(0)
+			a.delete(0)
+			context.push(b)
 	elif isinstance(a, BList):
 		# Move the first item of a list to the top of the stack
 		try:
 			b = a.value.pop(0)
+			a.changed()
 			context.push(a)
 			context.push(b)
 		except IndexError:
 			context.push(a)
 	elif isinstance(a, BStr):
 		# Move the first character of a string to the top of the stack
-		b = BStr(a.value[1:])
+		b = a.window(slice(1, None))
 		context.push(b)
-		try:
-			c = a.simplify().value[0]
-			context.push(c)
-		except IndexError:
-			pass
+		if a:
+			context.push(a.item(0))
 	elif isinstance(a, BRegex):
 		# Move the first character of a regex to the top of the stack
 		try:
@@ -1272,7 +1591,8 @@ def builtin_decrement_overloaded(self, context, looping=False):
 	else:
 		raise BTypeError(self, a)
 
-@BBuiltin(')', 'Incr', 'Increment', 'Succ', 'Last', 'Chop', 'Unrcons', '∆', '₊')
+@BBuiltin(')', 'Incr', 'Increment', 'Succ', 'Last', 'Chop',
+	'Unrcons', '∆', '₊', mutating=True)
 def builtin_increment_overloaded(self, context, looping=False):
 	"""
 	Increment a number by 1.
@@ -1284,23 +1604,28 @@ def builtin_increment_overloaded(self, context, looping=False):
 		# Increment a number by 1
 		b = type(a)(a.value + 1)
 		context.push(b)
+	elif roped(a):
+		# Move the last item of a rope to the top of the stack
+		context.push(a)
+		if a:
+			b = a.item(-1)
+			a.delete(a.size() - 1)
+			context.push(b)
 	elif isinstance(a, BList):
 		# Move the last item of a list to the top of the stack
 		try:
 			b = a.value.pop()
+			a.changed()
 			context.push(a)
 			context.push(b)
 		except IndexError:
 			context.push(a)
 	elif isinstance(a, BStr):
 		# Move the last character of a string to the top of the stack
-		b = BStr(a.value[:-1])
+		b = a.window(slice(None, -1))
 		context.push(b)
-		try:
-			c = a.simplify().value[-1]
-			context.push(c)
-		except IndexError:
-			pass
+		if a:
+			context.push(a.item(-1))
 	elif isinstance(a, BRegex):
 		# Move the last character of a regex to the top of the stack
 		try:
@@ -1324,18 +1649,18 @@ def builtin_increment_overloaded(self, context, looping=False):
 	else:
 		raise BTypeError(self, a)
 
-@BBuiltin('H', 'Ri', 'Randint', 'Choice')
-@signature((BNum, BSeq))
-def builtin_h_overloaded(a):
+@BBuiltin('H', 'Ri', 'Randint', 'Choice', impure=True)
+@signature((BNum, BSeq), state=True)
+def builtin_h_overloaded(state, a):
 	"""
 	Choose a random integer uniformly in the interval [0, N).
 	Choose a random item from a sequence.
 	"""
 	if isinstance(a, BNum):
 		av = int(a.simplify().value)
-		return BInt(random.randrange(av))
+		return BInt(state.random.randrange(av))
 	elif isinstance(a, BSeq):
-		return random.choice(a.simplify().value)
+		return state.random.choice(a.simplify().value)
 
 @BBuiltin('U', 'Up', 'Ut', 'Upto', 'Range', 'Permutations', 'Until', '℗', '₩')
 def builtin_u_overloaded(self, context, looping=False):
@@ -1348,11 +1673,10 @@ def builtin_u_overloaded(self, context, looping=False):
 	a = context.pop()
 	if isinstance(a, BNum):
 		av = int(a.simplify().value)
-		context.push(BList([BInt(i) for i in range(av)]))
+		context.push(BVector(packed=range(av)))
 	elif isinstance(a, BSeq):
 		av = a.simplify().value
-		pv = [BList(p).convert(a) for p in itertools.permutations(av)]
-		context.push(BList(pv))
+		context.push(BLazyList(source=BCandidates('permutations', a, av)))
 	elif isinstance(a, BCallable):
 		b = context.pop()
 		b.apply(context)
@@ -1373,7 +1697,7 @@ def builtin_d_overloaded(self, context, looping=False):
 	a = context.pop()
 	if isinstance(a, BNum):
 		av = int(a.simplify().value)
-		context.push(BList([BInt(i) for i in range(av, 0, -1)]))
+		context.push(BVector(packed=range(av, 0, -1)))
 	elif isinstance(a, BCallable):
 		a.apply(context, looping=True)
 		b = context.pop()
@@ -1399,9 +1723,9 @@ def builtin_e_overloaded(a):
 		av = a.simplify().value
 		return BList([BList([BInt(i), x]) for (i, x) in enumerate(av)])
 
-@BBuiltin('L', 'Sh', 'Shuffle', 'Shuffled')
-@signature((BNum, BSeq))
-def builtin_l_overloaded(a):
+@BBuiltin('L', 'Sh', 'Shuffle', 'Shuffled', impure=True)
+@signature((BNum, BSeq), state=True)
+def builtin_l_overloaded(state, a):
 	"""
 	Randomly shuffle a sequence of all integers in the interval [0, N).
 	Randomly shuffle a given sequence.
@@ -1409,11 +1733,13 @@ def builtin_l_overloaded(a):
 	if isinstance(a, BNum):
 		av = int(a.simplify().value)
 		sv = [BInt(i) for i in range(av)]
-		random.shuffle(sv)
+		state.random.shuffle(sv)
 		return BList(sv)
 	elif isinstance(a, BSeq):
-		av = a.simplify().value
-		random.shuffle(av)
+		x = a.simplify()
+		av = x.value
+		state.random.shuffle(av)
+		x.changed()
 		return BList(av).convert(a)
 
 @BBuiltin('M', 'Max', 'Maximum', 'Argmax', 'Maxby')
@@ -1431,9 +1757,11 @@ def builtin_m_overloaded(self, context, looping=False):
 		if not isinstance(b, BReal):
 			raise BTypeError(self, (b, a))
 		context.push(max(b, a))
+	elif packed(a):
+		context.push(a.box(max(a.packed)))
 	elif isinstance(a, BSeq):
 		# In Birdiescript: \{,t<@nI}*
-		context.push(max(a.simplify().value))
+		context.push(max(a.elements()))
 	elif isinstance(a, BCallable):
 		b = context.pop()
 		if isinstance(b, BNum):
@@ -1450,14 +1778,9 @@ def builtin_m_overloaded(self, context, looping=False):
 			context.push(d[max(ck, bk)])
 		elif isinstance(b, BSeq):
 			# In Birdiescript: ?|?#U@ZtM)p
-			bv = b.simplify().value
-			d = {}
-			for (i, x) in enumerate(bv):
-				context.push(x)
-				a.apply(context)
-				xk = context.pop()
-				d[x] = (xk, i)
-			context.push(max(bv, key=lambda x: d[x]))
+			# The last of the items with the greatest key
+			context.push(extreme_by(a, b, context, lambda k, e: not k < e,
+				'max'))
 		else:
 			raise BTypeError(self, (b, a))
 	else:
@@ -1478,9 +1801,11 @@ def builtin_n_overloaded(self, context, looping=False):
 		if not isinstance(b, BReal):
 			raise BTypeError(self, (b, a))
 		context.push(min(b, a))
+	elif packed(a):
+		context.push(a.box(min(a.packed)))
 	elif isinstance(a, BSeq):
 		# In Birdiescript: \{,t>@nI}*
-		context.push(min(a.simplify().value))
+		context.push(min(a.elements()))
 	elif isinstance(a, BCallable):
 		b = context.pop()
 		if isinstance(b, BNum):
@@ -1497,14 +1822,9 @@ def builtin_n_overloaded(self, context, looping=False):
 			context.push(d[min(ck, bk)])
 		elif isinstance(b, BSeq):
 			# In Birdiescript: ?|?#U@ZtN)p
-			bv = b.simplify().value
-			d = {}
-			for (i, x) in enumerate(bv):
-				context.push(x)
-				a.apply(context)
-				xk = context.pop()
-				d[x] = (xk, i)
-			context.push(min(bv, key=lambda x: d[x]))
+			# The first of the items with the least key
+			context.push(extreme_by(a, b, context, lambda k, e: k < e,
+				'min'))
 		else:
 			raise BTypeError(self, (b, a))
 	else:
@@ -1520,6 +1840,8 @@ def builtin_q_overloaded(a):
 	if isinstance(a, BNum):
 		# In Birdiescript: .5^p
 		return BType.from_python(cmath.sqrt(a.value)).simplify()
+	elif isinstance(a, BStr):
+		return BStr(''.join(collections.OrderedDict.fromkeys(a.value)))
 	elif isinstance(a, BSeq):
 		# In Birdiescript: ,|
 		av = a.simplify().value
@@ -1539,23 +1861,26 @@ def builtin_s_overloaded(self, context, looping=False):
 	a = context.pop()
 	if isinstance(a, BNum):
 		context.push(BType.from_python(cmath.sin(a.value)).simplify())
+	elif isinstance(a, BStr):
+		context.push(BStr(''.join(sorted(a.value))))
 	elif isinstance(a, BSeq):
-		av = a.simplify().value
+		x = a.simplify()
+		av = x.value
 		av.sort()
+		x.changed()
 		context.push(BList(av).convert(a))
 	elif isinstance(a, BCallable):
 		# In Birdiescript: ?|?#U@ZtS\\)p|
 		b = context.pop()
 		if not isinstance(b, BSeq):
 			raise BTypeError(self, (b, a))
-		bv = b.simplify().value
-		d = {}
-		for (i, x) in enumerate(bv):
-			context.push(x)
-			a.apply(context)
-			xk = context.pop()
-			d[x] = (xk, i)
-		bv.sort(key=lambda x: d[x])
+		x = b.simplify()
+		bv = x.value
+		keys = apply_keys(a, bv, context)
+		# A stable sort keeps items with equal keys in order
+		order = sorted(range(len(bv)), key=keys.__getitem__)
+		bv[:] = [bv[i] for i in order]
+		x.changed()
 		context.push(BList(bv).convert(b))
 
 @BBuiltin('C', 'Cos', 'Cosine', 'Combinations', 'Subsets', 'Powerset', '©')
@@ -1570,9 +1895,7 @@ def builtin_c_overloaded(a):
 	elif isinstance(a, BSeq):
 		# In Birdiescript: [[]]\{\++?|+}@-
 		av = a.simplify().value
-		cv = [BList(c).convert(a) for c in itertools.chain.from_iterable(
-			itertools.combinations(av, i) for i in range(len(av)+1))]
-		return BList(cv)
+		return BLazyList(source=BCandidates('subsets', a, av))
 
 @BBuiltin('T', 'Tan', 'Tangent', 'Transpose', 'Unzip', '™', 'ᵀ')
 @signature((BNum, BList))
@@ -2173,7 +2496,8 @@ BBuiltin('False', '⊥', '⊭', value=BInt(0),
 def builtin_equal(a, b):
 	"""Test two values for equality."""
 	if (areinstances((a, b), BNum) or areinstances((a, b), BSeq) or
-		areinstances((a, b), BCallable)):
+		areinstances((a, b), BCallable) or areinstances((a, b), BThread) or
+		areinstances((a, b), BChannel)):
 		return BInt(a == b)
 	return BInt(0)
 
@@ -2226,6 +2550,102 @@ BBuiltin('Nimpd', 'Nonimplied', '↚', code='$?!$I',
 	doc="""Boolean converse nonimplication. Lazily evaluates the first argument.""")
 
 
+#################### Type specializations ####################
+
+# Fast paths selected by type profiles; see BProfile in core.py.
+
+def specialize(name, *classes):
+	"""
+	Return a decorator which registers a function as a fast path of the
+	builtin with a name, for operands of exactly the given types.
+	"""
+	return builtins[name].specialize(*classes)
+
+@specialize('+', BInt, BInt)
+def builtin_add_int_int(self, context, looping=False):
+	"""Add two integers."""
+	b = context.pop()
+	a = context.pop()
+	context.push(BInt(a.value + b.value))
+
+@specialize('+', BFloat, BFloat)
+def builtin_add_float_float(self, context, looping=False):
+	"""Add two floating point numbers."""
+	b = context.pop()
+	a = context.pop()
+	context.push(BFloat(a.value + b.value))
+
+@specialize('+', BInt, BFloat)
+@specialize('+', BFloat, BInt)
+def builtin_add_int_float(self, context, looping=False):
+	"""Add an integer and a floating point number."""
+	b = context.pop()
+	a = context.pop()
+	context.push(BFloat(a.value + b.value))
+
+@specialize('-', BInt, BInt)
+def builtin_subtract_int_int(self, context, looping=False):
+	"""Subtract two integers."""
+	b = context.pop()
+	a = context.pop()
+	context.push(BInt(a.value - b.value))
+
+@specialize('-', BFloat, BFloat)
+def builtin_subtract_float_float(self, context, looping=False):
+	"""Subtract two floating point numbers."""
+	b = context.pop()
+	a = context.pop()
+	context.push(BFloat(a.value - b.value))
+
+@specialize('*', BInt, BInt)
+def builtin_multiply_int_int(self, context, looping=False):
+	"""Multiply two integers."""
+	b = context.pop()
+	a = context.pop()
+	context.push(BInt(a.value * b.value))
+
+@specialize('*', BFloat, BFloat)
+def builtin_multiply_float_float(self, context, looping=False):
+	"""Multiply two floating point numbers."""
+	b = context.pop()
+	a = context.pop()
+	context.push(BFloat(a.value * b.value))
+
+@specialize('%', BInt, BInt)
+def builtin_modulo_int_int(self, context, looping=False):
+	"""Modulo two integers."""
+	b = context.pop()
+	a = context.pop()
+	if b.value:
+		c = BInt(a.value % b.value)
+	else:
+		c = BFloat(float('nan'))
+	context.push(c)
+
+@specialize('<', BInt, BInt)
+@specialize('<', BFloat, BFloat)
+def builtin_less_than_real_real(self, context, looping=False):
+	"""Test two similarly-typed real numbers for less-than order."""
+	b = context.pop()
+	a = context.pop()
+	context.push(BInt(a.value < b.value))
+
+@specialize('>', BInt, BInt)
+@specialize('>', BFloat, BFloat)
+def builtin_greater_than_real_real(self, context, looping=False):
+	"""Test two similarly-typed real numbers for greater-than order."""
+	b = context.pop()
+	a = context.pop()
+	context.push(BInt(a.value > b.value))
+
+@specialize('=', BInt, BInt)
+def builtin_equal_int_int(self, context, looping=False):
+	"""Test two integers for equality."""
+	b = context.pop()
+	a = context.pop()
+	context.push(BInt(a.value == b.value))
+
+
 #################### Floating point operations ####################
 
 BBuiltin('Ft', 'Float', 'Complex', code='1.*',
@@ -2525,14 +2945,14 @@ def builtin_atanh(x):
 @signature(BSeq)
 def builtin_mean(s):
 	"""Mean (average) value in a sequence."""
-	sv = [x.value for x in s.simplify().value]
+	sv = s.numbers()
 	return BComplex(sum(sv) / len(sv)).simplify()
 
 @BBuiltin('Mi', 'Median')
 @signature(BSeq)
 def builtin_median(s):
 	"""Median value in a sequence."""
-	sv = [x.value for x in s.simplify().value]
+	sv = s.numbers()
 	h = (len(sv) - 1) // 2
 	e = (not len(sv) % 2) + 1
 	return BComplex(sum(sorted(sv)[h:h+e]) / e).simplify()
@@ -2541,7 +2961,7 @@ def builtin_median(s):
 @signature(BSeq)
 def builtin_median_low(s):
 	"""Low median value in a sequence."""
-	sv = [x.value for x in s.simplify().value]
+	sv = s.numbers()
 	h = (len(sv) - 1) // 2
 	e = (not len(sv) % 2) + 1
 	return BComplex(sorted(sv)[h]).simplify()
@@ -2550,7 +2970,7 @@ def builtin_median_low(s):
 @signature(BSeq)
 def builtin_median_high(s):
 	"""High median value in a sequence."""
-	sv = [x.value for x in s.simplify().value]
+	sv = s.numbers()
 	h = (len(sv) - 1) // 2
 	e = (not len(sv) % 2) + 1
 	return BComplex(sorted(sv)[h+e-1]).simplify()
@@ -2559,7 +2979,7 @@ def builtin_median_high(s):
 @signature(BSeq)
 def builtin_variance(s):
 	"""Sample variance of a sequence."""
-	sv = [x.value for x in s.simplify().value]
+	sv = s.numbers()
 	n = len(sv)
 	m = sum(sv) / n
 	v = sum((m-x)**2 for x in sv) / (n - 1)
@@ -2569,7 +2989,7 @@ def builtin_variance(s):
 @signature(BSeq)
 def builtin_stdev(s):
 	"""Sample standard deviation of a sequence."""
-	sv = [x.value for x in s.simplify().value]
+	sv = s.numbers()
 	n = len(sv)
 	m = sum(sv) / n
 	d = math.sqrt(sum((m-x)**2 for x in sv) / (n - 1))
@@ -2579,7 +2999,7 @@ def builtin_stdev(s):
 @signature(BSeq)
 def builtin_pop_variance(s):
 	"""Population variance of a sequence."""
-	sv = [x.value for x in s.simplify().value]
+	sv = s.numbers()
 	n = len(sv)
 	m = sum(sv) / n
 	v = sum((m-x)**2 for x in sv) / n
@@ -2589,7 +3009,7 @@ def builtin_pop_variance(s):
 @signature(BSeq)
 def builtin_pop_stdev(s):
 	"""Population standard deviation of a sequence."""
-	sv = [x.value for x in s.simplify().value]
+	sv = s.numbers()
 	n = len(sv)
 	m = sum(sv) / n
 	d = math.sqrt(sum((m-x)**2 for x in sv) / n)
@@ -2664,16 +3084,27 @@ BBuiltin('Sd', 'Secondsperday', value=BInt(86400),
 
 #################### Linear algebra functions ####################
 
-BBuiltin('Id', 'Identity', code=',,[0]*1+*/(;',
-	doc="""Make an identity matrix of size N.""")
+@BBuiltin('Id', 'Identity', code=',,[0]*1+*/(;')
+def builtin_identity(self, context, looping=False):
+	"""Make an identity matrix of size N."""
+	native_or_code(self, context, linalg.identity_of, 1)
+
+@BBuiltin('Trc', 'Trace', code=r'E\{_$[g}|+n')
+def builtin_trace(self, context, looping=False):
+	"""Trace of a matrix or vector."""
+	native_or_code(self, context, linalg.trace_of, 1)
 
-BBuiltin('Trc', 'Trace', code=r'E\{_$[g}|+n',
-	doc="""Trace of a matrix or vector.""")
+@BBuiltin('+v', 'Vectorsum', code=r'Z\+|v')
+def builtin_vector_sum(self, context, looping=False):
+	"""Sum of two vectors."""
+	native_or_code(self, context, functools.partial(linalg.combine,
+		operator.add), 2)
 
-BBuiltin('+v', 'Vectorsum', code=r'Z\+|v',
-	doc="""Sum of two vectors.""")
-BBuiltin('*v', 'Vectorproduct', code=r'Z\*|v',
-	doc="""Product of two vectors.""")
+@BBuiltin('*v', 'Vectorproduct', code=r'Z\*|v')
+def builtin_vector_product(self, context, looping=False):
+	"""Product of two vectors."""
+	native_or_code(self, context, functools.partial(linalg.combine,
+		operator.mul), 2)
 
 @BBuiltin('-v', 'Vectordiff', 'Vectordifference', 'Eachv')
 def builtin_vector_diff(self, context, looping=False):
@@ -2684,40 +3115,101 @@ def builtin_vector_diff(self, context, looping=False):
 	b = context.pop()
 	a = context.pop()
 	if isinstance(b, BSeq):
-		code = r'Z\-|v'
+		context.push(a)
+		context.push(b)
+		native_or_code(self, context, functools.partial(linalg.combine,
+			operator.sub), 2, r'Z\-|v')
 	elif isinstance(b, BCallable):
-		code = r'\_$+-'
+		context.push(a)
+		context.push(b)
+		context.apply_code(r'\_$+-')
 	else:
 		raise BTypeError(self, (a, b))
-	context.push(a)
-	context.push(b)
-	context.apply_code(code)
-
-BBuiltin('+m', 'Matrixsum', code=r'Z\{T\+n|}|',
-	doc="""Sum of two matrices.""")
-BBuiltin('*m', 'Matrixproduct', code=r'?#@nT*c\{T\*n|+n}|/',
-	doc="""Product of two matrices.""")
-BBuiltin('^m', 'Matrixpower', code=r',\{(:N\,*\*mN*}\{;#,,[0]*1+*/(;}I',
-	doc="""Raise a square matrix to a power.""")
-BBuiltin('*h', '∘', 'Hadamard', 'Hadamardproduct', code=r'Z\{T\*n|}|',
-	doc="""Hadamard product of two matrices.""")
-
-BBuiltin('#z', 'Countingnorm', code=r'\Bl|+n',
-	doc="""Counting norm (L^0 norm) of a vector.""")
-BBuiltin('#m', 'Manhattannorm', 'Taxinorm', code=r'\#|+n',
-	doc="""Manhattan norm (L^1 norm) of a vector.""")
-BBuiltin('#v', 'Δ', 'Vectornorm', 'Vectormag', 'Euclidnorm', code=r'\Sq|+nQ',
-	doc="""Euclidean norm (L^2 norm) of a vector.""")
-BBuiltin('#y', 'Chebyshevnorm', code=r'\#|M',
-	doc="""Chebyshev norm (L^infinity norm) of a vector.""")
-BBuiltin('#l', 'Lnorm', code=r',?i\{;\#|M}\{,\{$\{#?^p}|+s1@/^p}\{;\Bl|+n}I}I',
-	doc="""L^P norm of a vector for a given P.""")
-
-BBuiltin('*d', '•', 'Dot', 'Dotproduct', 'Inner', 'Innerproduct',
-	code=r'\{Ft~}|Z\*n|+n',
-	doc="""Dot product (inner product) of two vectors.""")
-BBuiltin('*o', 'Outer', 'Outerproduct', '⊗', code=']l$\{Ft~}|1/$*m',
-	doc="""Outer product of two vectors.""")
+
+@BBuiltin('+m', 'Matrixsum', code=r'Z\{T\+n|}|')
+def builtin_matrix_sum(self, context, looping=False):
+	"""Sum of two matrices."""
+	native_or_code(self, context, linalg.matrix_sum_of, 2)
+
+def first_item(s):
+	"""Return the first item of a list, or None if it is empty."""
+	return next(iter(s.elements()), None)
+
+@BBuiltin('*m', 'Matrixproduct', code=r',T#@nT*c\{T\*n|+n}|/')
+def builtin_matrix_product(self, context, looping=False):
+	"""Product of two matrices."""
+	if len(context.stack) >= 2 and areinstances(context.stack[-2:], BList):
+		(a, b) = context.stack[-2:]
+		row = first_item(b)
+		if (first_item(a) is None or row is None or
+			isinstance(row, BList) and first_item(row) is None):
+			# A product with no rows or no columns has no items, whichever
+			# operand is empty; the definition would chunk it by zero
+			context.pop_n(2)
+			context.push(BList())
+			return
+	native_or_code(self, context, linalg.matrix_product_of, 2)
+
+@BBuiltin('^m', 'Matrixpower', code=r',\{(:N\,*\*mN*}\{;#,,[0]*1+*/(;}I')
+def builtin_matrix_power(self, context, looping=False):
+	"""Raise a square matrix to a power."""
+	native_or_code(self, context, linalg.matrix_power_of, 2)
+
+@BBuiltin('*h', '∘', 'Hadamard', 'Hadamardproduct', code=r'Z\{T\*n|}|')
+def builtin_hadamard(self, context, looping=False):
+	"""Hadamard product of two matrices."""
+	native_or_code(self, context, linalg.hadamard_of, 2)
+
+@BBuiltin('#z', 'Countingnorm', code=r'\Bl|+n')
+def builtin_counting_norm(self, context, looping=False):
+	"""Counting norm (L^0 norm) of a vector."""
+	native_or_code(self, context, linalg.counting_norm_of, 1)
+
+@BBuiltin('#m', 'Manhattannorm', 'Taxinorm', code=r'\#|+n')
+def builtin_manhattan_norm(self, context, looping=False):
+	"""Manhattan norm (L^1 norm) of a vector."""
+	native_or_code(self, context, linalg.manhattan_norm_of, 1)
+
+@BBuiltin('#v', 'Δ', 'Vectornorm', 'Vectormag', 'Euclidnorm', code=r'\Sq|+nQ')
+def builtin_euclidean_norm(self, context, looping=False):
+	"""Euclidean norm (L^2 norm) of a vector."""
+	native_or_code(self, context, linalg.euclidean_norm_of, 1)
+
+@BBuiltin('#y', 'Chebyshevnorm', code=r'\#|M')
+def builtin_chebyshev_norm(self, context, looping=False):
+	"""Chebyshev norm (L^infinity norm) of a vector."""
+	native_or_code(self, context, linalg.chebyshev_norm_of, 1)
+
+@BBuiltin('#l', 'Lnorm', code=r',?i\{;#y}\{,\{$\{#?^p}|+s1@/^p}\{;#z}I}I')
+def builtin_lnorm(self, context, looping=False):
+	"""L^P norm of a vector for a given P."""
+	if natively and len(context.stack) >= 2:
+		(v, p) = context.stack[-2:]
+		vv = linalg.vector_values(v)
+		if vv and type(p) is BInt and p.value > 0:
+			try:
+				s = linalg.power_sum(vv, p.value)
+			except ArithmeticError:
+				pass
+			else:
+				# Take the Pth root as the definition does
+				context.pop_n(2)
+				context.push(p)
+				context.push(BType.from_python(s))
+				context.apply_code('1@/^p')
+				return
+	apply_definition(self, context)
+
+@BBuiltin('*d', '•', 'Dot', 'Dotproduct', 'Inner', 'Innerproduct',
+	code=r'\{Ft~}|Z\*n|+n')
+def builtin_dot_product(self, context, looping=False):
+	"""Dot product (inner product) of two vectors."""
+	native_or_code(self, context, linalg.dot_of, 2)
+
+@BBuiltin('*o', 'Outer', 'Outerproduct', '⊗', code=r']l$\{Ft~}|1/$*m')
+def builtin_outer_product(self, context, looping=False):
+	"""Outer product of two vectors."""
+	native_or_code(self, context, linalg.outer_of, 2)
 
 @BBuiltin('*x', 'Cross', 'Crossproduct', '×')
 @signature(BSeq, BSeq)
@@ -2751,7 +3243,7 @@ def builtin_norm_distance(self, context, looping=False):
 		raise BTypeError(self, (a, b, n) if norm else (a, b))
 	context.push(a)
 	context.push(b)
-	context.apply_code(r'Z\-|v')
+	context.apply_code('-v')
 	if norm:
 		n.apply(context)
 	else:
@@ -2829,19 +3321,42 @@ BBuiltin('(a', '+p', 'Cons', code=']l$+',
 BBuiltin(')a', '+a', 'Rcons', code=']l+',
 	doc="""Append a value to a sequence.""")
 
-BBuiltin('Ui', 'Uptoinc', code=')U(r',
-	doc="""List the integers in the interval [1, N].""")
-BBuiltin('Uf', 'Upfrom', code=r'?_+U\{?+}|;p',
-	doc="""List the integers in the half-open interval [M, N).""")
+def integer_range(f, *bounds):
+	"""
+	Return a packed range with the Python range() bounds that a function
+	returns for the values of integers, or None if they are not integers.
+	"""
+	if all(type(x) is BInt for x in bounds):
+		return BVector(packed=range(*f(*[x.value for x in bounds])))
+
+@BBuiltin('Ui', 'Uptoinc', code=')U(r')
+def builtin_upto_inclusive(self, context, looping=False):
+	"""List the integers in the interval [1, N]."""
+	native_or_code(self, context, functools.partial(integer_range,
+		lambda n: (1, n + 1)), 1)
+
+@BBuiltin('Uf', 'Upfrom', code=r'?_+U\{?+}|;p')
+def builtin_upfrom(self, context, looping=False):
+	"""List the integers in the half-open interval [M, N)."""
+	native_or_code(self, context, functools.partial(integer_range,
+		lambda m, n: (m, n)), 2)
+
 BBuiltin('Uc', 'Upfrominc', code=')Uf',
 	doc="""List the integers in the closed interval [M, N].""")
 BBuiltin('Uo', 'Upfromexc', code='$)$Uf',
 	doc="""List the integers in the open interval (M, N).""")
 
-BBuiltin('Di', 'Downfrominc', code='D0+',
-	doc="""List the integers in the closed interval [0, N] in reverse.""")
-BBuiltin('Dt', 'Downto', code=r'$?-D\{?+}|;p',
-	doc="""List the integers in the half-open interval (N, M] in reverse.""")
+@BBuiltin('Di', 'Downfrominc', code='D0+')
+def builtin_downfrom_inclusive(self, context, looping=False):
+	"""List the integers in the closed interval [0, N] in reverse."""
+	native_or_code(self, context, functools.partial(integer_range,
+		lambda n: (max(n, 0), -1, -1)), 1)
+
+@BBuiltin('Dt', 'Downto', code=r'$?-D\{?+}|;p')
+def builtin_downto(self, context, looping=False):
+	"""List the integers in the half-open interval (N, M] in reverse."""
+	native_or_code(self, context, functools.partial(integer_range,
+		lambda m, n: (m, n, -1)), 2)
 BBuiltin('Dc', 'Downtoinc', code='(Dt',
 	doc="""List the integers in the closed interval [N, M] in reverse.""")
 BBuiltin('Dp', 'Downtoexc', code='$($Dt',
@@ -2864,6 +3379,12 @@ def builtin_ravel(a):
 @signature(BSeq, _)
 def builtin_count(s, e):
 	"""Count the occurrences of a value in a sequence."""
+	if packed(s) and isinstance(e, BNum):
+		ev = e.value
+		if isinstance(ev, float) and is_integral(ev):
+			# Ranges only count integers in constant time
+			ev = int(ev)
+		return BInt(s.packed.count(ev))
 	if isinstance(s, BList):
 		return BInt(s.value.count(e))
 	elif isinstance(s, BStr):
@@ -2890,8 +3411,7 @@ def builtin_find(self, context, looping=False):
 	if not isinstance(s, BSeq):
 		raise BTypeError(self, (s, v))
 	if isinstance(v, BCallable):
-		sv = s.simplify().value
-		for x in sv:
+		for x in s.elements():
 			context.push(x)
 			v.apply(context)
 			if context.pop():
@@ -2899,6 +3419,8 @@ def builtin_find(self, context, looping=False):
 				break
 		else:
 			f = BFloat(float('nan'))
+	elif lazy(s) or streaming(s):
+		f = BInt(next((i for (i, x) in enumerate(s.elements()) if x == v), -1))
 	elif isinstance(s, BList):
 		try:
 			f = BInt(s.value.index(v))
@@ -2946,7 +3468,7 @@ def builtin_count(s, v):
 		except ValueError:
 			return BInt(-1)
 
-@BBuiltin('Rm', 'Remove')
+@BBuiltin('Rm', 'Remove', mutating=True)
 @signature(BSeq, _)
 def builtin_remove(s, e):
 	"""Remove the first occurrence of a value from a sequence."""
@@ -2954,6 +3476,7 @@ def builtin_remove(s, e):
 		sv = s.value
 		try:
 			sv.remove(e)
+			s.changed()
 		except ValueError:
 			pass
 		return s
@@ -3218,14 +3741,28 @@ def builtin_any_not(s):
 	"""Test whether any of the values in a sequence are true."""
 	return BInt(any(not x for x in s.simplify().value))
 
-BBuiltin('+s', 'Σ', '∑', 'Sum', code=r'\+*',
-	doc="""Fold a sequence with addition (i.e. find its sum).""")
+@BBuiltin('+s', 'Σ', '∑', 'Sum')
+def builtin_sum(self, context, looping=False):
+	"""Fold a sequence with addition (i.e. find its sum)."""
+	a = context.pop()
+	if packed(a) and a.packed:
+		context.push(a.box(functools.reduce(operator.add, a.packed)))
+		return
+	context.push(a)
+	context.apply_code(r'\+*')
 BBuiltin('+n', '∫', 'Σn', '∑n', code='[0]$++s',
 	doc="""Fold a sequence with addition, using 0 as the empty sum.""")
 BBuiltin('+l', 'Σl', '∑l', code='[[]]$++s',
 	doc="""Fold a sequence with concatenation, using [] as the empty sum.""")
-BBuiltin('*s', 'Π', '∏', 'Product', code=r'\**',
-	doc="""Fold a sequence with multiplication (i.e. find its product).""")
+@BBuiltin('*s', 'Π', '∏', 'Product')
+def builtin_product(self, context, looping=False):
+	"""Fold a sequence with multiplication (i.e. find its product)."""
+	a = context.pop()
+	if packed(a) and a.packed:
+		context.push(a.box(functools.reduce(operator.mul, a.packed)))
+		return
+	context.push(a)
+	context.apply_code(r'\**')
 BBuiltin('*n', 'Πn', '∏n', code='[1]$+*s',
 	doc="""Fold a sequence with multiplication, using 1 as the empty product.""")
 
@@ -3271,6 +3808,8 @@ def builtin_shape(a):
 def builtin_choices(s, n):
 	"""List all combinations of N items from a sequence."""
 	sv = s.simplify().value
+	if isinstance(n, BInt) and n.value >= 0:
+		return BLazyList(source=BCandidates(n.value, s, sv))
 	nv = n.simplify().value
 	cv = [BList(c).convert(s) for c in itertools.combinations(sv, nv)]
 	return BList(cv)
@@ -3280,6 +3819,8 @@ def builtin_choices(s, n):
 def builtin_rep_choices(s, n):
 	"""List all combinations with replacement of N items from a sequence."""
 	sv = s.simplify().value
+	if isinstance(n, BInt) and n.value >= 0:
+		return BLazyList(source=BRepeatedCandidates(n.value, s, sv))
 	nv = n.simplify().value
 	cv = [BList(c).convert(s) for c in
 		itertools.combinations_with_replacement(sv, nv)]
@@ -3342,7 +3883,7 @@ def builtin_cartesian_product(a, b):
 	s = min([a, b], key=lambda x: x.rank)
 	av = a.simplify().value
 	bv = b.simplify().value
-	return BList([BList([x, y]).convert(s) for x in av for y in bv])
+	return BLazyList(source=BProduct(s, av, bv))
 
 BBuiltin('Subset', '⊆', '⊂', code='-!',
 	doc="""Test whether a sequence is a subset of another sequence.""")
@@ -3361,10 +3902,25 @@ BBuiltin('Psuperset', '⊋', code='$Psubset',
 def builtin_get(s, i):
 	"""Get the item in a sequence at an index. Non-sequences are unmodified."""
 	if isinstance(s, BSeq):
-		return s.simplify().value[i.value]
+		return s.item(i.value)
 	return s
 
-@BBuiltin('[s', 'Set')
+def set_item(s, i, v):
+	"""Return a sequence with the item at an index set to a value."""
+	if isinstance(s, BStr):
+		if not -len(s.value) <= i < len(s.value):
+			raise IndexError('list assignment index out of range')
+		i %= len(s.value)
+		return BStr(s.value[:i] + str(v.convert(s)) + s.value[i+1:])
+	if roped(s):
+		s.update(i, v)
+		return s
+	x = s.simplify()
+	x.value[i] = v
+	x.changed()
+	return x.convert(s)
+
+@BBuiltin('[s', 'Set', mutating=True)
 def builtin_set(self, context, looping=False):
 	"""Set the item in a sequence at an index to a value."""
 	v = context.pop()
@@ -3374,11 +3930,9 @@ def builtin_set(self, context, looping=False):
 		s, i = i, s
 	if not isinstance(s, BSeq) or not isinstance(i, BInt):
 		raise BTypeError(self, (s, i))
-	x = s.simplify()
-	x.value[i.value] = v
-	context.push(x.convert(s))
+	context.push(set_item(s, i.value, v))
 
-@BBuiltin(']s', 'Setr')
+@BBuiltin(']s', 'Setr', mutating=True)
 def builtin_setr(self, context, looping=False):
 	"""Set a value as the item in a sequence at an index."""
 	s = context.pop()
@@ -3388,16 +3942,20 @@ def builtin_setr(self, context, looping=False):
 		s, i = i, s
 	if not isinstance(s, BSeq) or not isinstance(i, BInt):
 		raise BTypeError(self, (s, i))
-	x = s.simplify()
-	x.value[i.value] = v
-	context.push(x.convert(s))
+	context.push(set_item(s, i.value, v))
 
-@BBuiltin('[d', 'Del', 'Delete')
+@BBuiltin('[d', 'Del', 'Delete', mutating=True)
 @signature(BSeq, BInt)
 def builtin_del(s, i):
 	"""Delete the item in a sequence at an index."""
+	if isinstance(s, BStr):
+		return BStr(s.value[:i.value] + s.value[i.value+1:])
+	if roped(s):
+		s.delete(i.value)
+		return s
 	x = s.simplify()
 	x.value = x.value[:i.value] + x.value[i.value+1:]
+	x.changed()
 	return x.convert(s)
 
 @BBuiltin('Ss', 'Slice')
@@ -3414,7 +3972,6 @@ def builtin_slice(self, context, looping=False):
 		if not isinstance(b, BSeq):
 			raise BTypeError(self, a)
 		s = b
-		sv = b.convert(BList()).value
 		av = a.convert(BList()).value
 		if not all(isinstance(x, BInt) for x in av):
 			raise BTypeError(self, (b, a))
@@ -3429,14 +3986,12 @@ def builtin_slice(self, context, looping=False):
 		b = context.pop()
 		if isinstance(b, BSeq):
 			s = b
-			sv = b.convert(BList()).value
 			stop = a.value
 			start = step = None
 		elif isinstance(b, BInt):
 			c = context.pop()
 			if isinstance(c, BSeq):
 				s = c
-				sv = c.convert(BList()).value
 				start = b.value
 				stop = a.value
 				step = None
@@ -3444,7 +3999,6 @@ def builtin_slice(self, context, looping=False):
 				d = context.pop()
 				if isinstance(d, BSeq):
 					s = d
-					sv = d.convert(BList()).value
 					start = c.value
 					stop = b.value
 					step = a.value
@@ -3456,6 +4010,21 @@ def builtin_slice(self, context, looping=False):
 			raise BTypeError(self, (b, a))
 	else:
 		raise BTypeError(self, a)
+	if isinstance(s, BStr):
+		context.push(s.window(slice(start, stop, step)))
+		return
+	if packed(s):
+		context.push(BVector(packed=s.packed[start:stop:step]))
+		return
+	if lazy(s) or roped(s):
+		context.push(s.window(slice(start, stop, step)))
+		return
+	if streaming(s) and (step is None or step > 0) and all(x is None or
+		x >= 0 for x in (start, stop)):
+		context.push(BStream(source=itertools.islice(s.elements(), start,
+			stop, step)))
+		return
+	sv = s.convert(BList()).value
 	context.push(BList(sv[start:stop:step]).convert(s))
 
 
@@ -3486,15 +4055,17 @@ BBuiltin('#gd', 'Getvaluedefault', 'Lookupdefault', code=r'@n,t#k\{#g;p}\;tI',
 	doc="""Get the value associated with a key in a list of [key value] pairs,
 	or a default value if the key does not exist.""")
 
-@BBuiltin('#s', 'Setkey', 'Setvalue', 'Store')
+@BBuiltin('#s', 'Setkey', 'Setvalue', 'Store', mutating=True)
 @signature(BList, _, _)
 def builtin_setvalue(s, k, v):
 	"""Set the value associated with a key in a list of [key value] pairs."""
 	for p in s.value:
 		if p.value[0] == k:
 			p.value[1] = v
+			p.changed()
 			return s
 	s.value.append(BList([k, v]))
+	s.changed()
 	return s
 
 @BBuiltin('#d', 'Delkey', 'Deletekey')
@@ -3504,6 +4075,39 @@ def builtin_delkey(s, k):
 	return BList([p for p in s.value if p.value[0] != k])
 
 
+#################### Stream functions ####################
+
+@BBuiltin('Itr', 'Iterate')
+def builtin_iterate(self, context, looping=False):
+	"""
+	Stream of a value and the results of applying a function to it again
+	and again, which is applied as the items are asked for.
+	"""
+	f = context.pop()
+	x = context.pop()
+	if not isinstance(f, BCallable):
+		raise BTypeError(self, (x, f))
+	context.push(BStream(source=iterated(f, x, isolation(context))))
+
+@BBuiltin('Cf', 'Countfrom')
+@signature(BNum)
+def builtin_count_from(n):
+	"""Stream of a number and the numbers counting up by 1 from it."""
+	return BStream(source=(type(n)(n.value + i) for i in itertools.count()))
+
+@BBuiltin('Cy', 'Cycle')
+@signature(BSeq)
+def builtin_cycle(s):
+	"""Stream of the items of a sequence over and over."""
+	return BStream(source=(x.copy() for x in itertools.cycle(snapshot(s))))
+
+@BBuiltin('Rpt', 'Repeatedly')
+@signature(_)
+def builtin_repeatedly(x):
+	"""Stream of a value over and over."""
+	return BStream(source=(x.copy() for _ in itertools.count()))
+
+
 #################### Control flow functions ####################
 
 @BBuiltin('I', 'If')
@@ -3560,7 +4164,7 @@ def builtin_while(self, context, looping=False):
 BBuiltin('Wt', 'Whiletrue', 'Forever', code='1$W',
 	doc="""Repeatedly apply a function forever.""")
 
-@BBuiltin('Bk', 'Break', '↯')
+@BBuiltin('Bk', 'Break', '↯', impure=True)
 def builtin_break(self, context, looping=False):
 	"""Break out of a number of loops."""
 	a = context.pop()
@@ -3573,20 +4177,21 @@ def builtin_break(self, context, looping=False):
 		if ctx.looping:
 			ctx.looping = False
 			av -= 1
-		ctx = ctx.parent
+		# A thread's block cannot break out of the loops that started it
+		ctx = None if ctx.task else ctx.parent
 	if ctx:
 		ctx.broken = True
 
 BBuiltin('Br', '↵', code='1Bk', doc="""Break out of the current loop.""")
 
-@BBuiltin('Ex', 'Exit', '∎', 'Ω')
+@BBuiltin('Ex', 'Exit', '∎', 'Ω', impure=True)
 def builtin_break(self, context, looping=False):
-	"""Exit the script."""
+	"""Exit the script, or the block of the thread it is applied in."""
 	ctx = context
 	while ctx:
 		ctx.broken = BContext.EXITED
 		ctx.looping = False
-		ctx = ctx.parent
+		ctx = None if ctx.task else ctx.parent
 
 @BBuiltin('Rt', 'Ret', 'Return', '↩', '↪')
 def builtin_return(self, context, looping=False):
@@ -3601,7 +4206,7 @@ def builtin_return(self, context, looping=False):
 	if ctx:
 		ctx.broken = True
 
-@BBuiltin('Ll', 'Label', 'Here')
+@BBuiltin('Ll', 'Label', 'Here', impure=True)
 def builtin_label(self, context, looping=False):
 	"""The program counter."""
 	main = context
@@ -3609,7 +4214,7 @@ def builtin_label(self, context, looping=False):
 		main = main.parent
 	context.push(BInt(main.counter + 1))
 
-@BBuiltin('Go', 'Goto')
+@BBuiltin('Go', 'Goto', impure=True)
 def builtin_goto(self, context, looping=False):
 	"""Set the program counter to a number (negative leaves unchanged)."""
 	a = context.pop()
@@ -3670,6 +4275,10 @@ def builtin_translate(s, t, r):
 	sequence are unchanged. Items in the search sequence without
 	corresponding ones in the replacement sequence are deleted.
 	"""
+	if areinstances((s, t, r), BStr):
+		table = dict((ord(c), None) for c in t.value)
+		table.update((ord(x), y) for (x, y) in zip(t.value, r.value))
+		return BStr(s.value.translate(table))
 	sv = s.convert(BList()).value
 	tv = t.convert(BList()).value
 	rv = r.convert(BList()).value
@@ -3687,6 +4296,9 @@ def builtin_translate_or_delete(s, t, r):
 	sequence, and items in the search sequence without corresponding ones
 	in the replacement sequence, are deleted.
 	"""
+	if areinstances((s, t, r), BStr):
+		table = dict(zip(t.value, r.value))
+		return BStr(''.join(table.get(c, '') for c in s.value))
 	sv = s.convert(BList()).value
 	tv = t.convert(BList()).value
 	rv = r.convert(BList()).value
@@ -4056,7 +4668,7 @@ def builtin_encoding(self, context, looping=False):
 	"""The character encoding for input sources."""
 	context.push(BStr(context.encoding))
 
-@BBuiltin('<e', 'Setenc', 'Setencoding')
+@BBuiltin('<e', 'Setenc', 'Setencoding', impure=True)
 def builtin_encoding(self, context, looping=False):
 	"""Set the character encoding for input sources."""
 	e = context.pop()
@@ -4064,86 +4676,135 @@ def builtin_encoding(self, context, looping=False):
 		raise BTypeError(self, e)
 	context.encoding = e.convert(BStr()).value
 
-@BBuiltin('%g', 'Getenv')
-@signature(BSeq)
-def builtin_getenv(n):
+@BBuiltin('%g', 'Getenv', impure=True)
+@signature(BSeq, state=True)
+def builtin_getenv(state, n):
 	"""Get an environment variable by name."""
 	nv = n.convert(BStr()).value
-	vv = os.environ.get(nv, None)
+	vv = state.getenv(nv)
 	if vv is not None:
 		return BStr(vv)
 	return BInt(0)
 
-@BBuiltin('>i', 'Read', '◊')
-@signature()
-def builtin_read():
+@BBuiltin('>i', 'Read', '◊', impure=True)
+def builtin_read(self, context, looping=False):
 	"""Read up to EOF from standard input."""
-	return BStr(sys.stdin.read())
+	context.push(BStr(context.reader().read()))
 
-@BBuiltin('>c', 'Readchar')
-@signature()
-def builtin_readchar():
+@BBuiltin('>c', 'Readchar', impure=True)
+def builtin_readchar(self, context, looping=False):
 	"""Read a single character from standard input."""
-	rv = sys.stdin.read(1)
+	rv = context.reader().read(1)
 	if not rv:
-		return BInt(-1)
-	return BStr(rv).simplify().value[0]
+		context.push(BInt(-1))
+		return
+	context.push(BStr(rv).simplify().value[0])
 
-@BBuiltin('>n', 'Readline')
-@signature()
-def builtin_readline():
+@BBuiltin('>n', 'Readline', impure=True)
+def builtin_readline(self, context, looping=False):
 	"""Read up to a newline from standard input."""
-	return BStr(sys.stdin.readline())
+	context.push(BStr(context.reader().readline()))
 
-@BBuiltin('>o', 'Readstring')
-@signature()
-def builtin_readstring():
+@BBuiltin('>o', 'Readstring', impure=True)
+def builtin_readstring(self, context, looping=False):
 	"""Read up to a null character from standard input."""
+	stdin = context.reader()
 	rv = []
 	while True:
-		c = sys.stdin.read(1)
+		c = stdin.read(1)
 		if not c or c == '\0':
 			break
 		rv.append(c)
-	return BStr(''.join(rv))
+	context.push(BStr(''.join(rv)))
 
-@BBuiltin('>w', 'Readword', 'Readtoken')
-@signature()
-def builtin_readtoken():
+@BBuiltin('>w', 'Readword', 'Readtoken', impure=True)
+def builtin_readtoken(self, context, looping=False):
 	"""
 	Read up to a whitespace character from standard input.
 	Leading whitespace will be ignored.
 	"""
+	stdin = context.reader()
 	rv = []
 	while True:
-		c = sys.stdin.read(1)
+		c = stdin.read(1)
 		if not c:
 			break
 		elif not c.isspace():
 			rv.append(c)
 		elif rv:
 			break
-	return BStr(''.join(rv))
+	context.push(BStr(''.join(rv)))
 
 BBuiltin('>m', 'Readnum', 'Readint', code='>wNr',
 	doc="""Read a number from standard input.""")
 
-@BBuiltin('>t', 'Readupto')
-@signature((BInt, BSeq))
-def builtin_readupto(t):
+@BBuiltin('>t', 'Readupto', impure=True)
+def builtin_readupto(self, context, looping=False):
 	"""Read up to a given character or characters from standard input."""
+	t = context.pop()
+	if not isinstance(t, (BInt, BSeq)):
+		raise BTypeError(self, t)
+	stdin = context.reader()
 	if t == BInt(-1):
-		return BStr(sys.stdin.read())
+		context.push(BStr(stdin.read()))
+		return
 	tv = set(t.convert(BStr()).value)
 	rv = []
 	while True:
-		c = sys.stdin.read(1)
+		c = stdin.read(1)
 		if not c or c in tv:
 			break
 		rv.append(c)
-	return BStr(''.join(rv))
+	context.push(BStr(''.join(rv)))
+
+def read_file(filename, encoding):
+	"""Read a text file, or return its error code, or -1."""
+	try:
+		with codecs.open(filename, 'rU', encoding) as file:
+			rv = file.read()
+		return BStr(rv)
+	except EnvironmentError as ex:
+		return BInt(ex.errno)
+	except Exception:
+		return BInt(-1)
+
+def read_binary(filename, encoding):
+	"""Read the bytes of a binary file, or return its error code, or -1."""
+	try:
+		with codecs.open(filename, 'rb', encoding) as file:
+			rv = file.read()
+		return BVector.ints(ord(b) for b in rv)
+	except EnvironmentError as ex:
+		return BInt(ex.errno)
+	except Exception:
+		return BInt(-1)
+
+def read_url(url, encoding):
+	"""Read a network resource, or return its HTTP status code, or -1."""
+	try:
+		handle = urllib.urlopen(url)
+		rv = handle.read()
+		handle.close()
+		return BStr(rv.decode(encoding))
+	except EnvironmentError as ex:
+		return BInt(ex.errno)
+	except Exception:
+		return BInt(-1)
+
+def run_command(cmd, env=None):
+	"""Run a system command and return its output or error code."""
+	argv = shlex.split(cmd)
+	try:
+		rv = subprocess.check_output(argv, env=env)
+		return BStr(rv)
+	except subprocess.CalledProcessError as ex:
+		return BInt(-ex.returncode)
+	except EnvironmentError as ex:
+		return BInt(ex.errno)
+	except Exception:
+		return BInt(-1)
 
-@BBuiltin('>f', 'Readfile')
+@BBuiltin('>f', 'Readfile', impure=True)
 def builtin_readfile(self, context, looping=False):
 	"""
 	Read the contents of a file with a given name.
@@ -4153,17 +4814,9 @@ def builtin_readfile(self, context, looping=False):
 	if not isinstance(f, BSeq):
 		raise BTypeError(self, f)
 	filename = f.convert(BStr()).value
-	try:
-		with codecs.open(filename, 'rU', context.encoding) as file:
-			rv = file.read()
-		c = BStr(rv)
-	except EnvironmentError as ex:
-		c = BInt(ex.errno)
-	except Exception:
-		c = BInt(-1)
-	context.push(c)
+	context.push(read_file(filename, context.encoding))
 
-@BBuiltin('>b', 'Readbinary')
+@BBuiltin('>b', 'Readbinary', impure=True)
 def builtin_readbinary(self, context, looping=False):
 	"""
 	Read the contents of a binary file with a given name.
@@ -4173,17 +4826,9 @@ def builtin_readbinary(self, context, looping=False):
 	if not isinstance(f, BSeq):
 		raise BTypeError(self, f)
 	filename = f.convert(BStr()).value
-	try:
-		with codecs.open(filename, 'rb', context.encoding) as file:
-			rv = file.read()
-		c = BList([BInt(ord(b)) for b in rv])
-	except EnvironmentError as ex:
-		c = BInt(ex.errno)
-	except Exception:
-		c = BInt(-1)
-	context.push(c)
+	context.push(read_binary(filename, context.encoding))
 
-@BBuiltin('>u', 'Readurl')
+@BBuiltin('>u', 'Readurl', impure=True)
 def builtin_readurl(self, context, looping=False):
 	"""
 	Read the contents of a network resource with a given URL.
@@ -4193,43 +4838,24 @@ def builtin_readurl(self, context, looping=False):
 	if not isinstance(u, BSeq):
 		raise BTypeError(self, u)
 	url = u.convert(BStr()).value
-	try:
-		handle = urllib.urlopen(url)
-		rv = handle.read()
-		handle.close()
-		c = BStr(rv.decode(context.encoding))
-	except EnvironmentError as ex:
-		c = BInt(ex.errno)
-	except Exception:
-		c = BInt(-1)
-	context.push(c)
+	context.push(read_url(url, context.encoding))
 
-@BBuiltin('>x', 'System', '⌘')
-@signature(BSeq)
-def builtin_system(c):
+@BBuiltin('>x', 'System', '⌘', impure=True)
+@signature(BSeq, state=True)
+def builtin_system(state, c):
 	"""
 	Execute a sequence as a system command and get the output or error code.
 	"""
-	cmd = c.convert(BStr()).value
-	argv = shlex.split(cmd)
-	try:
-		rv = subprocess.check_output(argv)
-		return BStr(rv)
-	except subprocess.CalledProcessError as ex:
-		return BInt(-ex.returncode)
-	except EnvironmentError as ex:
-		return BInt(ex.errno)
-	except Exception:
-		return BInt(-1)
+	return run_command(c.convert(BStr()).value, state.environment())
 
 
 #################### Output functions ####################
 
-@BBuiltin('O', 'Out')
+@BBuiltin('O', 'Out', impure=True)
 def builtin_out(self, context, looping=False):
 	"""Print a value."""
 	a = context.top()
-	print(safe_string(a), end='')
+	print(safe_string(a), end='', file=context.writer())
 
 BBuiltin('P', 'Print', code='O;',
 	doc="""Pop and print a value.""")
@@ -4248,25 +4874,25 @@ BBuiltin('Pn', 'Println', code='On;',
 BBuiltin('Pfn', 'Printfln', code='Ofn;',
 	doc="""Format a string by a value, pop it, and print it followed by a newline.""")
 
-@BBuiltin('%s', 'Setenv')
-@signature(BSeq, _)
-def builtin_setenv(n, v):
+@BBuiltin('%s', 'Setenv', impure=True)
+@signature(BSeq, _, state=True)
+def builtin_setenv(state, n, v):
 	"""Set the named environment variable to a given value."""
 	nv = n.convert(BStr()).value
 	if isinstance(v, BNum):
 		vv = str(v)
 	else:
 		vv = v.convert(BStr()).value
-	os.environ[nv] = vv
+	state.setenv(nv, vv)
 
-@BBuiltin('%u', 'Unsetenv')
-@signature(BSeq)
-def builtin_setenv(n):
+@BBuiltin('%u', 'Unsetenv', impure=True)
+@signature(BSeq, state=True)
+def builtin_setenv(state, n):
 	"""Unset an environment variable by name."""
 	nv = n.convert(BStr()).value
-	del os.environ[nv]
+	state.unsetenv(nv)
 
-@BBuiltin('<f', 'Writefile')
+@BBuiltin('<f', 'Writefile', impure=True)
 def builtin_writefile(self, context, looping=False):
 	"""Write a value to the a file with a given name."""
 	f = context.pop()
@@ -4281,7 +4907,7 @@ def builtin_writefile(self, context, looping=False):
 	except Exception:
 		pass
 
-@BBuiltin('<b', 'Writebinary')
+@BBuiltin('<b', 'Writebinary', impure=True)
 def builtin_writebinary(self, context, looping=False):
 	"""Write a binary value to the a file with a given name."""
 	f = context.pop()
@@ -4296,7 +4922,7 @@ def builtin_writebinary(self, context, looping=False):
 	except Exception:
 		pass
 
-@BBuiltin('<a', 'Appendfile')
+@BBuiltin('<a', 'Appendfile', impure=True)
 def builtin_appendfile(self, context, looping=False):
 	"""Append a value to the a file with a given name."""
 	f = context.pop()
@@ -4311,7 +4937,7 @@ def builtin_appendfile(self, context, looping=False):
 	except Exception:
 		pass
 
-@BBuiltin('<c', 'Appendbinary')
+@BBuiltin('<c', 'Appendbinary', impure=True)
 def builtin_appendbinary(self, context, looping=False):
 	"""Append a binary value to the a file with a given name."""
 	f = context.pop()
@@ -4327,6 +4953,216 @@ def builtin_appendbinary(self, context, looping=False):
 		pass
 
 
+#################### Parallel functions ####################
+
+def parallel_operands(self, context):
+	"""Pop a callable and a sequence or number, in either order."""
+	b = context.pop()
+	a = context.pop()
+	if isinstance(a, BCallable) and not isinstance(b, BCallable):
+		a, b = b, a
+	if not isinstance(a, (BSeq, BNum)) or not isinstance(b, BCallable):
+		raise BTypeError(self, (a, b))
+	if isinstance(a, BSeq):
+		return (a, b, list(a.simplify().value))
+	return (a, b, [BInt(x) for x in range(int(a.simplify().value))])
+
+@BBuiltin('Pmap', 'Pm')
+def builtin_parallel_map(self, context, looping=False):
+	"""
+	Map a function onto a sequence in parallel worker processes.
+	Map a function onto the interval [0, N) in parallel worker processes.
+	
+	Impure functions, and functions that cannot be sent to worker processes,
+	are mapped serially as with Map.
+	"""
+	(a, b, av) = parallel_operands(self, context)
+	results = parallel_apply('map', b, av, context)
+	if results is None:
+		context.push(a)
+		context.push(b)
+		builtins['|'].apply(context)
+		return
+	context.push(BList([v for r in results for v in r]))
+
+@BBuiltin('Pfilter', 'Pselect')
+def builtin_parallel_filter(self, context, looping=False):
+	"""
+	Filter a sequence by a predicate function in parallel worker processes.
+	Filter the interval [0, N) by a predicate function in parallel worker
+	processes.
+	
+	Impure functions, and functions that cannot be sent to worker processes,
+	are applied serially as with Filter.
+	"""
+	(a, b, av) = parallel_operands(self, context)
+	results = parallel_apply('filter', b, av, context)
+	if results is None:
+		context.push(a)
+		context.push(b)
+		builtins['&'].apply(context)
+		return
+	c = BList([x for (x, r) in zip(av, results) if r])
+	context.push(c.convert(a) if isinstance(a, BSeq) else c)
+
+@BBuiltin('Psortby', 'Psb')
+def builtin_parallel_sort_by(self, context, looping=False):
+	"""
+	Sort a sequence by a key function computed in parallel worker processes.
+	
+	Impure functions, and functions that cannot be sent to worker processes,
+	are applied serially as with Sortby.
+	"""
+	(a, b, av) = parallel_operands(self, context)
+	if not isinstance(a, BSeq):
+		raise BTypeError(self, (a, b))
+	keys = parallel_apply('sort', b, av, context)
+	if keys is None:
+		context.push(a)
+		context.push(b)
+		builtins['S'].apply(context)
+		return
+	order = sorted(range(len(av)), key=lambda i: (keys[i], i))
+	context.push(BList([av[i] for i in order]).convert(a))
+
+def search_operands(self, context):
+	"""Pop a sequence, a candidate kind, and a predicate function."""
+	p = context.pop()
+	k = context.pop()
+	s = context.pop()
+	if not isinstance(s, BSeq) or not isinstance(p, BCallable):
+		raise BTypeError(self, (s, k, p))
+	if k is builtins['U']:
+		kind = 'permutations'
+	elif k is builtins['C']:
+		kind = 'subsets'
+	elif isinstance(k, BNum):
+		kind = int(k.simplify().value)
+	else:
+		raise BTypeError(self, (s, k, p))
+	return (s, kind, p)
+
+def search(self, context, first):
+	(s, kind, p) = search_operands(self, context)
+	sv = s.simplify().value
+	ranks = parallel_search(kind, p, s, context, first)
+	if ranks is not None:
+		return [candidate(s, sv, next(candidates(kind, len(sv), r, 1)))
+			for r in ranks]
+	hits = []
+	for indices in candidates(kind, len(sv), 0, space_size(kind, len(sv))):
+		x = candidate(s, sv, indices)
+		context.push(x)
+		p.apply(context)
+		if context.pop():
+			hits.append(x)
+			if first:
+				break
+	return hits
+
+@BBuiltin('Psearch', 'Pfind')
+def builtin_parallel_search(self, context, looping=False):
+	"""
+	Take the first permutation (\\U), subset (\\C), or combination of N
+	items (N) of a sequence that satisfies a predicate function, or NaN if
+	none satisfies it. The candidates are tested in parallel worker
+	processes without listing them, in the order Permutations, Powerset, or
+	Choices would list them.
+	
+	Impure functions, and functions that cannot be sent to worker processes,
+	are applied serially.
+	"""
+	hits = search(self, context, True)
+	context.push(hits[0] if hits else BFloat(float('nan')))
+
+@BBuiltin('Psearchall', 'Pfindall')
+def builtin_parallel_search_all(self, context, looping=False):
+	"""
+	List the permutations (\\U), subsets (\\C), or combinations of N items
+	(N) of a sequence that satisfy a predicate function, testing them in
+	parallel worker processes without listing them all.
+	
+	Impure functions, and functions that cannot be sent to worker processes,
+	are applied serially.
+	"""
+	context.push(BList(search(self, context, False)))
+
+
+#################### Concurrency functions ####################
+
+# Threads share the variables of the scopes they were started in. Reading
+# or writing one variable is atomic, but a sequence of reads and writes,
+# such as incrementing a variable, is not: apply it with Lock to keep other
+# threads from interleaving their own Locked code with it.
+
+def join_threads(self, a):
+	"""Join a thread, or a list of threads, and return the values they left."""
+	if isinstance(a, BThread):
+		return a.join()
+	if isinstance(a, BList) and areinstances(a.value, BThread):
+		return [BList([x for t in a.value for x in t.join()])]
+	raise BTypeError(self, a)
+
+@BBuiltin('Spawn', 'Thread', 'Th', impure=True)
+def builtin_spawn(self, context, looping=False):
+	"""
+	Start applying a function to a value in a background thread, on a stack
+	of its own, and push the thread. Map Spawn onto a list to start a thread
+	for each item.
+	"""
+	b = context.pop()
+	a = context.pop()
+	if not isinstance(b, BCallable):
+		raise BTypeError(self, (a, b))
+	t = BThread()
+	t.start(b, a, context)
+	context.push(t)
+
+@BBuiltin('Tj', 'Tjoin', impure=True)
+def builtin_join(self, context, looping=False):
+	"""
+	Wait for a thread to finish, and push the values it left on its stack.
+	Wait for a list of threads to finish, and push a list of the values they
+	left, in order, as Map would.
+
+	An error that stopped a thread is raised again when it is joined.
+	"""
+	for x in join_threads(self, context.pop()):
+		context.push(x)
+
+@BBuiltin('Chan', 'Channel', impure=True)
+@signature()
+def builtin_channel():
+	"""A new channel for sending values between threads."""
+	return BChannel()
+
+@BBuiltin('Send', impure=True)
+@signature(BChannel, _)
+def builtin_send(a, b):
+	"""Send a value over a channel."""
+	a.send(b)
+
+@BBuiltin('Recv', 'Receive', impure=True)
+@signature(BChannel)
+def builtin_receive(a):
+	"""Wait for a value to be sent over a channel, and take it."""
+	return a.receive()
+
+@BBuiltin('Lk', 'Lock', 'Synchronized', impure=True)
+def builtin_lock(self, context, looping=False):
+	"""
+	Apply a function while holding the lock shared by all of a script's
+	threads, so no other thread runs Locked code until it is done. Locks
+	can be nested, but a thread should not wait for another while holding
+	the lock.
+	"""
+	a = context.pop()
+	if not isinstance(a, BCallable):
+		raise BTypeError(self, a)
+	with context.state.lock:
+		a.apply(context)
+
+
 #################### Meta functions ####################
 
 @BBuiltin('Ty', 'Type')
@@ -4343,6 +5179,8 @@ def builtin_type(a):
 	6 = procedure
 	7 = function
 	8 = builtin
+	9 = thread
+	10 = channel
 	"""
 	return BInt(a.rank)
 
@@ -4358,6 +5196,26 @@ def builtin_function(a):
 	"""Wrap a value in a function block."""
 	return BFunc(a.tokenize())
 
+@BBuiltin('Mm', 'Memo', 'Memoize')
+@signature(BCallable, BNum, BNum)
+def builtin_memoize(a, n, k):
+	"""
+	Wrap a block taking N arguments in a cache of its results, keeping the
+	K most recently used (or all, if K is 0).
+	"""
+	if not isinstance(a, BBlock):
+		a = a.convert(BFunc())
+	table = BMemoTable(int(n.simplify().value), int(k.simplify().value))
+	return BMemo(a.value, a.scope, a.scoped, table)
+
+@BBuiltin('Mms', 'Memostats')
+@signature(BMemo)
+def builtin_memo_stats(a):
+	"""Hits, misses, and cached entries of a memoized block."""
+	table = a.table
+	return BList([BInt(table.hits), BInt(table.misses),
+		BInt(len(table.cache))])
+
 @BBuiltin('G', 'Show')
 @signature(_)
 def builtin_show(a):
@@ -4370,7 +5228,8 @@ def builtin_repr(a):
 	"""Convert a value to its Birdiescript representation."""
 	return BStr(repr(a))
 
-@BBuiltin('X', 'Exec', 'Eval', 'Execute', 'Evaluate', 'Apply', 'Λ', '⌥')
+@BBuiltin('X', 'Exec', 'Eval', 'Execute', 'Evaluate', 'Apply', 'Λ', '⌥',
+	impure=True)
 def builtin_eval(self, context, looping=False):
 	"""
 	Evaluate a sequence as a Birdiescript string.
@@ -4385,7 +5244,7 @@ def builtin_eval(self, context, looping=False):
 		# Execute a block
 		a.apply(context)
 
-@BBuiltin('Xp', 'Execpy', 'Python')
+@BBuiltin('Xp', 'Execpy', 'Python', impure=True)
 def builtin_exec_python(self, context, looping=False):
 	"""
 	Execute a sequence as Python code.
@@ -4472,7 +5331,7 @@ def builtin_builtins(self, context, looping=False):
 
 #################### Pseudorandomness functions ####################
 
-@BBuiltin('Rd', 'Seed')
+@BBuiltin('Rd', 'Seed', impure=True)
 def builtin_seed(self, context, looping=False):
 	"""
 	Seed the random number generator with an integer, or with the
@@ -4481,102 +5340,103 @@ def builtin_seed(self, context, looping=False):
 	a = context.top()
 	if isinstance(a, BInt):
 		context.pop()
-		random.seed(a.value)
+		context.state.random.seed(a.value)
 	else:
-		random.seed()
+		context.state.random.seed()
 
-@BBuiltin('Ra', 'Rand', 'Random')
-@signature()
-def builtin_rand():
+@BBuiltin('Ra', 'Rand', 'Random', impure=True)
+@signature(state=True)
+def builtin_rand(state):
 	"""Choose a random variate uniformly in the interval [0, 1)."""
-	return BFloat(random.random())
+	return BFloat(state.random.random())
 
-@BBuiltin('Rn', 'Randnorm', 'Randomnormal', 'Randgauss', 'Randomgaussian')
-@signature(BReal, BReal)
-def builtin_random_normal(mu, sigma):
+@BBuiltin('Rn', 'Randnorm', 'Randomnormal', 'Randgauss',
+	'Randomgaussian', impure=True)
+@signature(BReal, BReal, state=True)
+def builtin_random_normal(state, mu, sigma):
 	"""
 	Choose a random variate from a normal (Gaussian) distribution,
 	given the parameters mu and sigma.
 	"""
-	return BFloat(random.gauss(mu.value, sigma.value))
+	return BFloat(state.random.gauss(mu.value, sigma.value))
 
-@BBuiltin('Rl', 'Randlognorm', 'Randomlognormal')
-@signature(BReal, BReal)
-def builtin_random_log_normal(mu, sigma):
+@BBuiltin('Rl', 'Randlognorm', 'Randomlognormal', impure=True)
+@signature(BReal, BReal, state=True)
+def builtin_random_log_normal(state, mu, sigma):
 	"""
 	Choose a random variate from a log-normal distribution,
 	given the parameters mu and sigma.
 	"""
-	return BFloat(random.lognormvariate(mu.value, sigma.value))
+	return BFloat(state.random.lognormvariate(mu.value, sigma.value))
 
-@BBuiltin('Rf', 'Randuni', 'Randomuniform')
-@signature(BReal, BReal)
-def builtin_random_uniform(a, b):
+@BBuiltin('Rf', 'Randuni', 'Randomuniform', impure=True)
+@signature(BReal, BReal, state=True)
+def builtin_random_uniform(state, a, b):
 	"""Choose a random variate uniformly in the interval [A, B)."""
-	return BFloat(random.uniform(a.value, b.value))
+	return BFloat(state.random.uniform(a.value, b.value))
 
-@BBuiltin('Rb', 'Randbeta', 'Randombeta')
-@signature(BReal, BReal)
-def builtin_random_beta(alpha, beta):
+@BBuiltin('Rb', 'Randbeta', 'Randombeta', impure=True)
+@signature(BReal, BReal, state=True)
+def builtin_random_beta(state, alpha, beta):
 	"""
 	Choose a random variate from a beta distribution,
 	given the parameters alpha > 0 and beta > 0.
 	"""
-	return BFloat(random.betavariate(alpha.value, beta.value))
+	return BFloat(state.random.betavariate(alpha.value, beta.value))
 
-@BBuiltin('Ru', 'Randtri', 'Randomtriangluar')
-@signature(BReal, BReal, BReal)
-def builtin_random_triangular(low, high, mode):
+@BBuiltin('Ru', 'Randtri', 'Randomtriangluar', impure=True)
+@signature(BReal, BReal, BReal, state=True)
+def builtin_random_triangular(state, low, high, mode):
 	"""
 	Choose a random variate from a triangular distribution,
 	given the lower limit, upper limit, and mode.
 	"""
-	return BFloat(random.triangular(low.value, high.value, mode.value))
+	return BFloat(state.random.triangular(low.value, high.value, mode.value))
 
-@BBuiltin('Rg', 'Randgamma', 'Randomgamma')
-@signature(BReal, BReal)
-def builtin_random_gamma(alpha, beta):
+@BBuiltin('Rg', 'Randgamma', 'Randomgamma', impure=True)
+@signature(BReal, BReal, state=True)
+def builtin_random_gamma(state, alpha, beta):
 	"""
 	Choose a random variate from a gamma distribution,
 	given the parameters alpha and beta.
 	"""
-	return BFloat(random.gammavariate(alpha.value, beta.value))
+	return BFloat(state.random.gammavariate(alpha.value, beta.value))
 
-@BBuiltin('Ro', 'Randpareto', 'Randompareto')
-@signature(BReal, BReal)
-def builtin_random_pareto(alpha):
+@BBuiltin('Ro', 'Randpareto', 'Randompareto', impure=True)
+@signature(BReal, BReal, state=True)
+def builtin_random_pareto(state, alpha):
 	"""
 	Choose a random variate from a Pareto distribution,
 	given the parameter alpha.
 	"""
-	return BFloat(random.paretovariate(alpha.value))
+	return BFloat(state.random.paretovariate(alpha.value))
 
-@BBuiltin('Rx', 'Randexp', 'Randomexponential')
-@signature(BReal, BReal)
-def builtin_random_exponential(lambd):
+@BBuiltin('Rx', 'Randexp', 'Randomexponential', impure=True)
+@signature(BReal, BReal, state=True)
+def builtin_random_exponential(state, lambd):
 	"""
 	Choose a random variate from an exponential distribution,
 	given the parameter lambda.
 	"""
-	return BFloat(random.expovariate(lambd.value))
+	return BFloat(state.random.expovariate(lambd.value))
 
-@BBuiltin('Rw', 'Randweibull', 'Randomweibull')
-@signature(BReal, BReal)
-def builtin_random_weibull(alpha, beta):
+@BBuiltin('Rw', 'Randweibull', 'Randomweibull', impure=True)
+@signature(BReal, BReal, state=True)
+def builtin_random_weibull(state, alpha, beta):
 	"""
 	Choose a random variate from a Weibull distribution,
 	given the parameters alpha and beta.
 	"""
-	return BFloat(random.weibullvariate(alpha.value, beta.value))
+	return BFloat(state.random.weibullvariate(alpha.value, beta.value))
 
-@BBuiltin('Rv', 'Randvm', 'Randomvonmises')
-@signature(BReal, BReal)
-def builtin_random_von_mises(mu, kappa):
+@BBuiltin('Rv', 'Randvm', 'Randomvonmises', impure=True)
+@signature(BReal, BReal, state=True)
+def builtin_random_von_mises(state, mu, kappa):
 	"""
 	Choose a random variate from a von Mises distribution,
 	given the parameters mu and kappa.
 	"""
-	return BFloat(random.vonmisesvariate(mu.value, kappa.value))
+	return BFloat(state.random.vonmisesvariate(mu.value, kappa.value))
 
 
 #################### Time functions ####################
@@ -4587,7 +5447,7 @@ def builtin_sleep(n):
 	"""Delay execution for a number of seconds."""
 	time.sleep(n.value)
 
-@BBuiltin('Ck', 'Clock')
+@BBuiltin('Ck', 'Clock', impure=True)
 @signature()
 def builtin_clock():
 	"""
@@ -4701,7 +5561,7 @@ def builtin_time(t):
 	elif isinstance(t, BList):
 		return BList(t.value[3:6])
 
-@BBuiltin('Tn', 'Now')
+@BBuiltin('Tn', 'Now', impure=True)
 @signature()
 def builtin_now():
 	"""Current time in seconds since the epoch (1970-01-01T00:00:00Z)."""
@@ -4816,12 +5676,15 @@ def builtin_fizzbuzz(n):
 	return BStr(fizzbuzz(n.value))
 
 @BBuiltin('Fbu', 'Fizzbuzzupto', code=r"\{3%v'Fizz*V5%v'Buzz*+V|lPn}-i",
-	altcode=r'\{FbPn}-i')
-@signature(BInt)
-def builtin_fizzbuzz_upto(n):
+	altcode=r'\{FbPn}-i', impure=True)
+def builtin_fizzbuzz_upto(self, context, looping=False):
 	"""Print the FizzBuzz string of each number in the interval [1, N]."""
+	n = context.pop()
+	if not isinstance(n, BInt):
+		raise BTypeError(self, n)
+	stdout = context.writer()
 	for i in range(1, n.value + 1):
-		print(fizzbuzz(i))
+		print(fizzbuzz(i), file=stdout)
 
 @BBuiltin('Csr', 'Caesar', 'Cæ', code=r'26%2*AuAlZ",@\{(+}*$Y')
 @signature(BSeq, BInt)
@@ -4840,13 +5703,13 @@ def builtin_caesar_cipher(s, n):
 BBuiltin('Rtt', 'Rotthirteen', code='13Csr', altcode='Aa13/1@s,~"$"Y',
 	doc="""ROT-13 cipher: shift the letters in a string by 13 places.""")
 
-@BBuiltin('Uu', 'Uuid')
+@BBuiltin('Uu', 'Uuid', impure=True)
 @signature()
 def builtin_uuid():
 	"""Generate a random Version 4 UUID as a list of 16 bytes."""
 	return BList([BInt(ord(x)) for x in uuid.uuid4().get_bytes()])
 
-@BBuiltin('Ua', 'Uuidascii')
+@BBuiltin('Ua', 'Uuidascii', impure=True)
 @signature()
 def builtin_uuid_ascii():
 	"""Generate a random Version 4 UUID as a string."""
@@ -4879,12 +5742,13 @@ BBuiltin('Obuiltins', 'Outbuiltins', 'Pbuiltins', 'Printbuiltins',
 	code=r'Builtins\(p|.*Pn',
 	doc="""Print the names of the built-in (global) functions.""")
 
-@BBuiltin('Apropos', 'Mank')
+@BBuiltin('Apropos', 'Mank', impure=True)
 def builtin_apropos(self, context, looping=False):
 	"""Print a list of built-in functions which have documentation matching a keyword."""
 	a = context.pop()
 	av = a.convert(BStr()).value
 	kwd = av.lower()
+	stdout = context.writer()
 	found = False
 	seen = set()
 	for (name, builtin) in sorted(builtins.items()):
@@ -4894,12 +5758,12 @@ def builtin_apropos(self, context, looping=False):
 		doc = builtin.apply.__doc__
 		if kwd in doc.lower() or any(kwd in name.lower() for name in builtin.value):
 			if found:
-				print()
-			print(' '.join(builtin.value))
+				print(file=stdout)
+			print(' '.join(builtin.value), file=stdout)
 			if doc:
 				lines = [d.lstrip('\t').rstrip() for d in doc.split('\n') if d]
 				desc = '\n'.join(lines).strip()
-				print(desc)
+				print(desc, file=stdout)
 			found = True
 	if not found:
-		print("No matches for '{}'.".format(av))
+		print("No matches for '{}'.".format(av), file=stdout)
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Ranking and unranking of permutations and combinations.
+
+Candidates are index tuples into a sequence of length N, enumerated in the
+same order as itertools.permutations and itertools.combinations. Subsets
+are enumerated by size, then in combinations order, as the Powerset
+builtin lists them. Any rank can be unranked directly, so a search space
+can be split into independent ranges without listing it.
+
+The sources at the end pick the items of sequences by rank, so lazy lists
+of permutations, subsets, combinations and products can be built on them.
+"""
+
+
+#################### Imports ####################
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import math # factorial
+
+from .core import *
+
+
+#################### Counting ####################
+
+def binomial(n, k):
+	"""The number of k-combinations of n items."""
+	if k < 0 or k > n:
+		return 0
+	k = min(k, n - k)
+	c = 1
+	for i in range(k):
+		c = c * (n - i) // (i + 1)
+	return c
+
+def space_size(kind, n):
+	"""
+	The number of candidates of a kind: 'permutations', 'subsets', or an
+	integer k for k-combinations.
+	"""
+	if kind == 'permutations':
+		return math.factorial(n)
+	elif kind == 'subsets':
+		return 2 ** n
+	return binomial(n, kind)
+
+
+#################### Permutations ####################
+
+def unrank_permutation(n, r):
+	pool = list(range(n))
+	p = []
+	for i in range(n, 0, -1):
+		(q, r) = divmod(r, math.factorial(i - 1))
+		p.append(pool.pop(q))
+	return p
+
+def next_permutation(p):
+	"""Advance a permutation in place; return False after the last one."""
+	i = len(p) - 2
+	while i >= 0 and p[i] > p[i+1]:
+		i -= 1
+	if i < 0:
+		return False
+	j = len(p) - 1
+	while p[j] < p[i]:
+		j -= 1
+	p[i], p[j] = p[j], p[i]
+	p[i+1:] = reversed(p[i+1:])
+	return True
+
+def permutations_from(n, start, count):
+	if count <= 0:
+		return
+	p = unrank_permutation(n, start)
+	yield tuple(p)
+	for _ in range(count - 1):
+		if not next_permutation(p):
+			return
+		yield tuple(p)
+
+
+#################### Combinations ####################
+
+def unrank_combination(n, k, r):
+	c = []
+	x = 0
+	for i in range(k):
+		b = binomial(n - x - 1, k - i - 1)
+		while r >= b:
+			r -= b
+			x += 1
+			b = binomial(n - x - 1, k - i - 1)
+		c.append(x)
+		x += 1
+	return c
+
+def next_combination(c, n):
+	"""Advance a combination in place; return False after the last one."""
+	k = len(c)
+	i = k - 1
+	while i >= 0 and c[i] == i + n - k:
+		i -= 1
+	if i < 0:
+		return False
+	c[i] += 1
+	for j in range(i + 1, k):
+		c[j] = c[j-1] + 1
+	return True
+
+def combinations_from(n, k, start, count):
+	if count <= 0 or start >= binomial(n, k):
+		return
+	c = unrank_combination(n, k, start)
+	yield tuple(c)
+	for _ in range(count - 1):
+		if not next_combination(c, n):
+			return
+		yield tuple(c)
+
+def subsets_from(n, start, count):
+	k = 0
+	while k <= n and start >= binomial(n, k):
+		start -= binomial(n, k)
+		k += 1
+	while count > 0 and k <= n:
+		m = min(count, binomial(n, k) - start)
+		for c in combinations_from(n, k, start, m):
+			yield c
+		count -= m
+		start = 0
+		k += 1
+
+
+#################### Candidates ####################
+
+def candidates(kind, n, start, count):
+	"""Yield count index tuples of a kind, starting from a rank."""
+	if kind == 'permutations':
+		return permutations_from(n, start, count)
+	elif kind == 'subsets':
+		return subsets_from(n, start, count)
+	return combinations_from(n, kind, start, count)
+
+
+#################### Sources ####################
+
+# Sources of lazy lists: each has a size(), an item() at any rank, and the
+# items() from a rank on, which are computed in order, not each by rank.
+
+class BCandidates(object):
+	"""
+	The candidates of a kind, picked from the items of a sequence and
+	converted to its type.
+	"""
+	
+	def __init__(self, kind, seq, values):
+		self.kind = kind
+		self.seq = seq
+		# A snapshot, since the sequence may be changed in place later
+		self.values = tuple(values)
+	
+	def pick(self, indices):
+		return BList([self.values[i] for i in indices]).convert(self.seq)
+	
+	def size(self):
+		return space_size(self.kind, len(self.values))
+	
+	def item(self, rank):
+		return next(self.items(rank, 1))
+	
+	def items(self, start, count):
+		for c in candidates(self.kind, len(self.values), start, count):
+			yield self.pick(c)
+
+class BRepeatedCandidates(BCandidates):
+	"""
+	The k-combinations with replacement of the items of a sequence. Each is
+	a k-combination of N+K-1 indices, with the ith index reduced by i.
+	"""
+	
+	def pool(self):
+		return max(len(self.values) + self.kind - 1, 0)
+	
+	def size(self):
+		return binomial(self.pool(), self.kind)
+	
+	def items(self, start, count):
+		for c in combinations_from(self.pool(), self.kind, start, count):
+			yield self.pick(x - i for (i, x) in enumerate(c))
+
+class BProduct(object):
+	"""
+	The pairs of an item of one sequence and an item of another, converted
+	to the lower ranked type of the two sequences.
+	"""
+	
+	def __init__(self, seq, first, second):
+		self.seq = seq
+		self.first = tuple(first)
+		self.second = tuple(second)
+	
+	def size(self):
+		return len(self.first) * len(self.second)
+	
+	def item(self, rank):
+		(i, j) = divmod(rank, len(self.second))
+		return BList([self.first[i], self.second[j]]).convert(self.seq)
+	
+	def items(self, start, count):
+		for rank in range(start, start + count):
+			yield self.item(rank)
@@ -14,7 +14,7 @@ from __future__ import (absolute_import, division, generators, nested_scopes,
 import sys         # version_info, maxunicode, exit, stdin, stdout,
 import math        # frexp                  getrecursionlimit, setrecursionlimit
 import cmath       # isinf, isnan
-import collections # Mapping, Iterable, Counter
+import collections # Counter, OrderedDict
 import functools   # reduce
 import types       # MethodType, wraps
 import copy        # copy
@@ -26,7 +26,7 @@ import platform    # python_version
 
 # Python in Cygwin dumps core upon exiting if imports are placed in builtins.py.
 import itertools   # permutations
-import random      # seed, random, randrange
+import random      # seed, random, randrange, Random
 import datetime    # datetime
 import calendar    # timegm, day_name, day_abbr, month_name, month_abbr
 import struct      # pack, unpack
@@ -34,6 +34,21 @@ import os          # environ
 import subprocess  # check_output
 import shlex       # split
 import uuid        # uuid4
+import io          # open
+import json        # dumps, load
+import threading   # Thread, RLock
+import array       # array
+import operator    # add, mul, sub
+
+try:
+	import queue # Queue
+except ImportError:
+	import Queue as queue
+
+try:
+	import collections.abc as collections_abc # Mapping, Iterable
+except ImportError:
+	collections_abc = collections
 
 try:
 	import dateutil.relativedelta as relativedelta # relativedelta
@@ -70,6 +85,7 @@ except ImportError:
 
 from .__version__ import version
 from . import colors
+from .rope import BRope
 
 HEADER_COLORS = colors.FG_MAGENTA | colors.FG_BOLD
 SUBHEADER_COLORS = colors.FG_MAGENTA | colors.FG_NOBOLD
@@ -88,6 +104,112 @@ if sys.version_info.major <= 2:
 	chr = unichr
 	input = raw_input
 	
+	class range(object):
+		"""
+		Python 3 range: integers from start to stop by step, of any size,
+		whose length, items, slices and membership take constant time.
+		"""
+		
+		def __init__(self, *bounds):
+			if len(bounds) == 1:
+				bounds = (0, bounds[0], 1)
+			elif len(bounds) == 2:
+				bounds += (1,)
+			(self.start, self.stop, self.step) = map(operator.index, bounds)
+			if not self.step:
+				raise ValueError('range() arg 3 must not be zero')
+		
+		def __repr__(self):
+			if self.step == 1:
+				return 'range({}, {})'.format(self.start, self.stop)
+			return 'range({}, {}, {})'.format(self.start, self.stop,
+				self.step)
+		
+		def size(self):
+			(start, stop, step) = (self.start, self.stop, self.step)
+			if step > 0:
+				return max((stop - start + step - 1) // step, 0)
+			return max((start - stop - step - 1) // -step, 0)
+		
+		def __len__(self):
+			return self.size()
+		
+		def __nonzero__(self):
+			return self.size() > 0
+		
+		def __iter__(self):
+			try:
+				return iter(xrange(self.start, self.stop, self.step))
+			except OverflowError:
+				return self.counting()
+		
+		def counting(self):
+			(i, n) = (self.start, self.size())
+			while n > 0:
+				yield i
+				i += self.step
+				n -= 1
+		
+		def __contains__(self, x):
+			if not isinstance(x, (int, long)):
+				return any(x == i for i in self)
+			if self.step > 0 and not self.start <= x < self.stop:
+				return False
+			if self.step < 0 and not self.start >= x > self.stop:
+				return False
+			return (x - self.start) % self.step == 0
+		
+		def count(self, x):
+			if isinstance(x, (int, long)):
+				return int(x in self)
+			return sum(1 for i in self if i == x)
+		
+		def index(self, x):
+			if isinstance(x, (int, long)) and x in self:
+				return (x - self.start) // self.step
+			for (j, i) in enumerate(self):
+				if i == x:
+					return j
+			raise ValueError('{} is not in range'.format(x))
+		
+		def __getitem__(self, index):
+			n = self.size()
+			if isinstance(index, slice):
+				# Like index.indices(n), which n may be too large for
+				step = 1 if index.step is None else operator.index(
+					index.step)
+				if not step:
+					raise ValueError('slice step cannot be zero')
+				(lower, upper) = (-1, n - 1) if step < 0 else (0, n)
+				def clamp(i, default):
+					if i is None:
+						return default
+					i = operator.index(i)
+					return max(i + n, lower) if i < 0 else min(i, upper)
+				start = clamp(index.start, upper if step < 0 else lower)
+				stop = clamp(index.stop, lower if step < 0 else upper)
+				return range(self.start + start * self.step,
+					self.start + stop * self.step, step * self.step)
+			index = operator.index(index)
+			if index < 0:
+				index += n
+			if not 0 <= index < n:
+				raise IndexError('range object index out of range')
+			return self.start + index * self.step
+		
+		def key(self):
+			n = self.size()
+			return (n, self.start if n else None, self.step if n > 1 else None)
+		
+		def __eq__(self, other):
+			return isinstance(other, range) and self.key() == other.key()
+		
+		def __ne__(self, other):
+			return not self == other
+		
+		def __hash__(self):
+			return hash(self.key())
+	
 	# Hide 'exec code in ns' statement from Python 3
 	eval(compile("""def exec_python(code, gns, lns):
 		exec compile(code, '<birdiescript>', 'exec') in gns, lns
@@ -233,13 +355,22 @@ def nice_float(x):
 
 #################### Birdiescript exceptions ####################
 
+def type_name(value):
+	"""
+	Return the name of a value's type as errors report it, which for types
+	that only change how a list or string is kept is the type they keep.
+	"""
+	for cls in type(value).__mro__:
+		if not cls.__dict__.get('representation', False):
+			return cls.__name__
+
 class BTypeError(TypeError):
 	
 	def __init__(self, op, args):
 		if isinstance(args, (tuple, list)):
-			types = tuple(a.__class__.__name__ for a in args)
+			types = tuple(type_name(a) for a in args)
 		else:
-			types = args.__class__.__name__
+			types = type_name(args)
 		msg = 'cannot apply {} to {}: {}'.format(repr(op),
 			repr(types), repr(args))
 		super(TypeError, self).__init__(msg)
@@ -247,9 +378,8 @@ class BTypeError(TypeError):
 class BCoercionError(TypeError):
 	
 	def __init__(self, a, b):
-		msg = 'cannot coerce {} to {}: {}'.format(
-			repr(a.__class__.__name__),
-			repr(b.__class__.__name__), repr(a))
+		msg = 'cannot coerce {} to {}: {}'.format(repr(type_name(a)),
+			repr(type_name(b)), repr(a))
 		super(TypeError, self).__init__(msg)
 
 
@@ -280,11 +410,11 @@ class BType(object):
 			return BStr(value)
 		elif isinstance(value, type(regex.compile(''))):
 			return BRegex(value)
-		elif isinstance(value, collections.Mapping):
+		elif isinstance(value, collections_abc.Mapping):
 			return BList([BList([BType.from_python(k),
 				BType.from_python(v)]) for (k, v) in
 				value.items()])
-		elif isinstance(value, collections.Iterable):
+		elif isinstance(value, collections_abc.Iterable):
 			return BList([BType.from_python(v) for v in value])
 		else:
 			return BStr(str(value))
@@ -324,6 +454,10 @@ class BType(object):
 		"""Return the Python equivalent of this Birdiescript value."""
 		return self.value
 	
+	def copy(self):
+		"""Return a shallow copy of this value."""
+		return type(self)(self.value)
+	
 	def tokenize(self):
 		"""
 		Return a list of BToken instances that, when executed,
@@ -342,6 +476,7 @@ class BType(object):
 		
 		The type hierarchy is:
 		int < float < complex < list < string < regex < block < builtin
+		< thread < channel
 		"""
 		if other.rank < self.rank:
 			return self
@@ -412,7 +547,7 @@ class BInt(BReal):
 			return BRegex(regex.compile(v, other.value.flags))
 		elif isinstance(other, BProc):
 			return BProc(self.tokenize())
-		elif isinstance(other, (BFunc, BBuiltin)):
+		elif isinstance(other, (BFunc, BMemo, BBuiltin)):
 			return BFunc(self.tokenize())
 		else:
 			raise BCoercionError(self, other)
@@ -455,7 +590,7 @@ class BFloat(BReal):
 				other.value.flags))
 		elif isinstance(other, BProc):
 			return BProc(self.tokenize())
-		elif isinstance(other, (BFunc, BBuiltin)):
+		elif isinstance(other, (BFunc, BMemo, BBuiltin)):
 			return BFunc(self.tokenize())
 		else:
 			raise BCoercionError(self, other)
@@ -513,21 +648,49 @@ class BComplex(BNum):
 				other.value.flags))
 		elif isinstance(other, BProc):
 			return BProc(self.tokenize())
-		elif isinstance(other, (BFunc, BBuiltin)):
+		elif isinstance(other, (BFunc, BMemo, BBuiltin)):
 			return BFunc(self.tokenize())
 		else:
 			raise BCoercionError(self, other)
 
 class BSeq(BType):
 	"""Base class for all Birdiescript sequential types."""
+	
+	def item(self, index):
+		"""Return the item at an index, as an item of simplify() would be."""
+		return self.simplify().value[index]
+	
+	def elements(self):
+		"""Iterate over the items that simplify() would list."""
+		return iter(self.simplify().value)
+	
+	def numbers(self):
+		"""Return the values of the items, which must be numbers."""
+		return [x.value for x in self.simplify().value]
 
 class BList(BSeq):
 	"""Birdiescript list type."""
 	
 	rank = 3
 	
+	# Replaced whenever a list with a cached hash is changed in place, which
+	# invalidates every cached hash, since a list's hash covers the lists
+	# nested in it. Hashing a list caches the hashes of the lists in it, so
+	# changing a list without a cached hash leaves the others valid.
+	epoch = object()
+	
+	# Whether hashes are cached; the verifier turns this off
+	caching = True
+	
+	def changed(self):
+		"""Note that this list has been changed in place."""
+		if self.hashed is not None:
+			self.hashed = None
+			BList.epoch = object()
+	
 	def __init__(self, value=None):
 		self.value = list(value or [])
+		self.hashed = None
 	
 	def __repr__(self):
 		return '[' + ' '.join(map(repr, self.value)) + ']'
@@ -536,7 +699,15 @@ class BList(BSeq):
 		return '[' + ' '.join(map(str, self.value)) + ']'
 	
 	def __hash__(self):
-		return hash(repr(self))
+		if not BList.caching:
+			return hash(repr(self))
+		# Combines the items' hashes, which nested lists cache in turn
+		epoch = BList.epoch
+		if self.hashed is not None and self.hashed[0] is epoch:
+			return self.hashed[1]
+		h = hash(tuple(self.value))
+		self.hashed = (epoch, h)
+		return h
 	
 	def format_value(self):
 		return tuple(v.format_value() for v in self.value)
@@ -562,12 +733,514 @@ class BList(BSeq):
 		elif isinstance(other, BProc):
 			v = sum([v.tokenize() for v in self.value], [])
 			return BProc(v)
-		elif isinstance(other, (BFunc, BBuiltin)):
+		elif isinstance(other, (BFunc, BMemo, BBuiltin)):
 			v = sum([v.tokenize() for v in self.value], [])
 			return BFunc(v)
 		else:
 			raise BCoercionError(self, other)
 
+class BVector(BList):
+	"""
+	Birdiescript packed numeric list type.
+	
+	A list of integers that fit in 64 bits, or of floating point numbers,
+	packed in an array, so ranges, reductions, comparisons and elementwise
+	arithmetic need not box each number. Reading its value boxes the numbers
+	into an ordinary list, which may then be changed in place, so the array
+	is dropped and the vector goes on as a plain list.
+	
+	A range of integers is packed as a range object, so its length, items,
+	slices and membership take constant time, and it is not listed at all
+	until it is changed.
+	"""
+	
+	# Reported as a BList in errors
+	representation = True
+	
+	try:
+		int_code = array.array(str('q')).typecode
+	except ValueError:
+		int_code = str('l')
+	float_code = str('d')
+	
+	# Whether numbers are packed; the verifier turns this off
+	enabled = True
+	
+	@staticmethod
+	def of(items):
+		"""
+		Return a list of items, packed if they are all integers or all
+		floating point numbers.
+		"""
+		kinds = set(type(x) for x in items)
+		if kinds == set([BInt]):
+			code = BVector.int_code
+		elif kinds == set([BFloat]):
+			code = BVector.float_code
+		else:
+			return BList(items)
+		try:
+			return BVector(items, array.array(code, [x.value for x in items]))
+		except OverflowError:
+			return BList(items)
+	
+	@staticmethod
+	def ints(values):
+		"""Return a list of integers, packed if they all fit in 64 bits."""
+		values = list(values)
+		try:
+			return BVector(packed=array.array(BVector.int_code, values))
+		except OverflowError:
+			return BList([BInt(v) for v in values])
+	
+	@staticmethod
+	def compare(a, b):
+		"""Compare two packed sequences in order, as lists would be."""
+		for (x, y) in zip(a, b):
+			if x != y:
+				return -1 if x < y else 1
+		return (len(a) > len(b)) - (len(a) < len(b))
+	
+	def __init__(self, value=None, packed=None):
+		super(BVector, self).__init__(value)
+		if packed is not None:
+			if value is None:
+				self.boxed = None
+			code = getattr(packed, 'typecode', BVector.int_code)
+			self.box = BFloat if code == BVector.float_code else BInt
+			self.packed = packed
+			if not BVector.enabled:
+				# Box the numbers now, and go on as a plain list
+				self.boxed = self.value
+	
+	@property
+	def value(self):
+		packed = self.packed
+		if self.boxed is None:
+			self.boxed = list(map(self.box, packed))
+		self.packed = None
+		return self.boxed
+	
+	@value.setter
+	def value(self, value):
+		self.boxed = value
+		self.packed = None
+	
+	def __repr__(self):
+		packed = self.packed
+		if packed is None:
+			return super(BVector, self).__repr__()
+		return '[' + ' '.join(repr(self.box(x)) for x in packed) + ']'
+	
+	def __str__(self):
+		packed = self.packed
+		if packed is None:
+			return super(BVector, self).__str__()
+		return '[' + ' '.join(str(self.box(x)) for x in packed) + ']'
+	
+	def __eq__(self, other):
+		(a, b) = (self.packed, getattr(other, 'packed', None))
+		if a is not None and b is not None and isinstance(other, BVector):
+			if type(a) is type(b):
+				return a == b
+			return len(a) == len(b) and BVector.compare(a, b) == 0
+		return super(BVector, self).__eq__(other)
+	
+	def __lt__(self, other):
+		(a, b) = (self.packed, getattr(other, 'packed', None))
+		if a is not None and b is not None and isinstance(other, BVector):
+			if isinstance(a, array.array) and isinstance(b, array.array):
+				return a < b
+			return BVector.compare(a, b) < 0
+		return super(BVector, self).__lt__(other)
+	
+	def __nonzero__(self):
+		if self.packed is not None:
+			return len(self.packed) > 0
+		return bool(self.value)
+	
+	def __hash__(self):
+		if self.packed is not None and BList.caching:
+			# Cached, so that changing the boxed numbers invalidates it
+			h = hash(tuple(self.packed))
+			self.hashed = (BList.epoch, h)
+			return h
+		return super(BVector, self).__hash__()
+	
+	def format_value(self):
+		if self.packed is not None:
+			return tuple(self.packed)
+		return super(BVector, self).format_value()
+	
+	def python_value(self):
+		if self.packed is not None:
+			return list(self.packed)
+		return super(BVector, self).python_value()
+	
+	def copy(self):
+		# Packed arrays are never changed in place, so copies share them
+		if self.packed is not None:
+			return BVector(packed=self.packed)
+		return BVector(self.value)
+	
+	def item(self, index):
+		packed = self.packed
+		if packed is None:
+			return super(BVector, self).item(index)
+		try:
+			return self.box(packed[index])
+		except IndexError:
+			raise IndexError('list index out of range')
+	
+	def elements(self):
+		packed = self.packed
+		if packed is None:
+			return super(BVector, self).elements()
+		return (self.box(x) for x in packed)
+	
+	def numbers(self):
+		if self.packed is not None:
+			return self.packed
+		return super(BVector, self).numbers()
+	
+	def packed_array(self):
+		"""Return the packed numbers as an array."""
+		if isinstance(self.packed, array.array):
+			return self.packed
+		return array.array(BVector.int_code, self.packed)
+
+class BLazyList(BList):
+	"""
+	Birdiescript list of items computed on demand.
+	
+	The items are computed by rank from a source, such as the permutations
+	of a sequence, over a range of ranks. A source has a size(), an item()
+	for any rank, and items() from a rank on in order, which is faster than
+	computing each one by rank. So the length, items and slices of the list
+	take no longer than one item, and its items can be streamed without
+	listing them. Reading its value lists the items into an ordinary list,
+	which may then be changed in place, so the source is dropped and the
+	list goes on as a plain one.
+	"""
+	
+	# Reported as a BList in errors
+	representation = True
+	
+	# Whether items are computed on demand; the verifier turns this off
+	enabled = True
+	
+	def __init__(self, value=None, source=None, ranks=None):
+		super(BLazyList, self).__init__(value)
+		if source is not None:
+			if value is None:
+				self.listed = None
+			self.source = source
+			self.ranks = range(source.size()) if ranks is None else ranks
+			if not BLazyList.enabled:
+				# Compute the items now, and go on as a plain list
+				self.listed = self.value
+	
+	@property
+	def value(self):
+		if self.listed is None:
+			self.listed = list(self.elements())
+		self.source = self.ranks = None
+		return self.listed
+	
+	@value.setter
+	def value(self, value):
+		self.listed = value
+		self.source = self.ranks = None
+	
+	def __repr__(self):
+		if self.source is None:
+			return super(BLazyList, self).__repr__()
+		return '[' + ' '.join(map(repr, self.elements())) + ']'
+	
+	def __str__(self):
+		if self.source is None:
+			return super(BLazyList, self).__str__()
+		return '[' + ' '.join(map(str, self.elements())) + ']'
+	
+	def __nonzero__(self):
+		if self.source is not None:
+			return self.size() > 0
+		return bool(self.value)
+	
+	def size(self):
+		"""Return the number of items, which may not fit in an index."""
+		r = self.ranks
+		if r is None:
+			return len(self.value)
+		if r.step > 0:
+			n = (r.stop - r.start + r.step - 1) // r.step
+		else:
+			n = (r.start - r.stop - r.step - 1) // -r.step
+		return max(n, 0)
+	
+	def window(self, index):
+		"""Return the items at a slice of indices, which are not computed."""
+		if self.source is None:
+			return BList(self.value[index])
+		return BLazyList(source=self.source, ranks=self.ranks[index])
+	
+	def copy(self):
+		# Sources are never changed, so copies share them
+		if self.source is not None:
+			return BLazyList(source=self.source, ranks=self.ranks)
+		return BLazyList(self.value)
+	
+	def item(self, index):
+		if self.source is None:
+			return super(BLazyList, self).item(index)
+		try:
+			return self.source.item(self.ranks[index])
+		except IndexError:
+			raise IndexError('list index out of range')
+	
+	def elements(self):
+		(source, r) = (self.source, self.ranks)
+		if source is None:
+			return super(BLazyList, self).elements()
+		if r.step == 1:
+			return source.items(r.start, self.size())
+		return (source.item(i) for i in r)
+
+class BStreamSource(object):
+	"""The items an iterator has produced so far, shared by streams."""
+	
+	def __init__(self, iterator):
+		self.iterator = iterator
+		self.items = []
+	
+	def produce(self, n):
+		"""
+		Produce items until there are N, or the iterator ends; return
+		whether there are N.
+		"""
+		items = self.items
+		while len(items) < n:
+			if self.iterator is None:
+				return False
+			try:
+				items.append(next(self.iterator))
+			except StopIteration:
+				self.iterator = None
+				return False
+		return True
+	
+	def iterate(self, i):
+		"""Iterate over the items from an index on, producing them as needed."""
+		while self.produce(i + 1):
+			yield self.items[i]
+			i += 1
+
+class BStream(BList):
+	"""
+	Birdiescript stream type.
+	
+	A list whose items an iterator produces as they are asked for, which
+	may go on forever, such as the results of iterating a function. Items
+	are produced once, and kept, so copies of a stream see the same items,
+	and only as many are kept as have been asked for. Dropping items from
+	a stream gives a stream of the rest. Reading its value produces every
+	item, which never finishes for an infinite stream; the stream then goes
+	on as a plain list.
+	"""
+	
+	# Reported as a BList in errors
+	representation = True
+	
+	def __init__(self, value=None, source=None, start=0):
+		super(BStream, self).__init__(value)
+		if source is not None:
+			if value is None:
+				self.listed = None
+			if not isinstance(source, BStreamSource):
+				source = BStreamSource(iter(source))
+			self.source = source
+			self.start = start
+	
+	@property
+	def value(self):
+		if self.listed is None:
+			self.listed = list(self.elements())
+		self.source = None
+		return self.listed
+	
+	@value.setter
+	def value(self, value):
+		self.listed = value
+		self.source = None
+	
+	def __nonzero__(self):
+		if self.source is not None:
+			return self.source.produce(self.start + 1)
+		return bool(self.value)
+	
+	def take(self, n):
+		"""Return a list of the first N items."""
+		if self.source is None:
+			return BList(self.value[:n])
+		return BList(list(itertools.islice(self.elements(), n)))
+	
+	def drop(self, n):
+		"""Return the items after the first N, which are not produced."""
+		if self.source is None:
+			return BList(self.value[n:])
+		return BStream(source=self.source, start=self.start + n)
+	
+	def copy(self):
+		# Produced items are kept, so copies share them
+		if self.source is not None:
+			return BStream(source=self.source, start=self.start)
+		return BStream(self.value)
+	
+	def item(self, index):
+		source = self.source
+		if source is None or index < 0:
+			return super(BStream, self).item(index)
+		if not source.produce(self.start + index + 1):
+			raise IndexError('list index out of range')
+		return source.items[self.start + index]
+	
+	def elements(self):
+		if self.source is None:
+			return super(BStream, self).elements()
+		return self.source.iterate(self.start)
+
+class BRopeList(BList):
+	"""
+	Birdiescript persistent list type.
+	
+	A list whose items are kept in a rope, so joining it with another list,
+	slicing it, and changing or deleting one of its items take logarithmic
+	time, and copies of it share the rope instead of copying the items.
+	Reading its value lists the items into an ordinary list, which may then
+	be changed in place, so the rope is dropped and the list goes on as a
+	plain one.
+	"""
+	
+	# Reported as a BList in errors
+	representation = True
+	
+	# Whether lists are joined with ropes; the verifier turns this off
+	enabled = True
+	
+	@staticmethod
+	def joined(a, b):
+		"""
+		Return two lists joined with a rope, or None if they are not both
+		finite lists, or neither is a rope and together they would fit in a
+		chunk.
+		"""
+		if not BRopeList.enabled:
+			return None
+		ropes = []
+		for x in (a, b):
+			if not isinstance(x, BList) or (isinstance(x, BStream) and
+				x.source is not None):
+				return None
+			if isinstance(x, BRopeList) and x.rope is not None:
+				ropes.append(x.rope)
+			else:
+				ropes.append(tuple(x.elements()))
+		if not any(isinstance(r, BRope) for r in ropes) and (sum(map(len,
+			ropes)) <= BRope.chunk_size):
+			return None
+		(ra, rb) = (r if isinstance(r, BRope) else BRope.of(r) for r in ropes)
+		return BRopeList(rope=ra.concat(rb))
+	
+	def __init__(self, value=None, rope=None):
+		super(BRopeList, self).__init__(value)
+		if rope is not None:
+			if value is None:
+				self.listed = None
+			self.rope = rope
+	
+	@property
+	def value(self):
+		if self.listed is None:
+			self.listed = list(self.rope)
+		self.rope = None
+		return self.listed
+	
+	@value.setter
+	def value(self, value):
+		self.listed = value
+		self.rope = None
+	
+	def __repr__(self):
+		if self.rope is None:
+			return super(BRopeList, self).__repr__()
+		return '[' + ' '.join(map(repr, self.rope)) + ']'
+	
+	def __str__(self):
+		if self.rope is None:
+			return super(BRopeList, self).__str__()
+		return '[' + ' '.join(map(str, self.rope)) + ']'
+	
+	def __nonzero__(self):
+		if self.rope is not None:
+			return len(self.rope) > 0
+		return bool(self.value)
+	
+	def size(self):
+		"""Return the number of items."""
+		if self.rope is not None:
+			return len(self.rope)
+		return len(self.value)
+	
+	def window(self, index):
+		"""Return the items at a slice of indices, sharing the rope."""
+		rope = self.rope
+		if rope is None:
+			return BList(self.value[index])
+		(start, stop, step) = index.indices(len(rope))
+		if step != 1:
+			return BList(list(rope)[index])
+		return BRopeList(rope=rope.window(start, stop))
+	
+	def update(self, index, v):
+		"""Set the item at an index to a value, in place."""
+		rope = self.rope
+		if rope is None:
+			self.value[index] = v
+		elif not -len(rope) <= index < len(rope):
+			raise IndexError('list assignment index out of range')
+		else:
+			self.rope = rope.update(index % len(rope), (v,))
+		self.changed()
+	
+	def delete(self, index):
+		"""Keep the items before an index and from the next one on, in place."""
+		if self.rope is None:
+			self.value = self.value[:index] + self.value[index+1:]
+		else:
+			before = self.window(slice(None, index)).rope
+			after = self.window(slice(index + 1, None)).rope
+			self.rope = before.concat(after)
+		self.changed()
+	
+	def copy(self):
+		# Ropes are never changed, so copies share them
+		if self.rope is not None:
+			return BRopeList(rope=self.rope)
+		return BRopeList(self.value)
+	
+	def item(self, index):
+		rope = self.rope
+		if rope is None:
+			return super(BRopeList, self).item(index)
+		if not -len(rope) <= index < len(rope):
+			raise IndexError('list index out of range')
+		return rope.item(index % len(rope))
+	
+	def elements(self):
+		if self.rope is None:
+			return super(BRopeList, self).elements()
+		return iter(self.rope)
+
 class BChars(BSeq):
 	"""Base class for all Birdiescript string-like types."""
 
@@ -595,12 +1268,43 @@ class BStr(BChars):
 	def __str__(self):
 		return self.value
 	
+	def __eq__(self, other):
+		if isinstance(other, BStr):
+			return self.value == other.value
+		return super(BStr, self).__eq__(other)
+	
+	def __lt__(self, other):
+		if isinstance(other, BStr):
+			return self.value < other.value
+		return super(BStr, self).__lt__(other)
+	
+	def __hash__(self):
+		return hash(self.value)
+	
 	def format_value(self):
 		return self
 	
 	def simplify(self):
 		return BList(BInt(ord(v)) for v in self.value)
 	
+	def item(self, index):
+		# Without listing every character; fails as a list would
+		try:
+			return BInt(ord(self.value[index]))
+		except IndexError:
+			raise IndexError('list index out of range')
+	
+	def elements(self):
+		return (BInt(ord(v)) for v in self.value)
+	
+	def size(self):
+		"""Return the number of characters."""
+		return len(self.value)
+	
+	def window(self, index):
+		"""Return the characters at a slice of indices."""
+		return BStr(self.value[index])
+	
 	def convert(self, other):
 		if isinstance(other, BStr):
 			return self
@@ -612,12 +1316,115 @@ class BStr(BChars):
 		elif isinstance(other, BProc):
 			tokens = BContext.tokenized(self.value)
 			return BProc(tokens)
-		elif isinstance(other, (BFunc, BBuiltin)):
+		elif isinstance(other, (BFunc, BMemo, BBuiltin)):
 			tokens = BContext.tokenized(self.value)
 			return BFunc(tokens)
 		else:
 			raise BCoercionError(self, other)
 
+class BRopeStr(BStr):
+	"""
+	Birdiescript string type for strings built by joining and slicing.
+	
+	The characters are kept in a rope, so joining the string with another
+	and slicing it take logarithmic time, and copies of it share the rope.
+	They are only joined into one Unicode string when its value is read,
+	which is kept along with the rope, since neither can change.
+	"""
+	
+	# Reported as a BStr in errors
+	representation = True
+	
+	# Whether strings are joined with ropes; benchmarks and the verifier
+	# turn this off
+	enabled = True
+	
+	# Plain strings are joined until together they have more than this many
+	# characters, below which copying them is faster than joining ropes
+	# (see --bench-ropes)
+	threshold = 2**18
+	
+	@staticmethod
+	def joined(a, b):
+		"""
+		Return two strings joined with a rope, or None if they are not both
+		strings, or neither is a rope and together they are no longer than
+		the threshold.
+		"""
+		# Called for every string joined, so kept short
+		if not BRopeStr.enabled:
+			return None
+		if not isinstance(a, BStr) or not isinstance(b, BStr):
+			return None
+		ra = a.rope if isinstance(a, BRopeStr) else None
+		rb = b.rope if isinstance(b, BRopeStr) else None
+		if ra is None and rb is None and (len(a.value) + len(b.value) <=
+			BRopeStr.threshold):
+			return None
+		if ra is None:
+			ra = BRope.of(a.value)
+		if rb is None:
+			rb = BRope.of(b.value)
+		return BRopeStr(rope=ra.concat(rb))
+	
+	def __init__(self, value=None, rope=None):
+		super(BRopeStr, self).__init__(value)
+		if rope is not None:
+			if value is None:
+				self.flat = None
+			self.rope = rope
+	
+	@property
+	def value(self):
+		if self.flat is None:
+			self.flat = ''.join(self.rope.chunks())
+		return self.flat
+	
+	@value.setter
+	def value(self, value):
+		self.flat = value
+		self.rope = None
+	
+	def __nonzero__(self):
+		if self.rope is not None:
+			return len(self.rope) > 0
+		return bool(self.value)
+	
+	def copy(self):
+		# Ropes are never changed, so copies share them
+		return BRopeStr(self.flat, self.rope)
+	
+	def item(self, index):
+		rope = self.rope
+		if rope is None:
+			return super(BRopeStr, self).item(index)
+		if not -len(rope) <= index < len(rope):
+			raise IndexError('list index out of range')
+		return BInt(ord(rope.item(index % len(rope))))
+	
+	def elements(self):
+		if self.rope is None:
+			return super(BRopeStr, self).elements()
+		return (BInt(ord(v)) for v in self.rope)
+	
+	def size(self):
+		if self.rope is not None:
+			return len(self.rope)
+		return len(self.value)
+	
+	def window(self, index):
+		rope = self.rope
+		if rope is None:
+			return super(BRopeStr, self).window(index)
+		(start, stop, step) = index.indices(len(rope))
+		if step != 1:
+			return BStr(self.value[index])
+		rope = rope.window(start, stop)
+		if len(rope) <= BRopeStr.threshold:
+			# Short enough that copying it is faster than keeping a rope
+			return BStr(''.join(rope.chunks()))
+		return BRopeStr(rope=rope)
+
 class BRegex(BChars):
 	
 	rank = 5
@@ -669,6 +1476,9 @@ class BRegex(BChars):
 				(other.value.pattern, other.value.flags))
 		return super(BSeq, self).__lt__(other)
 	
+	def __hash__(self):
+		return hash((self.value.pattern, self.value.flags))
+	
 	def __nonzero__(self):
 		return bool(self.value.pattern)
 	
@@ -688,7 +1498,7 @@ class BRegex(BChars):
 		elif isinstance(other, BProc):
 			tokens = BContext.tokenized(self.value.pattern)
 			return BProc(tokens)
-		elif isinstance(other, (BFunc, BBuiltin)):
+		elif isinstance(other, (BFunc, BMemo, BBuiltin)):
 			tokens = BContext.tokenized(self.value.pattern)
 			return BFunc(tokens)
 		else:
@@ -706,6 +1516,7 @@ class BBlock(BCallable):
 		super(BBlock, self).__init__(value or [])
 		self.scope = scope or {}
 		self.scoped = scoped
+		self.hashed = None
 	
 	def __repr__(self):
 		start = '{' if not self.scoped else '\\{'
@@ -716,7 +1527,14 @@ class BBlock(BCallable):
 		return start + ' '.join(map(str, self.value)) + '}'
 	
 	def __hash__(self):
-		return hash(repr(self))
+		if not BList.caching:
+			return hash(repr(self))
+		epoch = BList.epoch
+		if self.hashed is not None and self.hashed[0] is epoch:
+			return self.hashed[1]
+		h = hash(repr(self))
+		self.hashed = (epoch, h)
+		return h
 	
 	def format_value(self):
 		return str(self)
@@ -731,11 +1549,15 @@ class BBlock(BCallable):
 		tokens += [BToken('blockend', '}')]
 		return tokens
 	
-	def apply(self, context, looping=False):
+	def enter(self, context, looping=False):
+		"""
+		Return the subcontext that runs this block, sharing the stacks of a
+		context, and its parent, which sees the scope the block was made in.
+		"""
 		parent = context.subcontext(BBlock.NONLOCAL)
 		parent.inherit_scope(self.scope)
 		parent.looping = looping
-		subcontext = context.subcontext(str(self))
+		subcontext = context.subcontext(self)
 		subcontext.parent = parent
 		subcontext.tokens = copy.copy(self.value)
 		subcontext.stack = context.stack
@@ -743,6 +1565,10 @@ class BBlock(BCallable):
 		subcontext.leftbs = context.leftbs
 		if not self.scoped:
 			subcontext.inherit_scope(self.scope)
+		return (parent, subcontext)
+	
+	def apply(self, context, looping=False):
+		(parent, subcontext) = self.enter(context, looping)
 		try:
 			subcontext.execute()
 		finally:
@@ -755,6 +1581,9 @@ class BProc(BBlock):
 	def __init__(self, value=None, scope=None):
 		super(BProc, self).__init__(value, scope, False)
 	
+	def copy(self):
+		return BProc(self.value, self.scope)
+	
 	def convert(self, other):
 		if isinstance(other, BList):
 			return BList([BStr(str(v)) for v in self.value])
@@ -762,7 +1591,7 @@ class BProc(BBlock):
 			return type(other)(str(self))
 		elif isinstance(other, BProc):
 			return self
-		elif isinstance(other, (BFunc, BBuiltin)):
+		elif isinstance(other, (BFunc, BMemo, BBuiltin)):
 			return BFunc(self.value, self.scope)
 		else:
 			raise BCoercionError(self, other)
@@ -774,24 +1603,143 @@ class BFunc(BBlock):
 	def __init__(self, value=None, scope=None):
 		super(BFunc, self).__init__(value, scope, True)
 	
+	def copy(self):
+		return BFunc(self.value, self.scope)
+	
+	def convert(self, other):
+		if isinstance(other, BList):
+			return BList([BStr(str(v)) for v in self.value])
+		elif isinstance(other, BChars):
+			return type(other)(str(self))
+		elif isinstance(other, BCallable):
+			return self
+		else:
+			raise BCoercionError(self, other)
+
+class BMemoTable(object):
+	"""A bounded LRU cache of block results, keyed by argument values."""
+	
+	def __init__(self, arity=1, size=0):
+		self.arity = arity
+		self.size = size
+		self.cache = collections.OrderedDict()
+		self.hits = 0
+		self.misses = 0
+	
+	def get(self, key):
+		results = self.cache.pop(key, None)
+		if results is None:
+			self.misses += 1
+			return None
+		self.hits += 1
+		self.cache[key] = results
+		return results
+	
+	def put(self, key, results):
+		self.cache[key] = results
+		if self.size > 0:
+			while len(self.cache) > self.size:
+				self.cache.popitem(last=False)
+
+class BMemo(BBlock):
+	"""
+	Birdiescript memoized block type.
+	
+	Applies its block at most once for each distinct list of arguments. The
+	results are kept in a bounded LRU cache shared by all copies of the value.
+	The block should consume exactly its arguments. It runs through the
+	engine, so recursive memoized blocks do not nest on the Python stack.
+	"""
+	
+	rank = 7
+	
+	def __init__(self, value=None, scope=None, scoped=True, table=None):
+		super(BMemo, self).__init__(value, scope, scoped)
+		self.table = table or BMemoTable()
+	
+	def __repr__(self):
+		return safe_string(str(self))
+	
+	def __str__(self):
+		return '{} {} {}Mm'.format(super(BMemo, self).__str__(),
+			self.table.arity, self.table.size)
+	
+	def tokenize(self):
+		tokens = super(BMemo, self).tokenize()
+		tokens += BContext.tokenized(' {} {}Mm'.format(self.table.arity,
+			self.table.size))
+		return tokens
+	
+	def copy(self):
+		return BMemo(self.value, self.scope, self.scoped, self.table)
+	
 	def convert(self, other):
 		if isinstance(other, BList):
 			return BList([BStr(str(v)) for v in self.value])
 		elif isinstance(other, BChars):
 			return type(other)(str(self))
+		elif isinstance(other, BProc):
+			return BProc(self.value, self.scope)
 		elif isinstance(other, BCallable):
 			return self
 		else:
 			raise BCoercionError(self, other)
+	
+	def recall(self, context):
+		"""
+		Pop the block's arguments, and push the results it had for them
+		before and return None, or push the arguments back and return
+		their key and where the results will start on the stack.
+		"""
+		table = self.table
+		args = context.pop_n(table.arity)
+		key = tuple(repr(a) for a in args)
+		results = table.get(key)
+		if results is not None:
+			for x in results:
+				context.push(x.copy())
+			return None
+		n = len(context.stack)
+		for a in args:
+			context.push(a)
+		return (key, n)
+	
+	def remember(self, context, key, n):
+		"""Keep the results the block left for its arguments."""
+		if context.broken:
+			return
+		results = context.stack[n:]
+		self.table.put(key, [x.copy() for x in results])
+	
+	def apply(self, context, looping=False):
+		recalled = self.recall(context)
+		if recalled is None:
+			return
+		# The engine applies memoized blocks without nesting on the Python
+		# stack, so recursive ones can go deeper than other blocks
+		from . import engine
+		engine.run_steps(engine.block_steps(self, context, looping), context)
+		self.remember(context, *recalled)
 
 class BBuiltin(BCallable):
 	
 	rank = 8
 	
+	# Whether call sites may use type specializations; the verifier turns
+	# this off
+	specialized = True
+	
 	def __init__(self, *names, **kwargs):
 		if not names:
 			raise TypeError('cannot instantiate unnamed builtin')
 		super(BBuiltin, self).__init__(names)
+		self.specializations = {}
+		self.arity = 0
+		self.code = kwargs.get('code', None)
+		self.tokens = None
+		self.impure = kwargs.get('impure', False)
+		self.mutating = kwargs.get('mutating', False)
+		self.interpreted = False
 		for name in names:
 			if name in builtins:
 				msg = 'cannot redefine builtin: {}'.format(
@@ -809,10 +1757,16 @@ class BBuiltin(BCallable):
 			self.__call__(builtin_apply)
 		elif code is not None:
 			def builtin_apply(self, context):
-				context.apply_code(code)
+				if context.debug:
+					context.apply_code(code)
+					return
+				if self.tokens is None:
+					self.tokens = BContext.tokenized(code)
+				context.apply_code(code, self.tokens)
 			if doc is not None:
 				builtin_apply.__doc__ = doc
 			self.__call__(builtin_apply)
+			self.interpreted = True
 	
 	def __repr__(self):
 		return safe_string('\\g' + self.value[0])
@@ -821,7 +1775,12 @@ class BBuiltin(BCallable):
 		return self.value[0]
 	
 	def __hash__(self):
-		return hash(repr(self))
+		# Builtins are unique, so their names identify them
+		return hash(self.value)
+	
+	def __reduce__(self):
+		# Builtins are pickled by name, since they are unique
+		return (builtin_named, (self.value[0],))
 	
 	def __call__(self, f):
 		"""
@@ -835,14 +1794,37 @@ class BBuiltin(BCallable):
 			pass
 		"""
 		self.apply = types.MethodType(f, self)
+		# Code, if any, now only documents the function
+		self.interpreted = False
 		return f
 	
+	def specialize(self, *classes):
+		"""
+		Return a decorator which registers a function as a fast path of this
+		builtin, for operands of exactly the given types (deepest first).
+		
+		For example:
+		
+		@specialize('+', BInt, BInt)
+		def builtin_add_int_int(self, context, looping=False):
+			'''Add two integers.'''
+			pass
+		"""
+		def decorator(f):
+			self.specializations[classes] = types.MethodType(f, self)
+			self.arity = max(self.arity, len(classes))
+			return f
+		return decorator
+	
 	def format_value(self):
 		return str(self)
 	
 	def python_value(self):
 		return self
 	
+	def copy(self):
+		return self
+	
 	def tokenize(self):
 		return [BToken('prefixed', '\\:g' + self.value[0])]
 	
@@ -866,6 +1848,110 @@ class BBuiltin(BCallable):
 		msg = 'cannot call abstract builtin: {}'.format(repr(self.value))
 		raise NotImplementedError(msg)
 
+def builtin_named(name):
+	return builtins[name]
+
+class BThread(BType):
+	"""
+	Birdiescript thread type.
+
+	Applies a block to one argument in a background thread, on a stack of
+	its own. The block runs in a subcontext of the context that started it,
+	so it sees the same variables. Joining the thread waits for the block
+	to finish, and gives the values it left on its stack, or raises the
+	error that stopped it. Copies of a thread are the same thread.
+	"""
+
+	rank = 9
+
+	def __init__(self, value=None):
+		super(BThread, self).__init__(value)
+		self.results = None
+		self.error = None
+
+	def __repr__(self):
+		if self.value is None or self.value.is_alive():
+			return '<thread>'
+		return '<thread done>'
+
+	def __str__(self):
+		return repr(self)
+
+	def __hash__(self):
+		return id(self)
+
+	def __eq__(self, other):
+		return self is other
+
+	def copy(self):
+		return self
+
+	def convert(self, other):
+		if isinstance(other, BThread):
+			return self
+		raise BCoercionError(self, other)
+
+	def start(self, block, arg, context):
+		task = context.subcontext(BBlock.NONLOCAL)
+		task.stack = [arg]
+		task.task = True
+		def run():
+			try:
+				block.apply(task)
+			except SystemExit:
+				pass
+			except Exception as ex:
+				self.error = ex
+			self.results = task.stack
+		self.value = threading.Thread(target=run)
+		self.value.daemon = True
+		self.value.start()
+
+	def join(self):
+		"""Wait for the block to finish, and return the values it left."""
+		self.value.join()
+		if self.error is not None:
+			raise self.error
+		return self.results
+
+class BChannel(BType):
+	"""
+	Birdiescript channel type.
+
+	A first-in, first-out queue of values that threads send to and receive
+	from. Receiving waits until a value has been sent. Copies of a channel
+	are the same channel.
+	"""
+
+	rank = 10
+
+	def __init__(self, value=None):
+		super(BChannel, self).__init__(queue.Queue() if value is None
+			else value)
+
+	def __repr__(self):
+		return '<channel>'
+
+	def __str__(self):
+		return repr(self)
+
+	def __hash__(self):
+		return id(self.value)
+
+	def __eq__(self, other):
+		return isinstance(other, BChannel) and self.value is other.value
+
+	def convert(self, other):
+		if isinstance(other, BChannel):
+			return self
+		raise BCoercionError(self, other)
+
+	def send(self, value):
+		self.value.put(value.copy())
+
+	def receive(self):
+		return self.value.get()
+
 
 #################### Birdiescript parser ####################
 
@@ -996,31 +2082,24 @@ def parse_regex(token):
 def parse_prefixed(token):
 	if not isinstance(token, BToken):
 		token = BToken('prefixed', token)
-	elif token.text.startswith('\\}'):
-		token.type = 'defcall'
-		token.text = token.text[2:]
-	elif token.text.startswith(':\\'):
-		token.type = 'undef'
-		token.text = token.text[2:]
-	elif token.text.startswith('\\:'):
-		token.type = 'call'
-		token.text = token.text[2:]
-	elif token.text.startswith(':'):
-		token.type = 'def'
-		token.text = token.text[1:]
-	elif token.text.startswith('\\'):
-		token.type = 'ref'
-		token.text = token.text[1:]
+	text = token.text
+	if text.startswith('\\}'):
+		(type, text) = ('defcall', text[2:])
+	elif text.startswith(':\\'):
+		(type, text) = ('undef', text[2:])
+	elif text.startswith('\\:'):
+		(type, text) = ('call', text[2:])
+	elif text.startswith(':'):
+		(type, text) = ('def', text[1:])
+	elif text.startswith('\\'):
+		(type, text) = ('ref', text[1:])
 	else:
-		token.type = 'call'
-		token.text = token.text[0].upper() + token.text[1:].lower()
-		return token
-	if token.text[0] in 'lgn':
-		token.text = (token.text[0] + token.text[1].upper() +
-			token.text[2:].lower())
+		return BToken('call', text[0].upper() + text[1:].lower(), token.pos)
+	if text[0] in 'lgn':
+		text = text[0] + text[1].upper() + text[2:].lower()
 	else:
-		token.text = token.text[0].upper() + token.text[1:].lower()
-	return token
+		text = text[0].upper() + text[1:].lower()
+	return BToken(type, text, token.pos)
 
 class BToken(object):
 	
@@ -1028,6 +2107,7 @@ class BToken(object):
 		self.type = type
 		self.text = text
 		self.pos = pos
+		self.literal = None
 	
 	def __repr__(self):
 		return '{}({}, {}, {})'.format(self.__class__.__name__,
@@ -1039,15 +2119,28 @@ class BToken(object):
 	def __eq__(self, other):
 		return self.type == other.type and self.text == other.text
 	
+	def copy(self):
+		# Tokens are never changed once made
+		return self
+	
 	def parse(self):
+		if self.literal is not None:
+			return self.literal.copy()
 		try:
 			parser = BToken.parsers[self.type]
-			return parser(self)
+			value = parser(self)
+			if self.type in BToken.cached_types:
+				self.literal = value.copy()
+			return value
 		except:
 			msg = 'invalid token at character {}: {}'.format(
 				self.pos, repr(self.text))
 			raise SyntaxError(msg)
 	
+	# Tokens whose parsed values do not depend on any mutable state
+	cached_types = frozenset(['int', 'complex', 'str', 'chars', 'herestr',
+		'heredoc', 'name', 'prefixed'])
+	
 	parsers = {
 		'comment': identity,
 		'blockcomment': identity,
@@ -1074,6 +2167,73 @@ class BToken(object):
 # Built-in definitions
 builtins = {}
 
+class BState(object):
+	"""
+	The state that a context shares with all of its subcontexts: the random
+	number generator, the environment variables, the standard streams, and
+	the lock that Lock holds while it applies a block.
+
+	The default state uses the random module's generator, the process's
+	environment, and sys.stdin and sys.stdout, as the command line does.
+	An isolated state has its own generator and keeps environment changes
+	in an overlay, so scripts with isolated states can run concurrently in
+	separate threads without interfering.
+	"""
+
+	def __init__(self, rng=None, environ=None, stdin=None, stdout=None):
+		self.random = random if rng is None else rng
+		# Overlaid variables, with None for unset ones; None to use os.environ
+		self.environ = environ
+		self.stdin = stdin
+		self.stdout = stdout
+		self.lock = threading.RLock()
+
+	@staticmethod
+	def isolated(seed=None, stdin=None, stdout=None):
+		return BState(random.Random(seed), {}, stdin, stdout)
+
+	def reader(self):
+		return sys.stdin if self.stdin is None else self.stdin
+
+	def writer(self):
+		return sys.stdout if self.stdout is None else self.stdout
+
+	def getenv(self, name):
+		if self.environ is not None and name in self.environ:
+			return self.environ[name]
+		return os.environ.get(name, None)
+
+	def setenv(self, name, value):
+		if self.environ is None:
+			os.environ[name] = value
+		else:
+			self.environ[name] = value
+
+	def unsetenv(self, name):
+		if self.environ is None:
+			del os.environ[name]
+			return
+		if self.getenv(name) is None:
+			raise KeyError(name)
+		self.environ[name] = None
+
+	def environment(self):
+		"""
+		Return the environment for child processes, or None if they inherit
+		the process's own.
+		"""
+		if self.environ is None:
+			return None
+		env = dict(os.environ)
+		for (name, value) in self.environ.items():
+			if value is None:
+				env.pop(name, None)
+			else:
+				env[name] = value
+		return env
+
+default_state = BState()
+
 class BContext(object):
 	
 	EXITED = Sentinel('<exited>')
@@ -1114,7 +2274,8 @@ class BContext(object):
 		context.tokenize()
 		return context.tokens
 	
-	def __init__(self, script, encoding=None, debug=False, level=0):
+	def __init__(self, script, encoding=None, debug=False, level=0,
+		state=None):
 		self.parent = None
 		self.script = script
 		self.tokens = None
@@ -1132,10 +2293,21 @@ class BContext(object):
 		self.scopedblock = True
 		self.broken = False
 		self.looping = False
+		self.task = False
 		self.nesting = 0
+		self.profile = None
+		self.state = state or default_state
 		self.global_py_ns = {}
 		self.local_py_ns = {}
 	
+	def reader(self):
+		"""Return the stream that input builtins read from."""
+		return self.state.reader()
+	
+	def writer(self):
+		"""Return the stream that output builtins write to."""
+		return self.state.writer()
+	
 	def tokenize(self):
 		self.tokens = []
 		n = len(self.script)
@@ -1201,6 +2373,17 @@ class BContext(object):
 				NOTE_COLORS)
 	
 	def execute(self, printstack=False, repl=False):
+		self.prepare(repl)
+		n = len(self.tokens)
+		while self.counter < n and not self.broken:
+			token = self.tokens[self.counter]
+			self.execute_token(token)
+			self.counter += 1
+		if repl:
+			return
+		self.conclude(printstack)
+	
+	def prepare(self, repl=False):
 		if self.tokens is None:
 			self.tokenize()
 		if self.level > 0:
@@ -1211,22 +2394,17 @@ class BContext(object):
 			self.define('_z', self.peek(-5) if len(self.stack) >= 5 else BInt(0))
 		elif not repl:
 			self.define('V', BStr('Hello World!'))
-		script = repr(self.script)
 		if self.debug:
+			script = repr(str(self.script))
 			self.debug_print('[Script] {}'.format(script),
 				HEADER_COLORS)
-		tokens = ' '.join(map(str, self.tokens))
-		if self.debug:
+			tokens = ' '.join(map(str, self.tokens))
 			self.debug_print('[Tokens] {}'.format(tokens),
 				SUBHEADER_COLORS)
 			self.print_state()
+	
+	def conclude(self, printstack=False):
 		n = len(self.tokens)
-		while self.counter < n and not self.broken:
-			token = self.tokens[self.counter]
-			self.execute_token(token)
-			self.counter += 1
-		if repl:
-			return
 		while self.blocklevel > 0 and not self.broken:
 			token = BToken('blockend', '}', n)
 			self.execute_token(token)
@@ -1236,47 +2414,119 @@ class BContext(object):
 			self.execute_token(token)
 	
 	def execute_token(self, token):
+		if self.debug:
+			self.trace_token(token)
+		elif not self.broken:
+			BContext.dispatch.get(token.type, BContext.run_value)(self, token)
+	
+	def run_comment(self, token):
+		pass
+	
+	def run_blockstart(self, token):
+		if self.blocklevel > 0:
+			self.blocktokens.append(token)
+		else:
+			self.scopedblock = token.text == '\\{'
+		self.blocklevel += 1
+	
+	def run_blockend(self, token):
+		if self.blocklevel > 1:
+			self.blocktokens.append(token)
+			self.blocklevel -= 1
+			return
+		self.push(self.end_block())
+	
+	def run_defcall(self, token):
+		if token.type == 'prefixed':
+			if not token.text.startswith('\\}'):
+				self.run_value(token)
+				return
+			token = parse_prefixed(token)
+		if self.blocklevel > 1:
+			self.blocktokens.append(token)
+			self.blocklevel -= 1
+			return
+		value = self.end_block()
+		self.define(token.text, value)
+		value.apply(self)
+	
+	def run_value(self, token):
+		if self.blocklevel > 0:
+			self.blocktokens.append(token)
+			return
+		value = token.parse()
+		if isinstance(value, BType):
+			deref = self.lookup(token.text)
+			if deref is None:
+				self.push(value)
+				return
+			try:
+				deref.apply(self)
+			except NameError:
+				self.push(value)
+		elif value.type == 'call':
+			deref = self.dereference(value.text)
+			if (self.profile is not None and isinstance(deref, BBuiltin)
+				and deref.specializations):
+				self.profile.apply(self, token, deref)
+			else:
+				deref.apply(self)
+		elif value.type == 'ref':
+			self.push(self.dereference(value.text))
+		elif value.type == 'def':
+			self.define(value.text, self.top())
+		elif value.type == 'undef':
+			self.undefine(value.text)
+	
+	dispatch = {
+		'comment': run_comment,
+		'blockcomment': run_comment,
+		'blockstart': run_blockstart,
+		'blockend': run_blockend,
+		'defcall': run_defcall,
+		'prefixed': run_defcall
+	}
+	
+	def end_block(self):
+		self.blocklevel -= 1
+		if self.blocklevel < 0:
+			self.blocklevel = 0
+		value = (BFunc(self.blocktokens, self.scope) if self.scopedblock
+			else BProc(self.blocktokens, self.scope))
+		self.blocktokens = []
+		self.scopedblock = True
+		return value
+	
+	def trace_token(self, token):
 		if self.broken:
 			return
-		if self.debug:
-			self.debug_print('[Token] {}'.format(repr(token)),
-				VALUE_COLORS)
+		self.debug_print('[Token] {}'.format(repr(token)), VALUE_COLORS)
 		if token.type in ['comment', 'blockcomment']:
-			if self.debug:
-				self.debug_print('[Comment]', INFO_COLORS)
+			self.debug_print('[Comment]', INFO_COLORS)
 			return
 		elif token.type == 'blockstart':
 			if self.blocklevel > 0:
-				if self.debug:
-					self.debug_print('Start block within block',
-						INFO_COLORS)
+				self.debug_print('Start block within block', INFO_COLORS)
 				self.blocktokens.append(token)
 			else:
-				if self.debug:
-					self.debug_print('Start block',
-						INFO_COLORS)
+				self.debug_print('Start block', INFO_COLORS)
 				self.scopedblock = token.text == '\\{'
 			self.blocklevel += 1
 			self.print_state()
 			return
 		elif token.type == 'blockend':
 			if self.blocklevel > 1:
-				if self.debug:
-					self.debug_print('End block within block',
-						INFO_COLORS)
+				self.debug_print('End block within block', INFO_COLORS)
 				self.blocktokens.append(token)
 				self.blocklevel -= 1
 				self.print_state()
 				return
-			if self.debug:
-				self.debug_print('End block',
-					INFO_COLORS)
+			self.debug_print('End block', INFO_COLORS)
 			self.blocklevel -= 1
 			if self.blocklevel < 0:
 				self.blocklevel = 0
-				if self.debug:
-					self.debug_print("Warning: '}' without '{'; "
-						"pushing empty block", ALERT_COLORS)
+				self.debug_print("Warning: '}' without '{'; "
+					"pushing empty block", ALERT_COLORS)
 			value = (BFunc(self.blocktokens, self.scope) if self.scopedblock
 				else BProc(self.blocktokens, self.scope))
 			self.blocktokens = []
@@ -1286,23 +2536,20 @@ class BContext(object):
 			if token.type == 'prefixed':
 				token = parse_prefixed(token)
 			if self.blocklevel > 1:
-				if self.debug:
-					self.debug_print('End block within block; '
-						'define and call as: {}'
-						.format(token.text), INFO_COLORS)
+				self.debug_print('End block within block; '
+					'define and call as: {}'
+					.format(token.text), INFO_COLORS)
 				self.blocktokens.append(token)
 				self.blocklevel -= 1
 				self.print_state()
 				return
-			if self.debug:
-				self.debug_print('End block; define and call as: {}'
-					.format(token.text), INFO_COLORS)
+			self.debug_print('End block; define and call as: {}'
+				.format(token.text), INFO_COLORS)
 			self.blocklevel -= 1
 			if self.blocklevel < 0:
 				self.blocklevel = 0
-				if self.debug:
-					self.debug_print("Warning: '\\}' without '{'; "
-						"pushing empty block", ALERT_COLORS)
+				self.debug_print("Warning: '\\}' without '{'; "
+					"pushing empty block", ALERT_COLORS)
 			if self.scopedblock:
 				value = BFunc(self.blocktokens, self.scope)
 			else:
@@ -1310,67 +2557,54 @@ class BContext(object):
 			self.blocktokens = []
 			self.scopedblock = True
 			self.define(token.text, value)
-			if self.debug:
-				self.debug_print('[Deref] {}'.format(
-					repr(safe_string(value))), VALUE_COLORS)
+			self.debug_print('[Deref] {}'.format(
+				repr(safe_string(value))), VALUE_COLORS)
 			value.apply(self)
 			self.print_state()
 			return
 		else:
 			if self.blocklevel > 0:
-				if self.debug:
-					self.debug_print('Add token to block',
-						INFO_COLORS)
+				self.debug_print('Add token to block', INFO_COLORS)
 				self.blocktokens.append(token)
 				self.print_state()
 				return
 			value = token.parse()
-		if self.debug:
-			self.debug_print('[Value] {}'.format(
-				repr(safe_string(value))), VALUE_COLORS)
+		self.debug_print('[Value] {}'.format(
+			repr(safe_string(value))), VALUE_COLORS)
 		if isinstance(value, BType):
 			try:
 				deref = self.dereference(token.text)
-				if self.debug:
-					self.debug_print('Call dereferenced value',
-						INFO_COLORS)
-					self.debug_print('[Deref] {}'.format(
-						repr(safe_string(deref))),
-						VALUE_COLORS)
+				self.debug_print('Call dereferenced value', INFO_COLORS)
+				self.debug_print('[Deref] {}'.format(
+					repr(safe_string(deref))),
+					VALUE_COLORS)
 				deref.apply(self)
 			except NameError:
-				if self.debug:
-					self.debug_print('Push value onto stack',
-						INFO_COLORS)
+				self.debug_print('Push value onto stack', INFO_COLORS)
 				self.push(value)
 		elif value.type == 'ref':
-			if self.debug:
-				self.debug_print('Push dereferenced value onto stack',
-					INFO_COLORS)
+			self.debug_print('Push dereferenced value onto stack', INFO_COLORS)
 			deref = self.dereference(value.text)
-			if self.debug:
-				self.debug_print('[Deref] {}'.format(
-					repr(safe_string(deref))), VALUE_COLORS)
+			self.debug_print('[Deref] {}'.format(
+				repr(safe_string(deref))), VALUE_COLORS)
 			self.push(deref)
 		elif value.type == 'def':
-			if self.debug:
-				self.debug_print('Define value at top of stack as: {}'
-					.format(value.text), INFO_COLORS)
+			self.debug_print('Define value at top of stack as: {}'
+				.format(value.text), INFO_COLORS)
 			self.define(value.text, self.top())
 		elif value.type == 'undef':
-			if self.debug:
-				self.debug_print('Undefine: {}'.format(value.text),
-					INFO_COLORS)
+			self.debug_print('Undefine: {}'.format(value.text), INFO_COLORS)
 			self.undefine(value.text)
 		elif value.type == 'call':
-			if self.debug:
-				self.debug_print('Call dereferenced value',
-					INFO_COLORS)
+			self.debug_print('Call dereferenced value', INFO_COLORS)
 			deref = self.dereference(value.text)
-			if self.debug:
-				self.debug_print('[Deref] {}'.format(
-					repr(safe_string(deref))), VALUE_COLORS)
-			deref.apply(self)
+			self.debug_print('[Deref] {}'.format(
+				repr(safe_string(deref))), VALUE_COLORS)
+			if (self.profile is not None and isinstance(deref, BBuiltin)
+				and deref.specializations):
+				self.profile.apply(self, token, deref)
+			else:
+				deref.apply(self)
 		self.print_state()
 	
 	def execute_tokens(self, tokens):
@@ -1425,31 +2659,41 @@ class BContext(object):
 				del self.scope[ref]
 	
 	def dereference(self, ref):
-		if ref.startswith('g'):
-			# Global (outermost) scope
-			if self.parent:
-				try:
-					return self.parent.dereference(ref)
-				except NameError:
-					pass
-			aref = ref[1:]
-			if aref in builtins:
-				return builtins[aref]
-			elif aref in self.scope:
-				return self.scope[aref]
-			raise NameError('undefined name: {}'.format(repr(aref)))
-		if ref.startswith('n'):
-			ref = ref[1:]
-		else:
-			if ref.startswith('l'):
+		value = self.lookup(ref)
+		if value is None:
+			if ref[:1] in ['g', 'n', 'l']:
 				ref = ref[1:]
-			if ref in self.scope:
-				return self.scope[ref]
-		if self.parent:
-			return self.parent.dereference(ref)
-		if ref in builtins:
-			return builtins[ref]
-		raise NameError('undefined name: {}'.format(repr(ref)))
+			raise NameError('undefined name: {}'.format(repr(ref)))
+		return value
+	
+	def lookup(self, ref):
+		# Contexts nest as deeply as a script recurses, so they are walked
+		# in a loop rather than recursively
+		context = self
+		while not ref.startswith('g'):
+			if ref.startswith('n'):
+				ref = ref[1:]
+			else:
+				if ref.startswith('l'):
+					ref = ref[1:]
+				if ref in context.scope:
+					return context.scope[ref]
+			if not context.parent:
+				return builtins.get(ref, None)
+			context = context.parent
+		# Global (outermost) scope, then the scopes within it
+		aref = ref[1:]
+		if aref in builtins:
+			return builtins[aref]
+		contexts = []
+		while context:
+			contexts.append(context)
+			context = context.parent
+		for context in reversed(contexts):
+			value = context.scope.get(aref, None)
+			if value is not None:
+				return value
+		return None
 	
 	def adjust_leftbs(self, old_n):
 		d = old_n - len(self.stack)
@@ -1538,10 +2782,11 @@ class BContext(object):
 	
 	def subcontext(self, script):
 		context = BContext(script, encoding=self.encoding,
-			debug=self.debug, level=self.level+1)
+			debug=self.debug, level=self.level+1, state=self.state)
 		context.parent = self
 		context.global_py_ns = self.global_py_ns
 		context.nesting = self.nesting
+		context.profile = self.profile
 		return context
 	
 	def inherit_scope(self, scope):
@@ -1549,27 +2794,145 @@ class BContext(object):
 		self.scope = scope
 	
 	def apply_value(self, value):
+		if not self.debug:
+			self.push(value.copy())
+			return
 		self.nesting += 1
-		if self.debug:
-			self.debug_print('[Value] {}'.format(
-				repr(safe_string(value))), HEADER_COLORS)
-			self.debug_print('Push value onto stack', INFO_COLORS)
-		self.push(value)
+		self.debug_print('[Value] {}'.format(
+			repr(safe_string(value))), HEADER_COLORS)
+		self.debug_print('Push value onto stack', INFO_COLORS)
+		self.push(value.copy())
 		self.nesting -= 1
 	
-	def apply_code(self, code):
+	def apply_code(self, code, tokens=None):
+		if not self.debug:
+			self.execute_tokens(tokens or BContext.tokenized(code))
+			return
 		self.nesting += 1
-		if self.debug:
-			self.debug_print('[Code] {}'.format(code), HEADER_COLORS)
-		tokens = BContext.tokenized(code)
-		if self.debug:
-			self.debug_print('[Tokens] {}'.format(' '.join(map(str, tokens))),
-				SUBHEADER_COLORS)
+		self.debug_print('[Code] {}'.format(code), HEADER_COLORS)
+		tokens = tokens or BContext.tokenized(code)
+		self.debug_print('[Tokens] {}'.format(' '.join(map(str, tokens))),
+			SUBHEADER_COLORS)
 		self.print_state()
 		self.execute_tokens(tokens)
 		self.nesting -= 1
 
 
+#################### Birdiescript type profiles ####################
+
+class BProfile(object):
+	"""
+	Operand types observed at the builtin call sites of a script.
+	
+	Call sites are keyed by token position and text, so a profile can be
+	saved next to its script and loaded by later runs. Each call site is
+	bound to the builtin specialization for its most common operand types
+	(or, with no history, the first types seen), and a type guard falls
+	back to the generic builtin whenever the operands differ.
+	"""
+	
+	extension = '.bprof'
+	
+	def __init__(self, path=None, record=True):
+		self.path = path
+		self.record = record
+		self.counts = {}
+		self.observed = {}
+		self.sites = {}
+		self.bindings = {}
+	
+	@staticmethod
+	def type_names(classes):
+		return ' '.join(c.__name__ for c in classes)
+	
+	def attach(self, tokens):
+		"""Register the tokens of a script as call sites."""
+		for token in tokens:
+			self.sites[id(token)] = '{}:{}'.format(token.pos, token.text)
+	
+	def load(self):
+		if not self.path or not os.path.exists(self.path):
+			return
+		with io.open(self.path, 'r', encoding='utf-8') as file:
+			data = json.load(file)
+		for (site, counts) in data.get('sites', {}).items():
+			self.counts[site] = dict(counts)
+	
+	def save(self):
+		if not self.path or not self.record:
+			return
+		# Operand types are counted by class while running, and by name
+		# in the saved profile
+		for (site, observed) in self.observed.items():
+			counts = self.counts.setdefault(site, {})
+			for (classes, n) in observed.items():
+				names = BProfile.type_names(classes)
+				counts[names] = counts.get(names, 0) + n
+		self.observed = {}
+		data = {'version': version, 'sites': self.counts}
+		with io.open(self.path, 'w', encoding='utf-8') as file:
+			file.write(str(json.dumps(data, indent=1, sort_keys=True)))
+	
+	def hint(self, site):
+		"""Return the most common operand types observed at a call site."""
+		counts = self.counts.get(site, None)
+		if not counts:
+			return None
+		return max(sorted(counts), key=counts.get)
+	
+	def bind(self, token, builtin, operands):
+		site = self.sites.get(id(token), None)
+		if site is None:
+			binding = (builtin, None, None, None)
+		else:
+			hint = self.hint(site)
+			if hint is None and operands is not None:
+				hint = BProfile.type_names(operands)
+			observed = None
+			if self.record:
+				observed = self.observed.setdefault(site, {})
+			for (classes, func) in builtin.specializations.items():
+				if BProfile.type_names(classes) == hint:
+					binding = (builtin, classes, func, observed)
+					break
+			else:
+				binding = (builtin, None, None, observed)
+		self.bindings[id(token)] = binding
+		return binding
+	
+	def apply(self, context, token, builtin):
+		"""Apply a builtin at a call site, using its bound specialization."""
+		func = self.select(context, token, builtin)
+		if func is None:
+			builtin.apply(context)
+		else:
+			func(context)
+	
+	def select(self, context, token, builtin):
+		"""
+		Return the specialization bound at a call site if the operands on
+		the stack have its types, or None to apply the generic builtin.
+		"""
+		if not BBuiltin.specialized:
+			return None
+		stack = context.stack
+		arity = builtin.arity
+		operands = None
+		if len(stack) >= arity:
+			operands = tuple(map(type, stack[-arity:]))
+		binding = self.bindings.get(id(token), None)
+		if binding is None or binding[0] is not builtin:
+			binding = self.bind(token, builtin, operands)
+		(_, classes, func, observed) = binding
+		if operands is None:
+			return None
+		if observed is not None:
+			observed[operands] = observed.get(operands, 0) + 1
+		if classes is not None and operands[-len(classes):] == classes:
+			return func
+		return None
+
+
 #################### Command-line interface ####################
 
 def predefine_variables(context, filename, script, argv):
@@ -1580,11 +2943,34 @@ def predefine_variables(context, filename, script, argv):
 	context.scope['_t'] = BStr(time.strftime('%H:%M:%S'))
 	context.scope['_v'] = BStr(version)
 
-def execute_file(filename, script, argv, encoding, debug):
+def read_script(filename, encoding):
+	with io.open(filename, 'r', encoding=encoding) as file:
+		return file.read()
+
+def execute_file(filename, script, argv, encoding, debug, profile=False,
+	tokens=None, reraise=()):
+	"""
+	Execute a script, and report any error in it, except for those of the
+	exception types in reraise, which are raised to the caller.
+	"""
 	context = BContext(script, encoding, debug)
+	if tokens is not None:
+		context.tokens = list(tokens)
 	predefine_variables(context, filename, script, argv)
+	if profile:
+		path = None
+		if filename and filename != '<stdin>':
+			path = filename + BProfile.extension
+		context.profile = BProfile(path)
 	try:
+		if context.profile is not None:
+			context.profile.load()
+			if context.tokens is None:
+				context.tokenize()
+			context.profile.attach(context.tokens)
 		context.execute(printstack=True)
+	except reraise:
+		raise
 	except Exception as ex:
 		sys.stdout.flush()
 		colors.set_colors(ALERT_COLORS)
@@ -1593,6 +2979,9 @@ def execute_file(filename, script, argv, encoding, debug):
 			traceback.print_exc(ex)
 		colors.set_colors(colors.DEFAULT_COLORS)
 		sys.exit(1)
+	finally:
+		if context.profile is not None:
+			context.profile.save()
 
 def repl_environment(argv, encoding, debug):
 	context = BContext('', encoding, debug)
@@ -1683,12 +3072,79 @@ def main():
 		help='show this help message and exit')
 	parser.add_argument('-m', '--maxdepth', metavar='DEPTH',
 		help='set maximum recursion depth [default: %d]' % default_limit)
+	parser.add_argument('-p', '--profile', action='store_const', const=True,
+		help='record operand types in FILE' + BProfile.extension +
+			' and use them to specialize builtins')
 	parser.add_argument('-r', '--repl', action='store_const', const=True,
 		help='run as REPL environment')
 	parser.add_argument('-v', '--version', action='version',
 		version='%(prog)s {}'.format(version))
+	parser.add_argument('--verify', action='store_const', const=True,
+		help='run script under both the reference and optimized '
+			'interpreters, and report the first divergent token')
+	parser.add_argument('--fuzz', metavar='COUNT', type=int,
+		help='verify COUNT randomly generated scripts and exit')
+	parser.add_argument('--stress', metavar='COUNT', type=int,
+		help='run COUNT randomly generated scripts concurrently in threads, '
+			'check them against serial runs, and exit')
+	parser.add_argument('--bench-scheduler', metavar='COUNT', type=int,
+		help='run COUNT small generated scripts on the cooperative '
+			'scheduler, report throughput and fairness, and exit')
+	parser.add_argument('--bench-strings', metavar='SIZE', type=int,
+		help='time string builtins on a string of SIZE characters and on '
+			'the same list of code points, and exit')
+	parser.add_argument('--bench-linalg', metavar='SIZE', type=int,
+		help='time linear algebra builtins natively and by their '
+			'definitions on SIZE by SIZE matrices, and exit')
+	parser.add_argument('--bench-chains', metavar='SIZE', type=int,
+		help='time chains of map, filter and fold builtins over SIZE '
+			'numbers fused and stage by stage, and exit')
+	parser.add_argument('--bench-ropes', metavar='SIZE', type=int,
+		help='time building and slicing strings of SIZE characters one '
+			'at a time with ropes and with plain strings, and exit')
+	parser.add_argument('--bench-dispatch', metavar='COUNT', type=int,
+		help='time blocks applied COUNT times through the dispatch loop '
+			'and through the --debug trace path, and exit')
+	parser.add_argument('--bench-memo', metavar='N', type=int,
+		help='time computing Fibonacci numbers up to the Nth recursively '
+			'with and without memoizing, and exit; memoized blocks nest up '
+			'to DEPTH blocks deep')
+	parser.add_argument('--bench-profile', metavar='COUNT', type=int,
+		help='time blocks applied COUNT times with builtins specialized '
+			'by a type profile and with the generic builtins, and exit')
+	parser.add_argument('--serve', metavar='SOCKET',
+		help='serve script requests on the UNIX socket SOCKET')
+	parser.add_argument('--client', metavar='SOCKET',
+		help='run script on the server listening on SOCKET')
+	parser.add_argument('--batch', metavar='MANIFEST',
+		help='run the jobs listed in MANIFEST in parallel and print a '
+			'report')
+	parser.add_argument('--coordinator', metavar='HOST:PORT',
+		help='run the --batch jobs on remote workers that connect to '
+			'HOST:PORT')
+	parser.add_argument('--worker', metavar='HOST:PORT',
+		help='run batch jobs from the coordinator at HOST:PORT')
+	parser.add_argument('--judge', nargs=2, metavar=('FILE', 'CASES_DIR'),
+		help='run the script in FILE against the test cases in CASES_DIR '
+			'and print a report')
+	parser.add_argument('--fail-fast', action='store_const', const=True,
+		default=False, help='stop judging at the first failed case')
+	parser.add_argument('--timeout', metavar='SECS', type=float,
+		help='limit the running time of each batch job or judged case')
+	parser.add_argument('--workers', metavar='N', type=int,
+		help='number of server, batch or remote worker processes '
+			'[default: number of CPUs], or of --stress threads [default: 16]')
+	parser.add_argument('--max-requests', metavar='N', type=int,
+		default=1000,
+		help='replace each server worker after N requests [default: 1000]')
+	parser.add_argument('--cpu-limit', metavar='SECS', type=float,
+		help='limit the CPU time of each server request')
+	parser.add_argument('--mem-limit', metavar='MB', type=float,
+		help='limit the memory of each server request')
 	
 	args = vars(parser.parse_args(sys.argv[1:]))
+	if args['coordinator'] is not None and args['batch'] is None:
+		parser.error('--coordinator requires --batch')
 	
 	try:
 		limit = int(args.get('maxdepth', 0))
@@ -1699,6 +3155,80 @@ def main():
 	argv = args.get('ARGS', [])
 	debug = args.get('debug', False)
 	encoding = args.get('encoding')
+	profile = args.get('profile', False)
+	execute = execute_file
+	
+	if args.get('fuzz', None) is not None:
+		from . import verify
+		verify.fuzz(args['fuzz'])
+		return
+	if args.get('stress', None) is not None:
+		from . import verify
+		verify.stress(args['stress'], args.get('workers', None))
+		return
+	if args.get('bench_scheduler', None) is not None:
+		from . import scheduler
+		scheduler.benchmark(args['bench_scheduler'])
+		return
+	if args.get('bench_strings', None) is not None:
+		from . import bench
+		bench.strings(args['bench_strings'])
+		return
+	if args.get('bench_linalg', None) is not None:
+		from . import bench
+		bench.linalg(args['bench_linalg'])
+		return
+	if args.get('bench_chains', None) is not None:
+		from . import bench
+		bench.chains(args['bench_chains'])
+		return
+	if args.get('bench_ropes', None) is not None:
+		from . import bench
+		bench.ropes(args['bench_ropes'])
+		return
+	if args.get('bench_dispatch', None) is not None:
+		from . import bench
+		bench.dispatch(args['bench_dispatch'])
+		return
+	if args.get('bench_memo', None) is not None:
+		from . import bench
+		bench.memo(args['bench_memo'])
+		return
+	if args.get('bench_profile', None) is not None:
+		from . import bench
+		bench.profiled(args['bench_profile'])
+		return
+	if args.get('serve', None) is not None:
+		from . import server
+		server.serve(args['serve'], args['workers'], args['max_requests'],
+			args['cpu_limit'], args['mem_limit'])
+		return
+	if args.get('coordinator', None) is not None:
+		from . import distributed
+		distributed.coordinate(args['batch'], args['coordinator'], encoding,
+			args['timeout'])
+		return
+	if args.get('worker', None) is not None:
+		from . import distributed
+		distributed.work(args['worker'], args['workers'])
+		return
+	if args.get('judge', None) is not None:
+		from . import judge
+		(filename, directory) = args['judge']
+		judge.judge(filename, directory, encoding,
+			args['timeout'], args['fail_fast'])
+		return
+	if args.get('batch', None) is not None:
+		from . import batch
+		batch.run_batch(args['batch'], encoding, args['workers'],
+			args['timeout'])
+		return
+	if args.get('verify', False):
+		from . import verify
+		execute = verify.verify_file
+	elif args.get('client', None) is not None:
+		from . import server
+		execute = server.remote_executor(args['client'])
 	
 	if args.get('cmd', None) is not None:
 		# Execute script from -c/--cmd flag
@@ -1707,7 +3237,7 @@ def main():
 		arg1 = args.get('FILE', None)
 		if arg1 is not None:
 			argv.insert(0, arg1)
-		execute_file(filename, script, argv, encoding, debug)
+		execute(filename, script, argv, encoding, debug, profile)
 	elif args.get('repl', False):
 		# Run an interactive REPL environment
 		arg1 = args.get('FILE', None)
@@ -1718,12 +3248,11 @@ def main():
 		# Execute script read from FILE
 		filename = args['FILE']
 		try:
-			with codecs.open(filename, 'rU', encoding) as file:
-				script = file.read()
+			script = read_script(filename, encoding)
 		except Exception as ex:
 			print(ex)
 			exit(1)
-		execute_file(filename, script, argv, encoding, debug)
+		execute(filename, script, argv, encoding, debug, profile)
 	elif not sys.stdin.isatty():
 		# Execute script read from stdin
 		filename = '<stdin>'
@@ -1732,7 +3261,7 @@ def main():
 		except Exception as ex:
 			print(ex)
 			exit(1)
-		execute_file(filename, script, argv, encoding, debug)
+		execute(filename, script, argv, encoding, debug, profile)
 	else:
 		# Run an interactive REPL environment
 		repl_environment(argv, encoding, debug)
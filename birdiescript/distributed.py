@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+Distribute batch jobs across hosts over TCP.
+
+A coordinator reads a batch manifest and listens for workers. It hands
+each worker one job at a time, with the script source, arguments, input
+and expected output inlined, so workers need no shared filesystem. Workers
+run each job and send back its result, sending heartbeats meanwhile. A job
+whose worker disconnects or stops sending heartbeats is requeued, up to a
+fixed number of attempts. The report is printed in manifest order, as for
+a local batch run.
+
+Messages use the server's framing: a 4-byte big-endian length followed by
+a UTF-8 JSON object, whose "type" is "job", "result" or "heartbeat".
+"""
+
+
+#################### Imports ####################
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import sys             # exit
+import time            # sleep, time
+import socket          # socket, create_connection, error, timeout
+import signal          # signal, SIGALRM, SIGINT
+import threading       # Thread, Event, Lock
+import multiprocessing # Process, cpu_count
+
+try:
+	import queue # Queue, Empty
+except ImportError:
+	import Queue as queue
+
+from .core import *
+from .server import send_message, receive_message
+from .batch import (load_manifest, compile_scripts, job_inputs, job_alarm,
+	failed_result, run_program, report)
+
+
+#################### Settings ####################
+
+# Seconds between worker heartbeats, and without one before a worker is lost
+heartbeat_interval = 1.0
+heartbeat_timeout = 10.0
+
+# Times a job is sent to a worker before it is reported as lost
+max_attempts = 3
+
+# Seconds with no worker connected and no result before the remaining jobs
+# are reported as failed
+idle_timeout = 60.0
+
+# Times a worker tries to reach its coordinator, and seconds between tries
+connect_attempts = 20
+connect_delay = 0.5
+
+def parse_address(address):
+	"""Split a HOST:PORT address; the host defaults to localhost."""
+	(host, _, port) = address.rpartition(':')
+	host = host.strip('[]') or 'localhost'
+	return (host, int(port))
+
+def alert(message):
+	colors.set_colors(ALERT_COLORS)
+	print('Error: {}'.format(message))
+	colors.set_colors(colors.DEFAULT_COLORS)
+
+
+#################### Coordinator ####################
+
+def job_tasks(jobs, programs, encoding, timeout, results):
+	"""
+	Return a task message for each job that can be run. Jobs whose script
+	or input cannot be read are failed immediately.
+	"""
+	tasks = []
+	for job in jobs:
+		(source, _, error) = programs[job['script']]
+		if error is None:
+			try:
+				(stdin, expected) = job_inputs(job, encoding)
+			except (IOError, OSError) as ex:
+				error = 'Error: {}\n'.format(ex)
+		if error is not None:
+			results.put(failed_result(job, error))
+			continue
+		tasks.append({'type': 'job', 'job': job, 'source': source,
+			'stdin': stdin, 'expected': expected, 'encoding': encoding,
+			'timeout': timeout, 'attempt': 0})
+	return tasks
+
+def await_result(conn):
+	"""Wait for a job's result; heartbeats just keep the connection alive."""
+	while True:
+		message = receive_message(conn)
+		if message.get('type') == 'result':
+			return message['result']
+
+def requeue(task, work, results):
+	task['attempt'] += 1
+	if task['attempt'] < max_attempts:
+		work.put(task)
+	else:
+		results.put(failed_result(task['job'], 'Error: worker lost\n'))
+
+def serve_worker(conn, work, results, finished, live):
+	"""Send jobs to one worker until the batch is finished or it is lost."""
+	conn.settimeout(heartbeat_timeout)
+	live.add(conn)
+	try:
+		while not finished.is_set():
+			try:
+				task = work.get(timeout=heartbeat_interval)
+			except queue.Empty:
+				continue
+			try:
+				send_message(conn, task)
+				result = await_result(conn)
+			except (EOFError, ValueError, KeyError, socket.error):
+				requeue(task, work, results)
+				return
+			results.put(result)
+	finally:
+		live.discard(conn)
+		conn.close()
+
+def accept_workers(listener, work, results, finished, live):
+	while not finished.is_set():
+		try:
+			(conn, _) = listener.accept()
+		except socket.error:
+			return
+		thread = threading.Thread(target=serve_worker,
+			args=(conn, work, results, finished, live))
+		thread.daemon = True
+		thread.start()
+
+def coordinate(manifest, address, encoding='utf-8', timeout=None):
+	"""
+	Run every job in a manifest on the workers that connect to an address,
+	print a JSON Lines report, and exit with status 1 if any job failed.
+	If no worker is connected and no result arrives for idle_timeout
+	seconds, the remaining jobs are reported as failed.
+	"""
+	jobs = load_manifest(manifest)
+	programs = compile_scripts(jobs, encoding)
+	(work, results) = (queue.Queue(), queue.Queue())
+	for task in job_tasks(jobs, programs, encoding, timeout, results):
+		work.put(task)
+	listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+	try:
+		listener.bind(parse_address(address))
+		listener.listen(128)
+	except (ValueError, socket.error) as ex:
+		alert(ex)
+		sys.exit(1)
+	(finished, live) = (threading.Event(), set())
+	thread = threading.Thread(target=accept_workers,
+		args=(listener, work, results, finished, live))
+	thread.daemon = True
+	thread.start()
+	(done, failed, progress) = ({}, False, time.time())
+	try:
+		for i in range(len(jobs)):
+			while i not in done:
+				try:
+					result = results.get(timeout=heartbeat_interval)
+				except queue.Empty:
+					if live:
+						progress = time.time()
+					elif time.time() - progress > idle_timeout:
+						for job in jobs[i:]:
+							done.setdefault(job['index'], failed_result(job,
+								'Error: no workers\n'))
+					continue
+				progress = time.time()
+				done[result['index']] = result
+			failed = report(done.pop(i)) or failed
+	finally:
+		finished.set()
+		listener.close()
+	if failed:
+		sys.exit(1)
+
+
+#################### Workers ####################
+
+def connect(address):
+	for attempt in range(connect_attempts):
+		try:
+			return socket.create_connection(address)
+		except socket.error:
+			if attempt == connect_attempts - 1:
+				raise
+			time.sleep(connect_delay)
+
+def heartbeat(conn, lock, stopped):
+	while not stopped.wait(heartbeat_interval):
+		try:
+			with lock:
+				send_message(conn, {'type': 'heartbeat'})
+		except socket.error:
+			return
+
+def worker(address):
+	"""Run jobs from a coordinator until it closes the connection."""
+	signal.signal(signal.SIGALRM, job_alarm)
+	conn = connect(parse_address(address))
+	(lock, stopped) = (threading.Lock(), threading.Event())
+	thread = threading.Thread(target=heartbeat, args=(conn, lock, stopped))
+	thread.daemon = True
+	thread.start()
+	programs = {}
+	try:
+		while True:
+			try:
+				task = receive_message(conn)
+			except (EOFError, socket.error):
+				# The coordinator is done
+				return
+			if task.get('type') != 'job':
+				continue
+			source = task['source']
+			if source not in programs:
+				programs[source] = BContext.tokenized(source)
+			result = run_program(task['job'], source, programs[source],
+				task['stdin'], task['expected'], task['encoding'],
+				task['timeout'])
+			with lock:
+				send_message(conn, {'type': 'result', 'result': result})
+	finally:
+		stopped.set()
+		conn.close()
+
+def worker_process(address):
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	try:
+		worker(address)
+	except (ValueError, socket.error) as ex:
+		alert(ex)
+		sys.exit(1)
+
+def work(address, workers=None):
+	"""Run jobs from a coordinator in worker processes until it finishes."""
+	workers = workers or multiprocessing.cpu_count()
+	processes = [multiprocessing.Process(target=worker_process,
+		args=(address,)) for _ in range(workers)]
+	for process in processes:
+		process.start()
+	try:
+		for process in processes:
+			process.join()
+	except KeyboardInterrupt:
+		for process in processes:
+			process.terminate()
+		raise
+	if any(process.exitcode for process in processes):
+		sys.exit(1)
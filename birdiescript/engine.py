@@ -0,0 +1,531 @@
+# -*- coding: utf-8 -*-
+"""
+A resumable interpreter engine.
+
+execute_steps() runs a context like BContext.execute(), but as a generator
+of steps that the caller drives, so many scripts can be interleaved in one
+thread, or one script paused between any two tokens. A step is one of:
+
+- None, after each token;
+- a nested step generator, which must be run to completion first;
+- a BRequest, for input, output or waiting that the script needs; the
+  request's result must be sent back into the generator.
+
+Nested generators are yielded rather than delegated to, and flatten() runs
+them depth first, so the engine also works on Python 2. Blocks, code
+builtins, the control and loop builtins, and the input, file, network,
+command, sleep, thread join and channel receive builtins have step
+versions. Any other builtin runs to completion in a single step. Memoized
+blocks run through the engine even when the rest of a script does not,
+so they can recurse without nesting on the Python stack.
+"""
+
+
+#################### Imports ####################
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import sys   # getrecursionlimit
+import time  # sleep
+import types # GeneratorType
+
+from .core import *
+from .builtins import (areinstances, isolation, lazily, mapped, filtered,
+	repeating, folding, eaching, mapping, filtering, upto, read_file,
+	read_binary, read_url, run_command, join_threads)
+
+
+#################### Requests ####################
+
+class BRequest(object):
+	"""
+	An operation that a script waits on. The kinds are 'read' (a number of
+	characters, or -1 for all), 'readline', 'sleep' (a number of seconds),
+	'exec' (a command line and environment), and 'call' (a blocking
+	function and its arguments).
+	"""
+
+	def __init__(self, kind, *args):
+		self.kind = kind
+		self.args = args
+
+	def __repr__(self):
+		return 'BRequest({})'.format(', '.join(map(repr,
+			(self.kind,) + self.args)))
+
+def perform(request, stdin):
+	"""Carry out a request by blocking, and return its result."""
+	if request.kind == 'read':
+		return stdin.read(*request.args)
+	elif request.kind == 'readline':
+		return stdin.readline()
+	elif request.kind == 'sleep':
+		time.sleep(*request.args)
+	elif request.kind == 'exec':
+		return run_command(*request.args)
+	elif request.kind == 'call':
+		(function, args) = (request.args[0], request.args[1:])
+		return function(*args)
+	else:
+		raise ValueError('unknown request: {}'.format(request.kind))
+
+
+#################### Driving steps ####################
+
+# Generators that each level of recursion in a script may nest; blocks
+# nest at most to the recursion limit, and this bounds the rest
+steps_per_level = 8
+
+def flatten(steps):
+	"""
+	Run nested step generators depth first. Yield each token tick (None)
+	and request, and pass sent results and thrown exceptions on to the
+	innermost generator.
+	"""
+	stack = [steps]
+	(reply, error) = (None, None)
+	while stack:
+		try:
+			if error is not None:
+				(ex, error) = (error, None)
+				item = stack[-1].throw(ex)
+			else:
+				item = stack[-1].send(reply)
+		except StopIteration:
+			stack.pop()
+			reply = None
+			continue
+		except BaseException as ex:
+			stack.pop()
+			if not stack:
+				raise
+			error = ex
+			continue
+		reply = None
+		if isinstance(item, types.GeneratorType):
+			if len(stack) < steps_per_level * sys.getrecursionlimit():
+				stack.append(item)
+			else:
+				error = RuntimeError('maximum recursion depth exceeded')
+		else:
+			try:
+				reply = yield item
+			except BaseException as ex:
+				error = ex
+
+def run_stepped(context, printstack=False):
+	"""Execute a context through the engine, blocking on requests."""
+	run_steps(execute_steps(context, printstack), context)
+
+def run_steps(steps, context):
+	"""Run steps to completion in a context, blocking on requests."""
+	steps = flatten(steps)
+	reply = None
+	try:
+		while True:
+			try:
+				item = steps.send(reply)
+			except StopIteration:
+				return
+			reply = None
+			if item is not None:
+				reply = perform(item, context.reader())
+	finally:
+		steps.close()
+
+
+#################### Stepping contexts ####################
+
+def execute_steps(context, printstack=False):
+	"""Steps that execute a context, like BContext.execute()."""
+	context.prepare()
+	n = len(context.tokens)
+	while context.counter < n and not context.broken:
+		steps = token_steps(context, context.tokens[context.counter])
+		if steps is not None:
+			yield steps
+		yield None
+		context.counter += 1
+	context.conclude(printstack)
+
+def code_steps(context, tokens):
+	"""Steps that execute tokens in a context, like BContext.apply_code()."""
+	for token in tokens:
+		steps = token_steps(context, token)
+		if steps is not None:
+			yield steps
+		yield None
+		if context.broken:
+			break
+
+def token_steps(context, token):
+	"""
+	Execute a token, like BContext.execute_token(). Return the steps of the
+	value it applies, or None if it was executed in a single step.
+	"""
+	if context.broken:
+		return None
+	if context.debug or token.type not in ['name', 'call', 'defcall',
+		'prefixed']:
+		context.execute_token(token)
+		return None
+	if token.type in ['name', 'call']:
+		return value_steps(context, token)
+	if token.type == 'prefixed':
+		if not token.text.startswith('\\}'):
+			return value_steps(context, token)
+		token = parse_prefixed(token)
+	if context.blocklevel > 1:
+		context.blocktokens.append(token)
+		context.blocklevel -= 1
+		return None
+	value = context.end_block()
+	context.define(token.text, value)
+	return applying(value, context)
+
+def value_steps(context, token):
+	if context.blocklevel > 0:
+		context.run_value(token)
+		return None
+	value = token.parse()
+	if isinstance(value, BType) or value.type != 'call':
+		context.run_value(token)
+		return None
+	deref = context.dereference(value.text)
+	if (context.profile is not None and isinstance(deref, BBuiltin)
+		and deref.specializations):
+		func = context.profile.select(context, token, deref)
+		if func is not None:
+			func(context)
+			return None
+	return applying(deref, context)
+
+
+#################### Stepping values ####################
+
+# Step versions of builtins, by builtin ID
+steppers = {}
+
+def stepper(name):
+	"""Return a decorator which registers the step version of a builtin."""
+	def decorator(f):
+		steppers[id(builtins[name])] = f
+		return f
+	return decorator
+
+def steps_for(value, context, looping=False):
+	"""Return steps that apply a value, or None if it has none."""
+	if isinstance(value, BMemo):
+		return memo_steps(value, context, looping)
+	elif isinstance(value, BBlock):
+		return block_steps(value, context, looping)
+	elif isinstance(value, BBuiltin):
+		f = steppers.get(id(value), None)
+		if f is not None:
+			return f(value, context, looping)
+		if value.interpreted:
+			if value.tokens is None:
+				value.tokens = BContext.tokenized(value.code)
+			return code_steps(context, value.tokens)
+	return None
+
+def applying(value, context, looping=False):
+	"""Return steps that apply a value, in a single step if it has none."""
+	steps = steps_for(value, context, looping)
+	if steps is None:
+		return single_step(value, context, looping)
+	return steps
+
+def single_step(value, context, looping=False):
+	if looping:
+		value.apply(context, looping=True)
+	else:
+		value.apply(context)
+	yield None
+
+def block_steps(block, context, looping=False):
+	(parent, subcontext) = block.enter(context, looping)
+	if subcontext.level > sys.getrecursionlimit():
+		raise RuntimeError('maximum recursion depth exceeded')
+	try:
+		yield execute_steps(subcontext)
+	finally:
+		parent.looping = False
+
+def memo_steps(memo, context, looping=False):
+	recalled = memo.recall(context)
+	if recalled is None:
+		return
+	yield block_steps(memo, context, looping)
+	memo.remember(context, *recalled)
+
+def overloaded_operands(self, context):
+	"""
+	Pop the two operands of an overloaded builtin. If they are a callable
+	and a sequence or number, return them in that order; otherwise push
+	them back, apply the builtin in a single step, and return None.
+	"""
+	b = context.pop()
+	a = context.pop()
+	(x, y) = (a, b)
+	if (isinstance(a, BNum) and not isinstance(b, BNum) or
+		isinstance(a, BSeq) and isinstance(b, BCallable)):
+		a, b = b, a
+	if isinstance(a, BCallable) and isinstance(b, (BSeq, BNum)):
+		return (a, b)
+	context.push(x)
+	context.push(y)
+	self.apply(context)
+	return None
+
+
+#################### Control functions ####################
+
+@stepper('I')
+def if_steps(self, context, looping=False):
+	do_else = context.pop()
+	do_then = context.pop()
+	if context.pop():
+		yield applying(do_then, context)
+	else:
+		yield applying(do_else, context)
+
+@stepper('W')
+def while_steps(self, context, looping=False):
+	do_body = context.pop()
+	do_cond = context.pop()
+	if not isinstance(do_body, BCallable):
+		raise BTypeError(self, (do_cond, do_body))
+	yield applying(do_cond, context)
+	cond = context.pop()
+	while cond and not context.broken:
+		yield applying(do_body, context, True)
+		yield applying(do_cond, context)
+		cond = context.pop()
+	if context.broken != BContext.EXITED:
+		context.broken = False
+
+@stepper('Du')
+def do_until_steps(self, context, looping=False):
+	do_body = context.pop()
+	if not isinstance(do_body, BCallable):
+		raise BTypeError(self, do_body)
+	yield applying(do_body, context, True)
+	cond = context.pop()
+	while not cond.value and not context.broken:
+		yield applying(do_body, context, True)
+		cond = context.pop()
+	if context.broken != BContext.EXITED:
+		context.broken = False
+
+@stepper('D')
+def do_while_steps(self, context, looping=False):
+	a = context.pop()
+	if not isinstance(a, BCallable):
+		context.push(a)
+		self.apply(context)
+		return
+	yield applying(a, context, True)
+	b = context.pop()
+	while b and not context.broken:
+		yield applying(a, context, True)
+		b = context.pop()
+	if context.broken != BContext.EXITED:
+		context.broken = False
+
+@stepper('X')
+def eval_steps(self, context, looping=False):
+	a = context.pop()
+	if isinstance(a, BSeq):
+		av = a.convert(BStr()).value
+		yield code_steps(context, BContext.tokenized(av))
+	else:
+		yield applying(a, context)
+
+
+#################### Loop functions ####################
+
+@stepper('*')
+def times_steps(self, context, looping=False):
+	operands = overloaded_operands(self, context)
+	if operands is None:
+		return
+	(a, b) = operands
+	if isinstance(b, BNum):
+		# Execute block a number of times
+		fs = repeating(a, int(b.simplify().value), context)
+	else:
+		# Fold sequence with function
+		fs = folding(a, b, context)
+	for f in fs:
+		yield applying(f, context)
+
+@stepper('-')
+def each_steps(self, context, looping=False):
+	b = context.pop()
+	a = context.pop()
+	(x, y) = (a, b)
+	if (isinstance(a, BNum) and not isinstance(b, BNum) or
+		isinstance(a, BSeq) and isinstance(b, BCallable)):
+		a, b = b, a
+	aa, bb = BType.commonize(a, b)
+	if (areinstances((aa, bb), BNum) or areinstances((aa, bb), BSeq) or
+		not isinstance(a, BCallable) or not isinstance(b, (BSeq, BNum))):
+		context.push(x)
+		context.push(y)
+		self.apply(context)
+		return
+	# Execute block with each item in sequence, or in [0, N)
+	xs = b.elements() if isinstance(b, BSeq) else upto(b)
+	for f in eaching(a, xs, context):
+		yield applying(f, context)
+
+@stepper('|')
+def map_steps(self, context, looping=False):
+	operands = overloaded_operands(self, context)
+	if operands is None:
+		return
+	(a, b) = operands
+	if lazily(a, b, context, None):
+		context.push(BStream(source=mapped(a, b, isolation(context))))
+		return
+	xs = b.elements() if isinstance(b, BSeq) else upto(b)
+	cv = []
+	for f in mapping(a, xs, context, cv):
+		yield applying(f, context)
+	context.push(BVector.of(cv))
+
+@stepper('&')
+def filter_steps(self, context, looping=False):
+	operands = overloaded_operands(self, context)
+	if operands is None:
+		return
+	(a, b) = operands
+	if lazily(a, b, context):
+		context.push(BStream(source=filtered(a, b, isolation(context))))
+		return
+	xs = b.elements() if isinstance(b, BSeq) else upto(b)
+	cv = []
+	for f in filtering(a, xs, context, cv):
+		yield applying(f, context)
+	context.push(BList(cv).convert(b) if isinstance(b, BSeq) else BList(cv))
+
+
+#################### Input functions ####################
+
+@stepper('>i')
+def read_steps(self, context, looping=False):
+	context.push(BStr((yield BRequest('read', -1))))
+
+@stepper('>c')
+def readchar_steps(self, context, looping=False):
+	rv = yield BRequest('read', 1)
+	if not rv:
+		context.push(BInt(-1))
+		return
+	context.push(BStr(rv).simplify().value[0])
+
+@stepper('>n')
+def readline_steps(self, context, looping=False):
+	context.push(BStr((yield BRequest('readline'))))
+
+@stepper('>o')
+def readstring_steps(self, context, looping=False):
+	rv = []
+	while True:
+		c = yield BRequest('read', 1)
+		if not c or c == '\0':
+			break
+		rv.append(c)
+	context.push(BStr(''.join(rv)))
+
+@stepper('>w')
+def readtoken_steps(self, context, looping=False):
+	rv = []
+	while True:
+		c = yield BRequest('read', 1)
+		if not c:
+			break
+		elif not c.isspace():
+			rv.append(c)
+		elif rv:
+			break
+	context.push(BStr(''.join(rv)))
+
+@stepper('>t')
+def readupto_steps(self, context, looping=False):
+	t = context.pop()
+	if not isinstance(t, (BInt, BSeq)):
+		raise BTypeError(self, t)
+	if t == BInt(-1):
+		context.push(BStr((yield BRequest('read', -1))))
+		return
+	tv = set(t.convert(BStr()).value)
+	rv = []
+	while True:
+		c = yield BRequest('read', 1)
+		if not c or c in tv:
+			break
+		rv.append(c)
+	context.push(BStr(''.join(rv)))
+
+@stepper('>f')
+def readfile_steps(self, context, looping=False):
+	f = context.pop()
+	if not isinstance(f, BSeq):
+		raise BTypeError(self, f)
+	filename = f.convert(BStr()).value
+	context.push((yield BRequest('call', read_file, filename,
+		context.encoding)))
+
+@stepper('>b')
+def readbinary_steps(self, context, looping=False):
+	f = context.pop()
+	if not isinstance(f, BSeq):
+		raise BTypeError(self, f)
+	filename = f.convert(BStr()).value
+	context.push((yield BRequest('call', read_binary, filename,
+		context.encoding)))
+
+@stepper('>u')
+def readurl_steps(self, context, looping=False):
+	u = context.pop()
+	if not isinstance(u, BSeq):
+		raise BTypeError(self, u)
+	url = u.convert(BStr()).value
+	context.push((yield BRequest('call', read_url, url, context.encoding)))
+
+@stepper('>x')
+def system_steps(self, context, looping=False):
+	c = context.pop()
+	if not isinstance(c, BSeq):
+		raise BTypeError(self, [c])
+	context.push((yield BRequest('exec', c.convert(BStr()).value,
+		context.state.environment())))
+
+
+#################### Time functions ####################
+
+@stepper('Sp')
+def sleep_steps(self, context, looping=False):
+	n = context.pop()
+	if not isinstance(n, BReal):
+		raise BTypeError(self, [n])
+	yield BRequest('sleep', n.value)
+
+
+#################### Concurrency functions ####################
+
+@stepper('Tj')
+def join_steps(self, context, looping=False):
+	a = context.pop()
+	for x in (yield BRequest('call', join_threads, self, a)):
+		context.push(x)
+
+@stepper('Recv')
+def receive_steps(self, context, looping=False):
+	a = context.pop()
+	if not isinstance(a, BChannel):
+		raise BTypeError(self, a)
+	context.push((yield BRequest('call', a.receive)))
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+Fusion of chains of higher-order builtins.
+
+A chain such as {f}| {g}& +s maps, filters and folds a sequence, and
+builds a list after each stage. When a map or filter is followed in a
+script by blocks written out for |, & and then - or *, or by +s or *s,
+the stages are applied one item at a time instead, in a single loop, and
+no list is built in between.
+
+Only chains of pure blocks are fused, so only the order in which they run
+changes. Each block is applied to its operands on a stack of their own,
+above the top of the stack the chain started on, so it cannot see how far
+the other stages have got. Blocks that define their arguments in a shared
+scope are left with the arguments they last saw, as running the stages
+one by one would leave them. If a block reaches
+below its operands, leaves a different number of values than its stage
+takes, or fails, the chain is rolled back and run stage by stage as usual.
+"""
+
+
+#################### Imports ####################
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+from .core import *
+from .parallel import is_pure
+
+
+#################### Chains ####################
+
+# Whether chains are fused; benchmarks turn this off to compare
+enabled = True
+
+# Stages that take a block, by builtin name, and the folds that take none
+block_stages = {'|': 'map', '&': 'filter', '-': 'each', '*': 'fold'}
+fold_stages = {'+s': '+', '*s': '*'}
+
+class BFusionFallback(Exception):
+	"""A fused chain did something only its separate stages can reproduce."""
+	pass
+
+def resolve(token, context):
+	"""Return the value a name token calls, or None if it is not a call."""
+	if token.type not in ['name', 'call']:
+		return None
+	value = token.parse()
+	if isinstance(value, BType) or value.type != 'call':
+		return None
+	return context.lookup(value.text)
+
+def block_at(tokens, i, context):
+	"""
+	Return the block written out from a block start token, and the index of
+	its end token, or None if there is none.
+	"""
+	start = tokens[i]
+	depth = 0
+	for j in range(i, len(tokens)):
+		token = tokens[j]
+		if token.type == 'blockstart':
+			depth += 1
+		elif token.type in ['blockend', 'defcall'] or (token.type ==
+			'prefixed' and token.text.startswith('\\}')):
+			depth -= 1
+			if depth == 0:
+				if token.type != 'blockend':
+					return None
+				body = tokens[i+1:j]
+				if start.text == '\\{':
+					return (BFunc(body, context.scope), j)
+				return (BProc(body, context.scope), j)
+	return None
+
+def chain_at(builtin, kind, block, context):
+	"""
+	Return the stages of a chain that starts with the builtin being applied
+	at the current token of a context, and the index of its last token, or
+	None if it starts no chain of two or more pure stages.
+	"""
+	tokens = context.tokens
+	i = context.counter
+	if (not enabled or context.debug or tokens is None or
+		i + 1 >= len(tokens) or resolve(tokens[i], context) is not builtin):
+		return None
+	stages = [(kind, block)]
+	while i + 1 < len(tokens) and stages[-1][0] in ['map', 'filter']:
+		token = tokens[i+1]
+		name = fold_stages.get(token.text, None)
+		if name is not None and resolve(token, context) is builtins.get(
+			token.text):
+			# As +s and *s fold with whatever + and * are
+			stages.append(('fold', context.lookup(name)))
+			i += 1
+			continue
+		if token.type != 'blockstart':
+			break
+		found = block_at(tokens, i + 1, context)
+		if found is None or found[1] + 1 >= len(tokens):
+			break
+		(f, j) = found
+		token = tokens[j+1]
+		kind = block_stages.get(token.text, None)
+		if kind is None or resolve(token, context) is not builtins.get(
+			token.text):
+			break
+		stages.append((kind, f))
+		i = j + 1
+	if len(stages) < 2 or not all(is_pure(f, context) for (_, f) in stages):
+		return None
+	return (stages, i)
+
+
+#################### Running ####################
+
+# The arguments a block defines in its scope, from the top of the stack down
+arguments = ['V', '_w', '_x', '_y', '_z']
+
+class BIsolation(object):
+	"""
+	Applies functions in a context on a stack of their own: their operands,
+	above the top of a base stack, which blocks see as their arguments,
+	above a barrier which shows whether they reached below those. Records
+	the stack each block that defines its arguments in a shared scope last
+	saw, or with restoring set, keeps those definitions from being made.
+	"""
+	
+	def __init__(self, context, base, restoring=False):
+		self.context = context
+		self.barrier = BList()
+		self.restoring = restoring
+		self.seen = {}
+		self.rebase(base)
+	
+	def rebase(self, base, depth=None):
+		"""
+		Apply functions above the top of another base stack, which may be
+		given by its top and its whole depth.
+		"""
+		n = len(arguments)
+		self.below = base[-n:]
+		self.depth = len(base) if depth is None else depth
+		self.deep = self.depth > n
+	
+	def apply(self, f, *operands):
+		"""Apply a function to operands; return the values it leaves."""
+		context = self.context
+		(barrier, below) = (self.barrier, self.below)
+		stack = [barrier] if self.deep else []
+		stack.extend(below)
+		stack.extend(operands)
+		k = len(stack) - len(operands)
+		shared = isinstance(f, BBlock) and not f.scoped
+		if shared and self.restoring:
+			saved = [(name, f.scope.get(name, None)) for name in arguments]
+		elif shared:
+			self.seen[id(f)] = stack[-len(arguments):]
+		(outer, leftbs) = (context.stack, context.leftbs)
+		context.stack = stack
+		context.leftbs = []
+		try:
+			f.apply(context)
+			stack = context.stack
+		finally:
+			(context.stack, context.leftbs) = (outer, leftbs)
+			if shared and self.restoring:
+				for (name, value) in saved:
+					if value is None:
+						f.scope.pop(name, None)
+					else:
+						f.scope[name] = value
+		if (len(stack) < k or self.deep and stack[0] is not barrier or
+			any(x is not y for (x, y) in zip(stack[k-len(below):k], below)) or
+			any(x is barrier for x in stack[k:])):
+			raise BFusionFallback()
+		return stack[k:]
+	
+	def result(self, f, *operands):
+		"""Apply a function to operands; return the one value it leaves."""
+		results = self.apply(f, *operands)
+		if len(results) != 1:
+			raise BFusionFallback()
+		return results[0]
+	
+	def define_arguments(self, functions):
+		"""
+		Define the arguments each block last saw in its scope, as applying
+		the functions one after another would leave them.
+		"""
+		for f in functions:
+			seen = self.seen.get(id(f), None)
+			if seen is None:
+				continue
+			for (i, name) in enumerate(arguments):
+				f.scope[name] = seen[-1-i] if i < len(seen) else BInt(0)
+
+def mapping(f, xs, isolation):
+	for x in xs:
+		for y in isolation.apply(f, x):
+			yield y
+
+def filtering(f, xs, isolation):
+	for x in xs:
+		if isolation.result(f, x):
+			yield x
+
+def each(f, xs, isolation):
+	# Each item is applied above the results of the ones before, as - leaves
+	# them on the stack
+	(below, depth, results) = (isolation.below, isolation.depth, [])
+	for x in xs:
+		results.extend(isolation.apply(f, x))
+		isolation.rebase(below + results[-len(arguments):],
+			depth + len(results))
+	return results
+
+def fold(f, xs, isolation):
+	xs = iter(xs)
+	try:
+		acc = next(xs)
+	except StopIteration:
+		# Folding nothing is an error, which the fold reports itself
+		raise BFusionFallback()
+	for x in xs:
+		acc = isolation.result(f, acc, x)
+	return [acc]
+
+def run_stages(stages, seq, context):
+	"""Run the stages of a chain on a sequence; return what they leave."""
+	if isinstance(seq, BNum):
+		xs = (BInt(x) for x in range(int(seq.simplify().value)))
+		container = BList()
+	else:
+		xs = seq.elements()
+		container = seq
+	# Each stage sees the stack the chain started on, as it would if the
+	# stages ran one by one, however far the others have got
+	isolations = []
+	for (kind, f) in stages:
+		isolation = BIsolation(context, context.stack)
+		isolations.append(isolation)
+		if kind == 'map':
+			xs = mapping(f, xs, isolation)
+			container = BList()
+		elif kind == 'filter':
+			xs = filtering(f, xs, isolation)
+		elif kind == 'each':
+			xs = each(f, xs, isolation)
+			break
+		else:
+			xs = fold(f, xs, isolation)
+			break
+	else:
+		if stages[-1][0] == 'map':
+			xs = [BVector.of(list(xs))]
+		else:
+			xs = [BList(list(xs)).convert(container)]
+	# Blocks leave their arguments defined as running the stages one by one
+	# would, where the last item to reach each stage was applied last
+	for (isolation, (_, f)) in zip(isolations, stages):
+		isolation.define_arguments([f])
+	return xs
+
+def run_chain(builtin, kind, block, seq, context):
+	"""
+	If the map or filter builtin being applied to a block and a sequence or
+	number starts a chain, run the chain fused, push what it leaves, move
+	past its tokens and return True. Otherwise return False.
+	"""
+	if isinstance(seq, (BRegex, BStream)):
+		return False
+	chain = chain_at(builtin, kind, block, context)
+	if chain is None:
+		return False
+	(stages, end) = chain
+	(stack, rstack, leftbs) = (context.stack, context.rstack[:],
+		context.leftbs)
+	try:
+		results = run_stages(stages, seq, context)
+	except Exception:
+		# Roll back, and let the stages run one by one
+		(context.stack, context.leftbs) = (stack, leftbs)
+		context.rstack[:] = rstack
+		return False
+	(context.stack, context.leftbs) = (stack, leftbs)
+	for x in results:
+		context.push(x)
+	context.counter = end
+	return True
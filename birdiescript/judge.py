@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Judge one script against a directory of test cases.
+
+A case is a pair of files in the cases directory, NAME.in holding the
+standard input and NAME.out (or NAME.ans) the expected output; either may
+be missing. The script is read and tokenized once, and each case is run
+in its own fresh context, with an isolated state and in-memory standard
+streams, in the judging process itself. A JSON Lines report with each
+case's verdict and time, followed by a summary, is printed in case order.
+"""
+
+
+#################### Imports ####################
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import sys    # stdout, exit
+import os     # listdir, path
+import re     # split
+import json   # dumps
+import time   # time
+import signal # signal, setitimer, SIGALRM
+
+from .core import *
+from .api import BScript
+from .runner import exit_status
+from .batch import BJobTimeout, job_alarm, read_text
+
+
+#################### Cases ####################
+
+input_extensions = ['.in']
+expected_extensions = ['.out', '.ans']
+
+def natural_key(name):
+	"""Sort key that puts case 2 before case 10."""
+	return [int(part) if part.isdigit() else part
+		for part in re.split(r'(\d+)', name)]
+
+def find_cases(directory):
+	"""Return the name, input path and expected output path of each case."""
+	cases = {}
+	for filename in os.listdir(directory):
+		(name, ext) = os.path.splitext(filename)
+		path = os.path.join(directory, filename)
+		if ext in input_extensions:
+			cases.setdefault(name, [None, None])[0] = path
+		elif ext in expected_extensions:
+			cases.setdefault(name, [None, None])[1] = path
+	return [(name, cases[name][0], cases[name][1])
+		for name in sorted(cases, key=natural_key)]
+
+
+#################### Judging ####################
+
+def run_case(script, stdin, encoding, timeout):
+	"""Run a script on one input; return its output, status and time."""
+	(context, output) = script.context(stdin, (), (), None, encoding)
+	(status, timed_out) = (0, False)
+	start = time.time()
+	try:
+		if timeout is not None:
+			signal.setitimer(signal.ITIMER_REAL, timeout)
+		try:
+			context.execute(printstack=True)
+		finally:
+			if timeout is not None:
+				signal.setitimer(signal.ITIMER_REAL, 0)
+	except BJobTimeout:
+		timed_out = True
+	except SystemExit as ex:
+		status = exit_status(ex)
+	except Exception as ex:
+		output.write('Error: {}\n'.format(ex))
+		status = 1
+	elapsed = round(time.time() - start, 6)
+	return (output.getvalue(), status, elapsed, timed_out)
+
+def judge_case(script, name, stdin, expected, encoding, timeout):
+	"""Run one case, and return its result."""
+	(stdout, status, elapsed, timed_out) = run_case(script, stdin or '',
+		encoding, timeout)
+	result = {'case': name, 'status': status, 'time': elapsed,
+		'timeout': timed_out, 'passed': None}
+	if expected is not None:
+		result['passed'] = not timed_out and stdout == expected
+	if result['passed'] is False or (expected is None and status):
+		result['stdout'] = stdout
+	return result
+
+def judge(filename, directory, encoding='utf-8', timeout=None,
+	fail_fast=False):
+	"""
+	Run a script against every case in a directory, print a JSON Lines
+	report, and exit with status 1 if any case failed: it timed out, did
+	not produce its expected output, or had none to produce and exited with
+	an error. With fail_fast, stop at the first such case.
+	Output is only included in the report for cases that did not pass.
+	"""
+	try:
+		script = BScript(read_script(filename, encoding), filename)
+		cases = find_cases(directory)
+	except Exception as ex:
+		colors.set_colors(ALERT_COLORS)
+		print('Error: {}'.format(ex))
+		colors.set_colors(colors.DEFAULT_COLORS)
+		sys.exit(1)
+	if timeout is not None:
+		signal.signal(signal.SIGALRM, job_alarm)
+	(judged, passed, failed, total) = (0, 0, 0, 0.0)
+	for (name, stdin_path, expected_path) in cases:
+		judged += 1
+		try:
+			stdin = read_text(stdin_path, encoding)
+			expected = read_text(expected_path, encoding)
+		except (IOError, OSError) as ex:
+			result = {'case': name, 'status': 1, 'time': 0.0,
+				'timeout': False, 'passed': False,
+				'stdout': 'Error: {}\n'.format(ex)}
+		else:
+			result = judge_case(script, name, stdin, expected, encoding,
+				timeout)
+		print(str(json.dumps(result, sort_keys=True)))
+		sys.stdout.flush()
+		total += result['time']
+		if (result['timeout'] or result['passed'] is False or
+			result['passed'] is None and result['status']):
+			failed += 1
+			if fail_fast:
+				break
+		elif result['passed']:
+			passed += 1
+	print(str(json.dumps({'summary': True, 'cases': len(cases),
+		'judged': judged, 'passed': passed, 'failed': failed,
+		'time': round(total, 6)}, sort_keys=True)))
+	if failed:
+		sys.exit(1)
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+Native linear algebra for the matrix and vector builtins.
+
+The linear algebra builtins are defined in Birdiescript by zipping,
+transposing and mapping, which boxes every number and runs a block for
+each one. These functions compute the same results on the numbers inside
+vectors and rectangular matrices of integers and floating point numbers.
+Sums start from 0 and are folded left to right, as +n folds them, and
+absolute values are simplified, as # simplifies them, so integer results
+are exact and the types of results are unchanged. Anything else, such as
+complex numbers, strings or ragged rows, is left to the definitions.
+Matrix powers are only computed natively for integers, since squaring
+repeatedly would round floating point numbers differently than the
+definition's repeated products.
+"""
+
+
+#################### Imports ####################
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import functools # reduce
+import operator  # add, mul
+
+from .core import *
+
+
+#################### Values ####################
+
+def vector_values(a):
+	"""
+	Return the numbers in a list of integers and floating point numbers, or
+	None if it is not one.
+	"""
+	if not isinstance(a, BList):
+		return None
+	if isinstance(a, BVector) and a.packed is not None:
+		return list(a.packed)
+	av = a.value
+	if not all(type(x) in (BInt, BFloat) for x in av):
+		return None
+	return [x.value for x in av]
+
+def matrix_values(a):
+	"""
+	Return the rows of numbers in a non-empty list of lists of numbers of
+	the same non-zero length, or None if it is not one.
+	"""
+	if not isinstance(a, BList) or isinstance(a, BVector):
+		return None
+	rows = []
+	for r in a.value:
+		rv = vector_values(r)
+		if not rv or (rows and len(rv) != len(rows[0])):
+			return None
+		rows.append(rv)
+	return rows or None
+
+def box_vector(values):
+	"""Return a list of numbers, packed if they all have the same type."""
+	if all(type(v) in (int, long) for v in values):
+		return BVector.ints(values)
+	if all(type(v) is float for v in values):
+		return BVector(packed=array.array(BVector.float_code, values))
+	return BList([BType.from_python(v) for v in values])
+
+def box_matrix(rows):
+	return BList([box_vector(r) for r in rows])
+
+
+#################### Vectors ####################
+
+def total(values):
+	"""Sum numbers from 0, as +n does."""
+	return functools.reduce(operator.add, values, 0)
+
+def magnitude(x):
+	"""Absolute value of a number, as # simplifies it."""
+	x = abs(x)
+	if isinstance(x, float) and is_integral(x):
+		return int(x)
+	return x
+
+def floats(values):
+	"""Numbers converted to floating point, as Ft converts them."""
+	return [x * 1.0 for x in values]
+
+def dot(a, b):
+	return total(x * y for (x, y) in zip(floats(a), b))
+
+def outer(a, b):
+	return [[0 + x * y for y in b] for x in floats(a)]
+
+def counting_norm(v):
+	return sum(1 for x in v if x)
+
+def manhattan_norm(v):
+	return total(magnitude(x) for x in v)
+
+def squared_norm(v):
+	"""Sum of squares, which the Euclidean norm is the square root of."""
+	return total(x ** 2 for x in v)
+
+def chebyshev_norm(v):
+	return max(magnitude(x) for x in v)
+
+def power_sum(v, p):
+	"""Sum of the absolute values raised to a power, which must be > 0."""
+	return functools.reduce(operator.add, (magnitude(x) ** p for x in v))
+
+
+#################### Matrices ####################
+
+def identity_matrix(n):
+	return [[int(i == j) for j in range(n)] for i in range(n)]
+
+def trace(m):
+	"""Sum of the diagonal; rows must be at least as long as the matrix."""
+	return total(r[i] for (i, r) in enumerate(m))
+
+def matrix_sum(a, b):
+	"""Sum of two matrices of the same shape."""
+	return [[0 + x + y for (x, y) in zip(ar, br)] for (ar, br) in zip(a, b)]
+
+def hadamard(a, b):
+	"""Hadamard product of two matrices of the same shape."""
+	return [[x * y for (x, y) in zip(ar, br)] for (ar, br) in zip(a, b)]
+
+def all_ints(*matrices):
+	return all(type(x) in (int, long) for m in matrices for r in m for x in r)
+
+def matrix_product(a, b):
+	"""Product of an N by K matrix and a K by M matrix."""
+	columns = list(zip(*b))
+	if all_ints(a, b):
+		# Integer sums are exact in any order
+		return [[sum(map(operator.mul, r, c)) for c in columns] for r in a]
+	return [[total(map(operator.mul, r, c)) for c in columns] for r in a]
+
+def matrix_power(m, p):
+	"""Raise a square matrix to a power >= 1, by repeated squaring."""
+	result = None
+	while True:
+		if p & 1:
+			result = m if result is None else matrix_product(result, m)
+		p >>= 1
+		if not p:
+			return result
+		m = matrix_product(m, m)
+
+
+#################### Builtins ####################
+
+# Each of these takes the operands of a builtin, and returns its result, or
+# None if the operands are not numeric vectors or matrices of the shapes it
+# handles. Arithmetic errors are left to the Birdiescript definitions too,
+# which may handle them differently.
+
+def identity_of(n):
+	if type(n) is BInt and n.value > 0:
+		return box_matrix(identity_matrix(n.value))
+
+def trace_of(m):
+	mv = matrix_values(m)
+	if mv and len(mv[0]) >= len(mv):
+		return BType.from_python(trace(mv))
+
+def combine(f, a, b):
+	"""Combine the pairs of items in two vectors, up to the shorter one."""
+	av = vector_values(a)
+	bv = vector_values(b)
+	if av is not None and bv is not None:
+		return box_vector(list(map(f, av, bv)))
+
+def dot_of(a, b):
+	av = vector_values(a)
+	bv = vector_values(b)
+	if av is not None and bv is not None:
+		return BType.from_python(dot(av, bv))
+
+def outer_of(a, b):
+	av = vector_values(a)
+	bv = vector_values(b)
+	if av and bv:
+		return box_matrix(outer(av, bv))
+
+def counting_norm_of(v):
+	vv = vector_values(v)
+	if vv is not None:
+		return BInt(counting_norm(vv))
+
+def manhattan_norm_of(v):
+	vv = vector_values(v)
+	if vv is not None:
+		return BType.from_python(manhattan_norm(vv))
+
+def euclidean_norm_of(v):
+	vv = vector_values(v)
+	if vv is not None:
+		# As Q takes the square root
+		return BType.from_python(cmath.sqrt(squared_norm(vv))).simplify()
+
+def chebyshev_norm_of(v):
+	vv = vector_values(v)
+	if vv:
+		return BType.from_python(chebyshev_norm(vv))
+
+def matrix_sum_of(a, b):
+	av = matrix_values(a)
+	bv = matrix_values(b)
+	if av and bv and len(av) == len(bv) and len(av[0]) == len(bv[0]):
+		return box_matrix(matrix_sum(av, bv))
+
+def hadamard_of(a, b):
+	av = matrix_values(a)
+	bv = matrix_values(b)
+	if av and bv and len(av) == len(bv) and len(av[0]) == len(bv[0]):
+		return box_matrix(hadamard(av, bv))
+
+def matrix_product_of(a, b):
+	av = matrix_values(a)
+	bv = matrix_values(b)
+	if av and bv and len(av[0]) == len(bv):
+		return box_matrix(matrix_product(av, bv))
+
+def matrix_power_of(m, p):
+	mv = matrix_values(m)
+	if (not mv or len(mv) != len(mv[0]) or type(p) is not BInt or
+		not all_ints(mv)):
+		return None
+	if p.value == 0:
+		return box_matrix(identity_matrix(len(mv)))
+	if p.value > 1:
+		return box_matrix(matrix_power(mv, p.value))
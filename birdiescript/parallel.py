@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+Process pool support for the parallel builtins.
+
+A block is sent to worker processes along with the chain of scopes it can
+see, and applied to chunks of a sequence there. Only blocks that cannot
+affect anything but the stack are sent; anything else, or anything that
+cannot be pickled, runs serially in the calling context instead.
+"""
+
+
+#################### Imports ####################
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import math            # ceil
+import random          # seed
+import atexit          # register
+import collections     # deque
+import multiprocessing # Pool, current_process, cpu_count
+
+try:
+	import cPickle as pickle # dumps, loads
+except ImportError:
+	import pickle            # dumps, loads
+
+from .core import *
+from .combinatorics import space_size, candidates
+
+
+#################### Purity analysis ####################
+
+def parsed(token):
+	if token.type == 'defcall':
+		return token
+	return token.parse()
+
+def builtin_is_pure(builtin, seen, copies=False):
+	"""
+	Return whether a builtin only affects the stack, counting builtins that
+	change their operands in place only if they are applied to copies.
+	"""
+	if builtin.impure or builtin.mutating and not copies:
+		return False
+	if builtin.code is None or id(builtin) in seen:
+		return True
+	seen.add(id(builtin))
+	for token in builtin.tokens or BContext.tokenized(builtin.code):
+		value = parsed(token)
+		if isinstance(value, BToken) and value.type == 'call':
+			# Names that are not builtins are the block's own variables
+			b = builtins.get(value.text, None)
+			if b is not None and not builtin_is_pure(b, seen, copies):
+				return False
+	return True
+
+def block_is_pure(block, context, seen, copies=False):
+	"""Return whether a block only affects the stack and its own scope."""
+	if id(block) in seen:
+		return True
+	seen.add(id(block))
+	resolver = context.subcontext(BBlock.NONLOCAL)
+	resolver.inherit_scope(block.scope)
+	captured = False
+	for token in block.value:
+		if token.type in ['comment', 'blockcomment', 'blockstart',
+			'blockend']:
+			continue
+		value = parsed(token)
+		if isinstance(value, BType):
+			continue
+		if value.type in ['def', 'undef', 'defcall']:
+			if not block.scoped or value.text[:1] in ['g', 'n']:
+				return False
+			continue
+		deref = resolver.lookup(value.text)
+		if deref is None and value.type == 'call':
+			return False
+		if deref is not None and not is_pure(deref, context, seen, copies):
+			return False
+		captured = captured or isinstance(deref, BSeq)
+	if copies and captured:
+		# Copies of its operands do not keep it from changing the sequences
+		# it reads from variables
+		return is_pure(block, context)
+	return True
+
+def is_pure(value, context, seen=None, copies=False):
+	"""
+	Return whether applying a value only affects the stack, if with copies
+	set it is applied to copies of its operands.
+	"""
+	if seen is None:
+		seen = set()
+	if isinstance(value, BBuiltin):
+		return builtin_is_pure(value, seen, copies)
+	elif isinstance(value, BBlock):
+		return block_is_pure(value, context, seen, copies)
+	return True
+
+
+#################### Workers ####################
+
+# Chunks per call; fixed so that per-chunk random seeds do not depend on
+# the number of workers
+chunk_count = 64
+
+# Candidates per search chunk, and search chunks in flight per worker
+search_chunk_size = 4096
+search_window = 2
+
+class BParallelFallback(Exception):
+	"""A block did something that only the serial builtin can reproduce."""
+	pass
+
+def worker_context(scopes):
+	context = None
+	for scope in scopes:
+		if context is None:
+			context = BContext('')
+		else:
+			context = context.subcontext('')
+		context.scope = scope
+	return context
+
+def apply_element(kind, block, x, context):
+	# The barrier detects blocks that reach below their own argument
+	barrier = BList()
+	context.stack = [barrier]
+	context.leftbs = []
+	context.push(x)
+	block.apply(context)
+	stack = context.stack
+	if not stack or stack[0] is not barrier:
+		raise BParallelFallback()
+	if kind == 'map':
+		return stack[1:]
+	if len(stack) != 2:
+		raise BParallelFallback()
+	if kind == 'filter':
+		return bool(stack[1])
+	return stack[1]
+
+def run_chunk(task):
+	(payload, kind, chunk, seed) = task
+	try:
+		(block, scopes) = pickle.loads(payload)
+		elements = pickle.loads(chunk)
+		random.seed(seed)
+		context = worker_context(scopes)
+		return [apply_element(kind, block, x, context) for x in elements]
+	except Exception:
+		return None
+
+def candidate(seq, values, indices):
+	"""Build the candidate that a tuple of indices picks from a sequence."""
+	return BList([values[i] for i in indices]).convert(seq)
+
+def search_chunk(task):
+	(payload, kind, start, count, first, seed) = task
+	try:
+		(block, scopes, seq) = pickle.loads(payload)
+		random.seed(seed)
+		context = worker_context(scopes)
+		values = seq.simplify().value
+		hits = []
+		for (i, indices) in enumerate(candidates(kind, len(values), start,
+			count)):
+			x = candidate(seq, values, indices)
+			if apply_element('filter', block, x, context):
+				hits.append(start + i)
+				if first:
+					break
+		return hits
+	except Exception:
+		return None
+
+
+#################### Parallel application ####################
+
+pool = None
+
+def get_pool():
+	global pool
+	if pool is None:
+		pool = multiprocessing.Pool()
+		atexit.register(pool.terminate)
+	return pool
+
+def scope_chain(context):
+	scopes = []
+	while context:
+		scopes.append(context.scope)
+		context = context.parent
+	return scopes[::-1]
+
+def parallel_apply(kind, block, elements, context):
+	"""
+	Apply a block to each element in worker processes, and return the
+	per-element results: lists of pushed values for 'map', booleans for
+	'filter', or keys for 'sort'. Return None if the block must be run
+	serially instead.
+
+	Each chunk seeds the random number generator from one draw of the
+	caller's generator and the chunk's index, so results are reproducible.
+	The draw is only made when the chunks run in parallel, so falling back
+	leaves the caller's generator as a serial run would find it.
+	"""
+	n = len(elements)
+	if n < 2 or multiprocessing.current_process().daemon:
+		return None
+	protocol = pickle.HIGHEST_PROTOCOL
+	size = int(math.ceil(n / chunk_count))
+	try:
+		if not is_pure(block, context) or not all(is_pure(x, context)
+			for x in elements if isinstance(x, BCallable)):
+			return None
+		payload = pickle.dumps((block, scope_chain(context)), protocol)
+		chunks = [pickle.dumps(elements[i:i+size], protocol)
+			for i in range(0, n, size)]
+	except Exception:
+		return None
+	rng = context.state.random
+	saved = rng.getstate()
+	base = rng.getrandbits(64)
+	tasks = [(payload, kind, chunk, base + i)
+		for (i, chunk) in enumerate(chunks)]
+	results = get_pool().map(run_chunk, tasks, 1)
+	if any(r is None for r in results):
+		rng.setstate(saved)
+		return None
+	return [r for chunk in results for r in chunk]
+
+def parallel_search(kind, block, seq, context, first):
+	"""
+	Test the candidates of a kind drawn from a sequence against a predicate
+	block in worker processes, and return the ranks of those that satisfy
+	it, in order. If first is true, stop at the first one. Return None if
+	the block must be run serially instead.
+
+	Candidates are never listed: each chunk is a range of ranks that the
+	worker unranks and steps through. A bounded window of chunks is kept in
+	flight, and results are taken in rank order, so the first hit found is
+	the one a serial search would find.
+	"""
+	total = space_size(kind, len(seq.simplify().value))
+	if total < 2 or multiprocessing.current_process().daemon:
+		return None
+	try:
+		if not is_pure(block, context):
+			return None
+		payload = pickle.dumps((block, scope_chain(context), seq),
+			pickle.HIGHEST_PROTOCOL)
+	except Exception:
+		return None
+	rng = context.state.random
+	saved = rng.getstate()
+	base = rng.getrandbits(64)
+	pool = get_pool()
+	window = search_window * multiprocessing.cpu_count()
+	size = search_chunk_size
+	chunks = (total + size - 1) // size
+	pending = collections.deque()
+	hits = []
+	i = 0
+	while i < chunks or pending:
+		while i < chunks and len(pending) < window:
+			start = i * size
+			task = (payload, kind, start, min(size, total - start), first,
+				base + i)
+			pending.append(pool.apply_async(search_chunk, (task,)))
+			i += 1
+		ranks = pending.popleft().get()
+		if ranks is None:
+			rng.setstate(saved)
+			return None
+		hits.extend(ranks)
+		if first and hits:
+			# Chunks still in flight finish in the background, unread
+			break
+	return hits
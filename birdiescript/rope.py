@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent sequences with structural sharing.
+
+A rope is an immutable balanced tree whose leaves are chunks of a
+sequence: tuples of items, or strings of characters. Joining, slicing and
+changing one item of a rope take logarithmic time, and build a new rope
+which shares every subtree it did not change with the old one, so ropes
+never need to be copied.
+"""
+
+
+#################### Imports ####################
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+
+#################### Ropes ####################
+
+class BRope(object):
+	"""
+	An immutable sequence, kept as a height-balanced tree of chunks.
+	
+	A leaf has a chunk and a height of 0. A branch has a left and a right
+	subtree, whose heights differ by at most one, and holds the items of the
+	left one and then those of the right one.
+	"""
+	
+	__slots__ = ('left', 'right', 'chunk', 'length', 'height')
+	
+	# Leaves are built, and joined leaves merged, up to this many items
+	chunk_size = 256
+	
+	# Or this many characters, since strings are cheaper to copy than tuples
+	text_chunk_size = 4096
+	
+	@staticmethod
+	def limit(chunk):
+		"""Return the most items a leaf with the same kind of chunk may hold."""
+		if isinstance(chunk, tuple):
+			return BRope.chunk_size
+		return BRope.text_chunk_size
+	
+	@staticmethod
+	def of(chunk):
+		"""Return a rope of the items of a chunk, split into leaves."""
+		n = BRope.limit(chunk)
+		if len(chunk) <= n:
+			return BRope(chunk=chunk)
+		leaves = [BRope(chunk=chunk[i:i+n]) for i in range(0, len(chunk), n)]
+		def build(lo, hi):
+			if hi - lo == 1:
+				return leaves[lo]
+			mid = (lo + hi) // 2
+			return BRope(build(lo, mid), build(mid, hi))
+		return build(0, len(leaves))
+	
+	@staticmethod
+	def balanced(left, right):
+		"""
+		Return a branch of two subtrees whose heights differ by at most two,
+		rotated so that they differ by at most one.
+		"""
+		if left.height > right.height + 1:
+			(ll, lr) = (left.left, left.right)
+			if ll.height >= lr.height:
+				return BRope(ll, BRope(lr, right))
+			return BRope(BRope(ll, lr.left), BRope(lr.right, right))
+		if right.height > left.height + 1:
+			(rl, rr) = (right.left, right.right)
+			if rr.height >= rl.height:
+				return BRope(BRope(left, rl), rr)
+			return BRope(BRope(left, rl.left), BRope(rl.right, rr))
+		return BRope(left, right)
+	
+	def __init__(self, left=None, right=None, chunk=None):
+		if chunk is not None:
+			self.left = self.right = None
+			self.chunk = chunk
+			self.length = len(chunk)
+			self.height = 0
+		else:
+			self.left = left
+			self.right = right
+			self.chunk = None
+			self.length = left.length + right.length
+			self.height = max(left.height, right.height) + 1
+	
+	def __len__(self):
+		return self.length
+	
+	def __iter__(self):
+		for chunk in self.chunks():
+			for x in chunk:
+				yield x
+	
+	def chunks(self):
+		"""Iterate over the chunks of the leaves in order."""
+		pending = [self]
+		while pending:
+			node = pending.pop()
+			if node.chunk is not None:
+				yield node.chunk
+			else:
+				pending.append(node.right)
+				pending.append(node.left)
+	
+	def empty(self):
+		"""Return an empty rope with the same kind of chunks."""
+		node = self
+		while node.chunk is None:
+			node = node.left
+		return BRope(chunk=node.chunk[:0])
+	
+	def concat(self, other):
+		"""Return a rope of the items of this rope and then of another."""
+		(a, b) = (self, other)
+		if not b.length:
+			return a
+		if not a.length:
+			return b
+		if a.height > b.height + 1:
+			return BRope.balanced(a.left, a.right.concat(b))
+		if b.height > a.height + 1:
+			return BRope.balanced(a.concat(b.left), b.right)
+		if a.chunk is not None and b.chunk is not None:
+			if a.length + b.length <= BRope.limit(b.chunk):
+				return BRope(chunk=a.chunk + b.chunk)
+		elif b.chunk is not None and a.right.chunk is not None:
+			# Items appended one at a time fill the last leaf
+			if a.right.length + b.length <= BRope.limit(b.chunk):
+				return BRope(a.left, BRope(chunk=a.right.chunk + b.chunk))
+		elif a.chunk is not None and b.left.chunk is not None:
+			if a.length + b.left.length <= BRope.limit(a.chunk):
+				return BRope(BRope(chunk=a.chunk + b.left.chunk), b.right)
+		return BRope(a, b)
+	
+	def split(self, i):
+		"""Return ropes of the items before an index and of the rest."""
+		if i <= 0:
+			return (self.empty(), self)
+		if i >= self.length:
+			return (self, self.empty())
+		if self.chunk is not None:
+			return (BRope(chunk=self.chunk[:i]), BRope(chunk=self.chunk[i:]))
+		left = self.left
+		if i < left.length:
+			(a, b) = left.split(i)
+			return (a, b.concat(self.right))
+		(a, b) = self.right.split(i - left.length)
+		return (left.concat(a), b)
+	
+	def window(self, start, stop):
+		"""Return a rope of the items from one index up to another."""
+		if start <= 0 and stop >= self.length:
+			return self
+		if stop <= start:
+			return self.empty()
+		return self.split(stop)[0].split(start)[1]
+	
+	def item(self, i):
+		"""Return the item at a non-negative index, which must be in range."""
+		node = self
+		while node.chunk is None:
+			if i < node.left.length:
+				node = node.left
+			else:
+				i -= node.left.length
+				node = node.right
+		return node.chunk[i]
+	
+	def update(self, i, chunk):
+		"""
+		Return a rope with the item at a non-negative index, which must be in
+		range, replaced by the items of a chunk.
+		"""
+		if self.chunk is not None:
+			return BRope(chunk=self.chunk[:i] + chunk + self.chunk[i+1:])
+		left = self.left
+		if i < left.length:
+			return BRope(left.update(i, chunk), self.right)
+		return BRope(left, self.right.update(i - left.length, chunk))
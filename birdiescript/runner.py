@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Run Birdiescript scripts with captured standard input and output.
+
+This is used by the modes that run many scripts in one process, so each
+script gets a fresh view of the process-wide state it may change.
+"""
+
+
+#################### Imports ####################
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import sys    # stdin, stdout
+import os     # environ, getcwd, chdir
+import io     # StringIO
+import random # seed
+
+from .core import *
+
+
+#################### Captured runs ####################
+
+class BOutput(object):
+	"""A text sink that reports an encoding, like a real standard output."""
+
+	def __init__(self, encoding='utf-8'):
+		self.encoding = encoding
+		self.chunks = []
+
+	def write(self, s):
+		if isinstance(s, bytes):
+			s = s.decode(self.encoding, 'replace')
+		self.chunks.append(s)
+
+	def flush(self):
+		pass
+
+	def isatty(self):
+		return False
+
+	def getvalue(self):
+		return ''.join(self.chunks)
+
+def exit_status(ex):
+	"""Return the process exit status that a SystemExit would produce."""
+	if ex.code is None:
+		return 0
+	if isinstance(ex.code, int):
+		return ex.code
+	return 1
+
+def run_captured(filename, script, argv, encoding='utf-8', stdin='',
+	seed=None, tokens=None, reraise=()):
+	"""
+	Run a script with the given standard input, and return its output and
+	exit status. The random number generator is reseeded first, and the
+	environment and working directory are restored afterwards. Errors of
+	the exception types in reraise are raised instead of reported.
+	"""
+	output = BOutput(encoding)
+	saved = (sys.stdin, sys.stdout, dict(os.environ), os.getcwd())
+	sys.stdin = io.StringIO(stdin)
+	sys.stdout = output
+	random.seed(seed)
+	status = 0
+	try:
+		execute_file(filename, script, list(argv), encoding, False,
+			tokens=tokens, reraise=reraise)
+	except SystemExit as ex:
+		status = exit_status(ex)
+	finally:
+		(sys.stdin, sys.stdout) = saved[:2]
+		os.environ.clear()
+		os.environ.update(saved[2])
+		os.chdir(saved[3])
+	return (output.getvalue(), status)
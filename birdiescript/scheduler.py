@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""
+Interleave many scripts in one thread.
+
+A BScheduler runs scripts on the resumable engine, round-robin: each ready
+script runs for a budget of tokens, then goes to the back of the queue.
+A script that reads input which has not arrived yet is parked until it is
+fed, and a sleeping script is parked until it wakes, so neither holds up
+the others. Other requests, such as running a command, are carried out
+inline.
+
+    >>> scheduler = BScheduler()
+    >>> task = scheduler.spawn('>m 2*', stdin=None)
+    >>> scheduler.run()
+    >>> task.state
+    'blocked'
+    >>> scheduler.feed(task, '21\\n')
+    >>> scheduler.run()
+    >>> task.result.stack
+    [42]
+"""
+
+
+#################### Imports ####################
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import sys         # exit
+import time        # time, sleep
+import heapq       # heappush, heappop
+import random      # Random
+import collections # deque
+
+from .core import *
+from .api import BScript
+from .runner import exit_status
+from .engine import perform, flatten, execute_steps
+
+
+#################### Settings ####################
+
+# Tokens a script runs before the next one gets a turn
+default_budget = 100
+
+
+#################### Tasks ####################
+
+class BTaskInput(object):
+	"""
+	Standard input that arrives over time. Reads that cannot be answered
+	from what has arrived wait for more, unless the input is closed.
+	"""
+
+	def __init__(self, text=None):
+		self.buffer = text or ''
+		self.closed = text is not None
+
+	def feed(self, text='', eof=False):
+		self.buffer += text
+		self.closed = self.closed or eof
+
+	def ready(self, request):
+		"""Return whether a read request can be answered now."""
+		if self.closed:
+			return True
+		if request.kind == 'readline':
+			return '\n' in self.buffer
+		n = request.args[0]
+		return n >= 0 and len(self.buffer) >= n
+
+	def answer(self, request):
+		if request.kind == 'readline':
+			n = self.buffer.find('\n') + 1 or len(self.buffer)
+		else:
+			n = request.args[0]
+			if n < 0:
+				n = len(self.buffer)
+		(rv, self.buffer) = (self.buffer[:n], self.buffer[n:])
+		return rv
+
+class BTask(object):
+	"""
+	A script run by a scheduler. Its state is 'ready', 'blocked' (on input),
+	'sleeping', or 'done'. Once done, it has a BResult, or the exception
+	that stopped it.
+	"""
+
+	def __init__(self, script, context, output, stdin, printstack):
+		self.script = script
+		self.context = context
+		self.output = output
+		self.input = stdin
+		self.steps = flatten(execute_steps(context, printstack))
+		self.state = 'ready'
+		self.reply = None
+		self.request = None
+		self.wake = None
+		self.result = None
+		self.error = None
+		# Statistics
+		self.ticks = 0
+		self.slices = 0
+		self.latency = None
+		self.waited = 0.0
+		self.max_wait = 0.0
+		self.busy = 0.0
+		self.longest = 0.0
+		self.queued = self.started = time.time()
+		self.finished = None
+
+	def __repr__(self):
+		return '<BTask {} {!r}>'.format(self.state, self.script.source)
+
+	def finish(self, status=0, error=None):
+		self.state = 'done'
+		self.error = error
+		self.finished = time.time()
+		self.steps.close()
+		if error is None:
+			self.result = self.script.result(self.context, self.output,
+				status)
+
+
+#################### Scheduling ####################
+
+class BScheduler(object):
+	"""Runs many scripts in one thread, a budget of tokens at a time."""
+
+	def __init__(self, budget=default_budget):
+		self.budget = budget
+		self.ready = collections.deque()
+		self.sleeping = []
+		self.counter = 0
+
+	def spawn(self, script, stdin='', argv=(), stack=(), encoding='utf-8',
+		printstack=False, seed=None):
+		"""
+		Add a script, compiled or as source, to the end of the queue, and
+		return its task. Standard input is a string, or None to feed it to
+		the task later. Each task has an isolated state.
+		"""
+		if not isinstance(script, BScript):
+			script = BScript(script)
+		(context, output) = script.context('', argv, stack, None, encoding,
+			seed)
+		task = BTask(script, context, output, BTaskInput(stdin), printstack)
+		self.ready.append(task)
+		return task
+
+	def feed(self, task, text='', eof=False):
+		"""Give a task more input, and wake it if it was waiting for it."""
+		task.input.feed(text, eof)
+		if task.state == 'blocked' and task.input.ready(task.request):
+			task.reply = task.input.answer(task.request)
+			task.request = None
+			self.enqueue(task)
+
+	def enqueue(self, task):
+		task.state = 'ready'
+		task.queued = time.time()
+		self.ready.append(task)
+
+	def carry_out(self, task, request):
+		"""
+		Carry out a task's request, or park the task until it can be.
+		Return whether the task can go on running.
+		"""
+		if request.kind in ['read', 'readline']:
+			if task.input.ready(request):
+				task.reply = task.input.answer(request)
+				return True
+			(task.state, task.request) = ('blocked', request)
+			return False
+		if request.kind == 'sleep' and request.args[0] > 0:
+			task.state = 'sleeping'
+			task.wake = time.time() + request.args[0]
+			self.counter += 1
+			heapq.heappush(self.sleeping, (task.wake, self.counter, task))
+			return False
+		task.reply = perform(request, None)
+		return True
+
+	def run_slice(self, task):
+		"""Run a task for up to a budget of tokens."""
+		start = time.time()
+		wait = start - task.queued
+		if task.latency is None:
+			task.latency = wait
+		else:
+			task.waited += wait
+			task.max_wait = max(task.max_wait, wait)
+		task.slices += 1
+		budget = self.budget
+		try:
+			while budget > 0:
+				try:
+					item = task.steps.send(task.reply)
+				except StopIteration:
+					task.finish()
+					return
+				task.reply = None
+				if item is None:
+					budget -= 1
+					continue
+				if not self.carry_out(task, item):
+					return
+		except SystemExit as ex:
+			task.finish(exit_status(ex))
+			return
+		except Exception as ex:
+			task.finish(error=ex)
+			return
+		finally:
+			task.ticks += self.budget - budget
+			elapsed = time.time() - start
+			task.busy += elapsed
+			task.longest = max(task.longest, elapsed)
+		self.enqueue(task)
+
+	def wake_sleepers(self, now):
+		while self.sleeping and self.sleeping[0][0] <= now:
+			(_, _, task) = heapq.heappop(self.sleeping)
+			self.enqueue(task)
+
+	def step(self):
+		"""
+		Run one slice of the next ready task. Return False if no task is
+		ready or sleeping.
+		"""
+		self.wake_sleepers(time.time())
+		if self.ready:
+			self.run_slice(self.ready.popleft())
+			return True
+		if self.sleeping:
+			time.sleep(max(0, self.sleeping[0][0] - time.time()))
+			return True
+		return False
+
+	def run(self):
+		"""Run until every task is done or blocked on input."""
+		while self.step():
+			pass
+
+
+#################### Benchmark ####################
+
+# Small scripts, each with a size to fill in; some read input
+bench_templates = [
+	'{}U{{,*}}|+s',
+	'0 {}{{1+}}*',
+	'{}U{{2%}}&,',
+	'1{{,{}<}}{{2*}}W',
+	'>m {}*',
+	'[{}U{{,1>{{1-}}{{}}I}}-]',
+]
+
+bench_input = '7\n'
+
+def percentile(values, p):
+	values = sorted(values)
+	return values[min(len(values) - 1, int(len(values) * p))]
+
+def describe(values):
+	"""Summarize times in milliseconds."""
+	if not values:
+		return 'none'
+	return 'mean {:.3f}ms, 99th percentile {:.3f}ms, max {:.3f}ms'.format(
+		1000 * sum(values) / len(values), 1000 * percentile(values, 0.99),
+		1000 * max(values))
+
+def benchmark(count, budget=None, seed=None):
+	"""
+	Run count small generated scripts on a scheduler, check their results
+	against ordinary runs, and report throughput and fairness. Scripts
+	that read input start with none and are fed once everything else has
+	run, as if their clients were slow.
+
+	Fairness is shown by how long tasks wait: for their first slice, which
+	depends on their place in the queue, and between slices, which round
+	robin bounds by one pass over the other tasks. A pass is in turn
+	bounded by the budget, which limits how long a slice runs.
+	"""
+	if seed is None:
+		seed = int(time.time())
+	budget = budget or default_budget
+	rng = random.Random(seed)
+	compiled = {}
+	jobs = []
+	for i in range(count):
+		source = rng.choice(bench_templates).format(rng.randrange(1, 50))
+		if source not in compiled:
+			compiled[source] = BScript(source)
+		jobs.append(compiled[source])
+	start = time.time()
+	expected = [script.run(stdin=bench_input, seed=i).stack
+		for (i, script) in enumerate(jobs)]
+	sequential = time.time() - start
+	scheduler = BScheduler(budget)
+	start = time.time()
+	tasks = [scheduler.spawn(script, None, seed=i)
+		for (i, script) in enumerate(jobs)]
+	scheduler.run()
+	parked = 0
+	for task in tasks:
+		if task.state == 'blocked':
+			parked += 1
+			scheduler.feed(task, bench_input, True)
+		else:
+			task.input.feed(eof=True)
+	scheduler.run()
+	elapsed = time.time() - start
+	wrong = sum(1 for (task, stack) in zip(tasks, expected)
+		if task.result is None or repr(task.result.stack) != repr(stack))
+	ticks = sum(task.ticks for task in tasks)
+	slices = sum(task.slices for task in tasks)
+	print('Scheduled {} scripts (seed {}, budget {}): {} tokens in {} '
+		'slices, {} parked for input'.format(count, seed, budget, ticks,
+		slices, parked))
+	print('Throughput: {:.3f}s, {:.0f} scripts/s, {:.0f} tokens/s '
+		'(sequential runs: {:.3f}s)'.format(elapsed, count / elapsed,
+		ticks / elapsed, sequential))
+	print('Mean slice length of each task: {}'.format(
+		describe([task.busy / task.slices for task in tasks])))
+	print('Longest slice: {:.3f}ms'.format(
+		1000 * max(task.longest for task in tasks)))
+	print('Wait for first slice: {}'.format(
+		describe([task.latency for task in tasks])))
+	print('Longest wait between slices of each task: {}'.format(
+		describe([task.max_wait for task in tasks if task.slices > 1])))
+	print('Results: {} matched, {} differed'.format(count - wrong, wrong))
+	if wrong:
+		sys.exit(1)
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+A persistent Birdiescript daemon with pre-forked warm workers.
+
+The server imports the interpreter once, tokenizes the code builtins, and
+forks workers that share that warm state. Each worker accepts requests on
+a UNIX socket, runs one script per request under CPU time and memory
+limits, and is replaced after a fixed number of requests.
+
+Messages in both directions are a 4-byte big-endian length followed by a
+UTF-8 JSON object. A request holds "script", "argv", "stdin" and
+"filename"; a response holds "stdout" and "status".
+"""
+
+
+#################### Imports ####################
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import sys    # stdin, stdout, exit
+import os     # fork, wait, kill, unlink, _exit
+import stat   # S_ISSOCK
+import gc     # collect, freeze
+import math   # ceil
+import json   # dumps, loads
+import socket # socket, AF_UNIX, SOCK_STREAM
+import struct # pack, unpack
+import signal # signal, SIGTERM, SIGINT, SIGXCPU
+import multiprocessing # cpu_count
+
+try:
+	import resource # getrusage, getrlimit, setrlimit
+except ImportError:
+	resource = None
+
+from .core import *
+from .runner import run_captured
+
+
+#################### Protocol ####################
+
+def send_message(conn, message):
+	data = json.dumps(message).encode('utf-8')
+	conn.sendall(struct.pack(str('>I'), len(data)) + data)
+
+def receive_exactly(conn, n):
+	chunks = []
+	while n > 0:
+		chunk = conn.recv(min(n, 65536))
+		if not chunk:
+			raise EOFError('connection closed')
+		chunks.append(chunk)
+		n -= len(chunk)
+	return b''.join(chunks)
+
+def receive_message(conn):
+	(n,) = struct.unpack(str('>I'), receive_exactly(conn, 4))
+	return json.loads(receive_exactly(conn, n).decode('utf-8'))
+
+
+#################### Resource limits ####################
+
+class BResourceLimit(Exception):
+	"""A script exceeded its CPU time limit."""
+	pass
+
+def cpu_time():
+	usage = resource.getrusage(resource.RUSAGE_SELF)
+	return usage.ru_utime + usage.ru_stime
+
+def address_space():
+	"""Return the current virtual memory size in bytes, if it is known."""
+	try:
+		with open('/proc/self/statm') as file:
+			pages = int(file.read().split()[0])
+		return pages * resource.getpagesize()
+	except (IOError, OSError, ValueError):
+		return None
+
+class BLimits(object):
+	"""
+	Per-request CPU time (seconds) and memory (megabytes) limits. They are
+	set as soft limits relative to the worker's current usage, so they can
+	be lifted again once the request is done.
+	"""
+
+	def __init__(self, cpu=None, memory=None):
+		self.cpu = cpu
+		self.memory = memory
+		self.exceeded = False
+		self.saved = {}
+
+	def xcpu(self, signum, frame):
+		self.exceeded = True
+		raise BResourceLimit('CPU time limit exceeded')
+
+	def install(self):
+		if resource is None:
+			return
+		for limit in [resource.RLIMIT_CPU, resource.RLIMIT_AS]:
+			self.saved[limit] = resource.getrlimit(limit)
+		if self.cpu is not None:
+			signal.signal(signal.SIGXCPU, self.xcpu)
+
+	def apply(self):
+		if resource is None:
+			return
+		if self.cpu is not None:
+			(_, hard) = resource.getrlimit(resource.RLIMIT_CPU)
+			soft = int(math.ceil(cpu_time() + self.cpu))
+			if hard != resource.RLIM_INFINITY:
+				soft = min(soft, hard)
+			resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+		if self.memory is not None:
+			size = address_space()
+			if size is not None:
+				(_, hard) = resource.getrlimit(resource.RLIMIT_AS)
+				soft = size + int(self.memory * 1024 * 1024)
+				if hard != resource.RLIM_INFINITY:
+					soft = min(soft, hard)
+				resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+	def lift(self):
+		for (limit, value) in self.saved.items():
+			resource.setrlimit(limit, value)
+
+
+#################### Server ####################
+
+def warm_up():
+	"""Tokenize every code builtin so forked workers share the tokens."""
+	for builtin in set(builtins.values()):
+		if builtin.code is not None and builtin.tokens is None:
+			builtin.tokens = BContext.tokenized(builtin.code)
+	gc.collect()
+	if hasattr(gc, 'freeze'):
+		gc.freeze()
+
+def handle_request(request, encoding, limits):
+	script = request.get('script', '')
+	argv = request.get('argv', [])
+	stdin = request.get('stdin', '')
+	filename = request.get('filename', '')
+	limits.apply()
+	try:
+		(output, status) = run_captured(filename, script, argv, encoding,
+			stdin, reraise=MemoryError)
+	except MemoryError:
+		(output, status) = ('Error: memory limit exceeded\n', 1)
+		limits.exceeded = True
+	finally:
+		limits.lift()
+	return {'stdout': output, 'status': status}
+
+def worker(listener, max_requests, limits, encoding):
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	signal.signal(signal.SIGTERM, signal.SIG_DFL)
+	limits.install()
+	handled = 0
+	while handled < max_requests and not limits.exceeded:
+		(conn, _) = listener.accept()
+		try:
+			request = receive_message(conn)
+			response = handle_request(request, encoding, limits)
+			send_message(conn, response)
+		except (EOFError, ValueError, socket.error):
+			pass
+		finally:
+			conn.close()
+		handled += 1
+
+def spawn_worker(listener, max_requests, limits, encoding):
+	pid = os.fork()
+	if pid:
+		return pid
+	status = 0
+	try:
+		worker(listener, max_requests, limits, encoding)
+	except BaseException:
+		status = 1
+	finally:
+		os._exit(status)
+
+def remove_socket(path):
+	try:
+		if stat.S_ISSOCK(os.stat(path).st_mode):
+			os.unlink(path)
+	except OSError:
+		pass
+
+def serve(path, workers=None, max_requests=1000, cpu_limit=None,
+	mem_limit=None, encoding='utf-8'):
+	"""Serve script requests on a UNIX socket until terminated."""
+	workers = workers or multiprocessing.cpu_count()
+	remove_socket(path)
+	listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	listener.bind(path)
+	listener.listen(128)
+	limits = BLimits(cpu_limit, mem_limit)
+	warm_up()
+	children = set()
+	def stop(signum, frame):
+		raise SystemExit(0)
+	signal.signal(signal.SIGTERM, stop)
+	signal.signal(signal.SIGINT, stop)
+	try:
+		for _ in range(workers):
+			children.add(spawn_worker(listener, max_requests, limits,
+				encoding))
+		while True:
+			(pid, _) = os.wait()
+			children.discard(pid)
+			children.add(spawn_worker(listener, max_requests, limits,
+				encoding))
+	finally:
+		for pid in children:
+			try:
+				os.kill(pid, signal.SIGTERM)
+			except OSError:
+				pass
+		listener.close()
+		remove_socket(path)
+
+
+#################### Client ####################
+
+def remote_executor(path):
+	"""Return a replacement for execute_file that runs scripts on a server."""
+	def execute(filename, script, argv, encoding, debug, profile=False):
+		stdin = ''
+		if filename != '<stdin>' and not sys.stdin.isatty():
+			stdin = sys.stdin.read()
+		client(path, filename, script, argv, stdin)
+	return execute
+
+def client(path, filename, script, argv, stdin=''):
+	"""Send a script to a server, print its output, and exit with its status."""
+	conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		conn.connect(path)
+		send_message(conn, {'script': script, 'argv': argv,
+			'stdin': stdin, 'filename': filename})
+		response = receive_message(conn)
+	except (EOFError, socket.error) as ex:
+		colors.set_colors(ALERT_COLORS)
+		print('Error: {}'.format(ex))
+		colors.set_colors(colors.DEFAULT_COLORS)
+		sys.exit(1)
+	finally:
+		conn.close()
+	sys.stdout.write(response.get('stdout', ''))
+	sys.stdout.flush()
+	sys.exit(response.get('status', 1))
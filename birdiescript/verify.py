@@ -0,0 +1,517 @@
+# -*- coding: utf-8 -*-
+"""
+Differential verification of the optimized interpreter.
+
+A script is run twice in lockstep, once by the reference interpreter and
+once by the optimized one, and the stacks, scopes and output of the two
+runs are compared after every top-level token. The reference interpreter
+runs every token through the debug trace path, with its trace discarded,
+and with fusion, lazy unfolds, packed vectors, lazy lists, ropes, native
+builtins, type specializations and hash caching switched off. The first
+token after which they differ is reported. A fuzzer generates random
+well-formed scripts from the builtins table to feed the comparison.
+"""
+
+
+#################### Imports ####################
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import sys    # stdout, exit, getswitchinterval, setswitchinterval
+import io     # StringIO
+import random # Random
+import signal # signal, setitimer, SIGALRM
+import types  # MethodType
+import time   # time
+import traceback # print_exc
+import importlib # import_module
+import multiprocessing.pool # ThreadPool
+
+from .core import *
+from . import fusion
+
+# The builtins module, which the builtins table shadows in this package
+definitions = importlib.import_module('.builtins', __package__)
+
+try:
+	RecursionError
+except NameError:
+	# Python 2
+	RecursionError = RuntimeError
+
+
+#################### Differential runs ####################
+
+# Fast paths the reference interpreter runs without, by owner and switch
+reference_switches = [
+	(fusion, 'enabled'),
+	(definitions, 'lazy_unfolds'),
+	(definitions, 'natively'),
+	(BVector, 'enabled'),
+	(BLazyList, 'enabled'),
+	(BRopeList, 'enabled'),
+	(BRopeStr, 'enabled'),
+	(BBuiltin, 'specialized'),
+	(BList, 'caching'),
+]
+
+class BDiscard(object):
+	"""A writable stream that discards what is written to it."""
+	
+	encoding = 'utf-8'
+	
+	def write(self, s):
+		pass
+	
+	def flush(self):
+		pass
+
+class BReferenceMode(object):
+	"""
+	Switches off the fast paths while the reference interpreter runs, and
+	discards the trace it prints.
+	"""
+	
+	def __enter__(self):
+		self.saved = [(owner, name, getattr(owner, name))
+			for (owner, name) in reference_switches]
+		for (owner, name) in reference_switches:
+			setattr(owner, name, False)
+		self.stdout = sys.stdout
+		sys.stdout = BDiscard()
+		return self
+	
+	def __exit__(self, *exc_info):
+		sys.stdout = self.stdout
+		for (owner, name, value) in self.saved:
+			setattr(owner, name, value)
+		return False
+
+class BVerifyTimeout(BaseException):
+	"""A verification run took too long."""
+	pass
+
+class BDivergence(object):
+	"""The first point at which two runs of a script disagree."""
+
+	def __init__(self, index, token, field, expected, actual):
+		self.index = index
+		self.token = token
+		self.field = field
+		self.expected = expected
+		self.actual = actual
+
+	def __str__(self):
+		if self.token is None:
+			where = 'end of script'
+		else:
+			where = 'token {} (character {}): {}'.format(self.index + 1,
+				self.token.pos + 1, self.token.text)
+		return ('Divergence at {}\n  {}:\n    reference: {}\n    optimized: {}'
+			.format(where, self.field, self.expected, self.actual))
+
+class BVerifyRun(object):
+	"""
+	One side of a differential run, with its own I/O and random state. The
+	reference side traces its tokens, in reference mode.
+	"""
+
+	def __init__(self, script, encoding, scope, stdin, seed, profile=None,
+		reference=False):
+		self.stdout = io.StringIO()
+		self.reference = reference
+		state = BState.isolated(seed, io.StringIO(stdin), self.stdout)
+		self.context = BContext(script, encoding, debug=reference,
+			state=state)
+		self.context.tokenize()
+		for (name, value) in scope.items():
+			self.context.scope[name] = value.copy()
+		self.error = None
+		if profile is not None:
+			profile.attach(self.context.tokens)
+			self.context.profile = profile
+
+	def run(self, step, *args):
+		if self.reference:
+			with BReferenceMode():
+				self.attempt(step, *args)
+		else:
+			self.attempt(step, *args)
+
+	def attempt(self, step, *args):
+		try:
+			step(*args)
+		except RecursionError:
+			# Stack depth differs between interpreters, so this is inconclusive
+			raise
+		except Exception as ex:
+			if alarm_fired:
+				# A bare except clause turned the timeout into this error
+				raise BVerifyTimeout()
+			self.error = '{}: {}'.format(type(ex).__name__, ex)
+
+	def prepare(self):
+		self.run(self.context.prepare)
+
+	def step(self):
+		def step():
+			context = self.context
+			context.execute_token(context.tokens[context.counter])
+			context.counter += 1
+		self.run(step)
+
+	def conclude(self):
+		self.run(self.context.conclude, True)
+
+	def finished(self):
+		context = self.context
+		return (self.error is not None or context.broken or
+			context.counter >= len(context.tokens))
+
+	def snapshot(self):
+		context = self.context
+		return [
+			('stack', ' '.join(map(repr, context.stack))),
+			('rstack', ' '.join(map(repr, context.rstack))),
+			('scope', ' '.join('{}={}'.format(name, repr(value))
+				for (name, value) in sorted(context.scope.items()))),
+			('output', repr(self.stdout.getvalue())),
+			('state', 'exited' if context.broken else
+				'block level {}'.format(context.blocklevel)),
+			('error', self.error or 'none'),
+		]
+
+def compare(reference, optimized, index, token):
+	for ((field, expected), (_, actual)) in zip(reference.snapshot(),
+		optimized.snapshot()):
+		if expected != actual:
+			return BDivergence(index, token, field, expected, actual)
+	return None
+
+def verify_script(script, encoding=None, scope=None, stdin='', seed=0,
+	profile=None):
+	"""
+	Run a script under the reference and optimized interpreters, and return
+	the first divergence between them, or None if they agree.
+	"""
+	if profile is None:
+		profile = BProfile(record=False)
+	scope = scope or {}
+	reference = BVerifyRun(script, encoding, scope, stdin, seed,
+		reference=True)
+	optimized = BVerifyRun(script, encoding, scope, stdin, seed, profile)
+	reference.prepare()
+	optimized.prepare()
+	divergence = compare(reference, optimized, -1, None)
+	while divergence is None and not reference.finished():
+		index = reference.context.counter
+		token = reference.context.tokens[index]
+		reference.step()
+		optimized.step()
+		# A fused chain runs the tokens after it too, which the reference
+		# runs one by one before they are compared
+		while (not reference.finished() and
+			reference.context.counter < optimized.context.counter):
+			reference.step()
+		divergence = compare(reference, optimized, index, token)
+	if divergence is None and reference.error is None:
+		reference.conclude()
+		optimized.conclude()
+		divergence = compare(reference, optimized, -1, None)
+	return divergence
+
+def report(divergence):
+	sys.stdout.flush()
+	colors.set_colors(ALERT_COLORS)
+	print(divergence)
+	colors.set_colors(colors.DEFAULT_COLORS)
+
+def verify_file(filename, script, argv, encoding, debug, profile=False):
+	context = BContext(script, encoding)
+	predefine_variables(context, filename, script, argv)
+	path = None
+	if filename and filename != '<stdin>':
+		path = filename + BProfile.extension
+	profile = BProfile(path, record=False)
+	stdin = ''
+	if filename != '<stdin>' and not sys.stdin.isatty():
+		stdin = sys.stdin.read()
+	try:
+		profile.load()
+		divergence = verify_script(script, encoding, context.scope, stdin,
+			profile=profile)
+	except Exception as ex:
+		sys.stdout.flush()
+		colors.set_colors(ALERT_COLORS)
+		print('Error: {}'.format(ex))
+		if debug:
+			traceback.print_exc()
+		colors.set_colors(colors.DEFAULT_COLORS)
+		sys.exit(1)
+	if divergence is not None:
+		report(divergence)
+		sys.exit(1)
+	print('Verified: no divergence')
+
+
+#################### Fuzzing ####################
+
+# Builtins that touch the outside world or cannot be replayed identically
+fuzz_unsafe = ['>i', '>c', '>n', '>o', '>w', '>t', '>f', '>b', '>u', '>x',
+	'<f', '<b', '<a', '<c', '<e', 'Xp', 'Rd', 'Sp', 'Ck', 'Tn', 'Uu', 'Ua']
+
+# Builtins whose results can grow too large to interrupt, whose work goes
+# on in worker processes or threads after a timeout, or that can wait forever
+fuzz_excluded = ['^p', '!f', 'Go', 'Psearch', 'Psearchall', 'Spawn', 'Tj',
+	'Recv']
+
+fuzz_alphabet = '0123456789abc+-*, '
+
+fuzz_variables = ['Fzx', 'Fzy']
+
+def fuzz_disabled(self, context, looping=False):
+	raise ValueError('{} is disabled while fuzzing'.format(self))
+
+def fuzz_disable():
+	"""Disable the unsafe builtins, and return their saved implementations."""
+	unsafe = [builtins[name] for name in fuzz_unsafe]
+	saved = [(b, b.apply) for b in unsafe]
+	for b in unsafe:
+		b.apply = types.MethodType(fuzz_disabled, b)
+	return saved
+
+def fuzz_restore(saved):
+	for (b, apply) in saved:
+		b.apply = apply
+
+def fuzz_names(excluded=()):
+	"""
+	Return the builtin names a fuzzed script may use, and the subset of them
+	with specializations, which get used more often.
+	"""
+	disabled = [builtins[name] for name in fuzz_unsafe + fuzz_excluded +
+		list(excluded)]
+	(names, specialized) = ([], [])
+	for (name, builtin) in sorted(builtins.items()):
+		if any(builtin is b for b in disabled):
+			continue
+		tokens = BContext.tokenized(name)
+		if len(tokens) != 1 or tokens[0].type != 'name':
+			continue
+		names.append(name)
+		if builtin.specializations:
+			specialized.append(name)
+	return (names, specialized)
+
+def fuzz_literal(rng):
+	kind = rng.randrange(6)
+	if kind == 0:
+		return str(rng.randrange(100)) + rng.choice(['', 'm'])
+	elif kind == 1:
+		return '{}.{}'.format(rng.randrange(10), rng.randrange(10))
+	elif kind == 2:
+		n = rng.randrange(5)
+		return '`{}`'.format(''.join(rng.choice(fuzz_alphabet)
+			for _ in range(n)))
+	elif kind == 3:
+		return "'" + rng.choice('abc+-*,')
+	elif kind == 4:
+		return ':' + rng.choice(fuzz_variables)
+	else:
+		return rng.choice(fuzz_variables)
+
+def fuzz_tokens(rng, names, length, depth=0):
+	tokens = []
+	while len(tokens) < length:
+		kind = rng.randrange(10)
+		if kind < 3:
+			tokens.append(str(rng.randrange(10)))
+		elif kind < 5:
+			tokens.append(fuzz_literal(rng))
+		elif kind < 6 and depth < 2:
+			inner = fuzz_tokens(rng, names, rng.randrange(4), depth + 1)
+			tokens.append(rng.choice(['{', '\\{']))
+			tokens.extend(inner)
+			tokens.append('}')
+		elif kind < 8 and names[1]:
+			tokens.append(rng.choice(names[1]))
+		else:
+			tokens.append(rng.choice(names[0]))
+	return tokens
+
+def fuzz_script(rng, names, length=16):
+	"""Generate a random well-formed script."""
+	return ' '.join(fuzz_tokens(rng, names, rng.randrange(1, length + 1)))
+
+# Whether the alarm has fired for the script being run, after which any
+# error it raises may be a timeout that a bare except clause turned into one
+alarm_fired = False
+
+def fuzz_alarm(signum, frame):
+	global alarm_fired
+	alarm_fired = True
+	# Keep firing until the timeout escapes any bare except clauses
+	signal.setitimer(signal.ITIMER_REAL, 0.05)
+	raise BVerifyTimeout()
+
+def start_alarm(timeout):
+	global alarm_fired
+	alarm_fired = False
+	signal.setitimer(signal.ITIMER_REAL, timeout)
+
+def stop_alarm():
+	global alarm_fired
+	signal.setitimer(signal.ITIMER_REAL, 0)
+	if alarm_fired:
+		alarm_fired = False
+		raise BVerifyTimeout()
+
+def fuzz(count, seed=None, timeout=2.0):
+	"""Verify count random scripts, and report any divergences."""
+	if seed is None:
+		seed = int(time.time())
+	rng = random.Random(seed)
+	names = fuzz_names()
+	saved = fuzz_disable()
+	can_alarm = hasattr(signal, 'setitimer')
+	if can_alarm:
+		handler = signal.signal(signal.SIGALRM, fuzz_alarm)
+	(passed, timeouts, divergences) = (0, 0, 0)
+	try:
+		for i in range(count):
+			script = fuzz_script(rng, names)
+			try:
+				if can_alarm:
+					start_alarm(timeout)
+				try:
+					divergence = verify_script(script, seed=i)
+				finally:
+					if can_alarm:
+						stop_alarm()
+			except (BVerifyTimeout, RecursionError):
+				# Timeouts and recursion limits are inconclusive
+				timeouts += 1
+				continue
+			if divergence is None:
+				passed += 1
+			else:
+				divergences += 1
+				print('Script: {}'.format(script))
+				report(divergence)
+				print()
+	finally:
+		fuzz_restore(saved)
+		if can_alarm:
+			signal.signal(signal.SIGALRM, handler)
+	print('Fuzzed {} scripts (seed {}): {} agreed, {} diverged, {} timed out'
+		.format(count, seed, passed, divergences, timeouts))
+	if divergences:
+		sys.exit(1)
+
+
+#################### Stress testing ####################
+
+# Builtins that fork worker processes, which is unsafe once threads run
+stress_excluded = ['Pmap', 'Pfilter', 'Psortby']
+
+# Threads in the pool, and concurrent runs of each script
+stress_threads = 16
+stress_repeats = 4
+
+def stress_run(job):
+	"""Run a tokenized script with an isolated state; return what it did."""
+	(script, tokens, seed) = job
+	stdout = io.StringIO()
+	state = BState.isolated(seed, io.StringIO(), stdout)
+	context = BContext(script, 'utf-8', state=state)
+	context.tokens = list(tokens)
+	error = None
+	try:
+		context.execute()
+	except RecursionError:
+		raise
+	except Exception as ex:
+		if alarm_fired:
+			raise BVerifyTimeout()
+		error = '{}: {}'.format(type(ex).__name__, ex)
+	return (' '.join(map(repr, context.stack)), stdout.getvalue(), error)
+
+def stress_attempt(job):
+	try:
+		return stress_run(job)
+	except RecursionError:
+		return None
+
+def stress_report(script, expected, actual):
+	print('Script: {}'.format(script))
+	sys.stdout.flush()
+	colors.set_colors(ALERT_COLORS)
+	print('Concurrent run differs\n  serial: {}\n  threaded: {}'.format(
+		expected, actual))
+	colors.set_colors(colors.DEFAULT_COLORS)
+	print()
+
+def stress(count, threads=None, seed=None, timeout=2.0):
+	"""
+	Run count random scripts serially, then run each of them several times
+	at once in a pool of threads, and report any threaded run that differs
+	from its serial one. Every run has an isolated state, and the runs of a
+	script share one list of tokens.
+	"""
+	if seed is None:
+		seed = int(time.time())
+	threads = threads or stress_threads
+	rng = random.Random(seed)
+	names = fuzz_names(stress_excluded)
+	saved = fuzz_disable()
+	can_alarm = hasattr(signal, 'setitimer')
+	if can_alarm:
+		handler = signal.signal(signal.SIGALRM, fuzz_alarm)
+	# Switch threads often, to interleave the runs as finely as possible
+	interval = getattr(sys, 'getswitchinterval', lambda: None)()
+	(serial, timeouts) = ([], 0)
+	try:
+		for i in range(count):
+			script = fuzz_script(rng, names)
+			job = (script, BContext.tokenized(script), i)
+			try:
+				if can_alarm:
+					start_alarm(timeout)
+				try:
+					result = stress_run(job)
+				finally:
+					if can_alarm:
+						stop_alarm()
+				serial.append((job, result))
+			except (BVerifyTimeout, RecursionError):
+				# Scripts that time out would tie up the threads
+				timeouts += 1
+		runs = serial * stress_repeats
+		rng.shuffle(runs)
+		if interval is not None:
+			sys.setswitchinterval(1e-5)
+		pool = multiprocessing.pool.ThreadPool(threads)
+		try:
+			results = pool.map(stress_attempt, [job for (job, _) in runs], 1)
+		finally:
+			pool.close()
+			pool.join()
+	finally:
+		if interval is not None:
+			sys.setswitchinterval(interval)
+		fuzz_restore(saved)
+		if can_alarm:
+			signal.signal(signal.SIGALRM, handler)
+	(agreed, differed) = (0, 0)
+	for (((script, _, _), expected), actual) in zip(runs, results):
+		if actual == expected:
+			agreed += 1
+		else:
+			differed += 1
+			stress_report(script, expected, actual)
+	print('Stressed {} scripts on {} threads (seed {}): {} runs agreed, '
+		'{} differed, {} scripts timed out'.format(count, threads, seed,
+		agreed, differed, timeouts))
+	if differed:
+		sys.exit(1)
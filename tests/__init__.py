@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""
+Birdiescript tests.
+
+Run them with python -m unittest discover -s tests -t . from the top
+directory, which works on Python 2 as well as 3.
+"""
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+from birdiescript.api import BScript
+
+def stack_of(source, seed=None, stack=()):
+	"""Run a script and return the reprs of what it leaves on the stack."""
+	result = BScript(source).run(stack=stack, seed=seed)
+	return [repr(x) for x in result.stack]
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import sys
+import unittest
+import multiprocessing.pool
+
+from . import stack_of, BScript
+
+# Scripts that draw random numbers, write output, memoize and stream
+concurrent_scripts = ['20U{100H}|', '10U L', '5{Ra}*]', '`abc`O 3{,O}/',
+	'8U{10H+}|{;10H 5<}&+s', '{,2<{}{,(F$2-F+}I}1 0Mm:F; 25F',
+	'1{)}Itr {,*}| {2%}& 5<', '[[1 2][3 4]]5^m 1Ex']
+
+def outcome(job):
+	"""Run a compiled script with a seed; return what it did."""
+	(script, seed) = job
+	result = script.run(seed=seed)
+	return ([repr(x) for x in result.stack], result.output, result.status)
+
+class TestAPI(unittest.TestCase):
+	
+	def test_python_stack_values(self):
+		self.assertEqual(stack_of('', stack=[1, [2, 3], 'x']),
+			['1', '[2 3]', "'x"])
+		self.assertEqual(stack_of('', stack=[{'a': 1}]), ["[['a 1]]"])
+	
+	def test_concurrent_runs(self):
+		# Runs of one compiled script on many threads at once do the same as
+		# the runs one at a time
+		jobs = [(BScript(source), seed) for source in concurrent_scripts
+			for seed in range(4)]
+		serial = [outcome(job) for job in jobs]
+		interval = getattr(sys, 'getswitchinterval', lambda: None)()
+		if interval is not None:
+			sys.setswitchinterval(1e-5)
+		pool = multiprocessing.pool.ThreadPool(16)
+		try:
+			threaded = pool.map(outcome, jobs * 4, 1)
+		finally:
+			pool.close()
+			pool.join()
+			if interval is not None:
+				sys.setswitchinterval(interval)
+		self.assertEqual(threaded, serial * 4)
+
+if __name__ == '__main__':
+	unittest.main()
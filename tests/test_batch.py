@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import io
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+from birdiescript import batch
+
+def write(path, text):
+	with io.open(path, 'w', encoding='utf-8') as file:
+		file.write(text)
+
+class TestBatch(unittest.TestCase):
+	
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		write(os.path.join(self.directory, 'sum.bs'), '1 2+')
+		write(os.path.join(self.directory, 'sum.txt'), '3\n')
+	
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+	
+	def run_batch(self, *entries):
+		"""Run a manifest of jobs; return the results and the exit status."""
+		path = os.path.join(self.directory, 'manifest.jsonl')
+		write(path, ''.join(json.dumps(e) + '\n' for e in entries))
+		(stdout, sys.stdout) = (sys.stdout, io.StringIO())
+		try:
+			batch.run_batch(path, workers=2)
+			status = 0
+		except SystemExit as ex:
+			status = ex.code
+		finally:
+			(sys.stdout, output) = (stdout, sys.stdout.getvalue())
+		return ([json.loads(line) for line in output.splitlines()], status)
+	
+	def test_passing_jobs(self):
+		(results, status) = self.run_batch(
+			{'script': 'sum.bs', 'expected': 'sum.txt'}, {'script': 'sum.bs'})
+		self.assertEqual([r['passed'] for r in results], [True, None])
+		self.assertEqual(status, 0)
+	
+	def test_missing_script_fails(self):
+		(results, status) = self.run_batch(
+			{'script': 'nope.bs', 'expected': 'x'})
+		self.assertEqual(results[0]['status'], 1)
+		self.assertEqual(status, 1)
+	
+	def test_missing_expected_output_fails(self):
+		(_, status) = self.run_batch({'script': 'sum.bs', 'expected': 'x'})
+		self.assertEqual(status, 1)
+	
+	def test_report_error_is_raised(self):
+		def report(result):
+			raise ValueError('report failed')
+		(original, batch.report) = (batch.report, report)
+		try:
+			with self.assertRaises(ValueError) as caught:
+				self.run_batch({'script': 'sum.bs'})
+		finally:
+			batch.report = original
+		self.assertEqual(str(caught.exception), 'report failed')
+
+if __name__ == '__main__':
+	unittest.main()
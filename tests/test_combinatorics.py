@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import unittest
+
+from birdiescript.core import BLazyList
+
+from . import stack_of, BScript
+
+# Lazy lists of permutations, subsets, choices and products
+spaces = ['[1 2 3 4]U', '`abcd`U', '[1 2 3 4]C', '`abcde`2Ch', '[1 2 3]2Chr',
+	'[1 2 3]`xy`*c']
+
+# Ways of indexing and slicing them
+reads = ['', '#', '0[g', '5[g', '1m[g', '3<', '3>', '1m<', '[1 7 2]Ss',
+	'[1m 1m 3m]Ss', '3%', '2m%', '(', ')', '{#}|']
+
+def eagerly(source):
+	"""Run a script with lists of candidates computed up front."""
+	BLazyList.enabled = False
+	try:
+		return stack_of(source)
+	finally:
+		BLazyList.enabled = True
+
+class TestCombinatorics(unittest.TestCase):
+	
+	def test_spaces_are_lazy(self):
+		for source in spaces:
+			result = BScript(source).run()
+			self.assertIsInstance(result.stack[-1], BLazyList, source)
+	
+	def test_reads_match_eager_lists(self):
+		for space in spaces:
+			for read in reads:
+				source = space + ' ' + read
+				self.assertEqual(stack_of(source), eagerly(source), source)
+	
+	def test_large_spaces(self):
+		# 25 items have more permutations than fit in 64 bits
+		self.assertEqual(stack_of('25U U 15511210043330985983999999[g 3<'),
+			['[24 23 22]'])
+		self.assertEqual(stack_of('25U U # 15511210043330985984000000='),
+			['1'])
+		self.assertEqual(stack_of('25U U 1[g 23>'), ['[24 23]'])
+
+	def test_changed_in_place(self):
+		self.assertEqual(stack_of('[1 2 3]U 0 5[s 2<'), ['[5 [1 3 2]]'])
+	
+	def test_source_changed_in_place(self):
+		# Lists already built keep the items their source had then
+		for space in ['U', 'C', '2Ch', '2Chr', '[3 4]*c']:
+			source = '[1 2 3]:A; A' + space + ' A(;;'
+			self.assertEqual(stack_of(source), eagerly(source), source)
+		self.assertEqual(stack_of('[1 2]:A; A[3 4]*c A(;;'),
+			['[[1 3] [1 4] [2 3] [2 4]]'])
+
+if __name__ == '__main__':
+	unittest.main()
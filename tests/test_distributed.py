@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import io
+import os
+import sys
+import json
+import socket
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+from birdiescript import distributed
+
+top = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def write(path, text):
+	with io.open(path, 'w', encoding='utf-8') as file:
+		file.write(text)
+
+def free_port():
+	listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	try:
+		listener.bind(('127.0.0.1', 0))
+		return listener.getsockname()[1]
+	finally:
+		listener.close()
+
+def ibis(*args):
+	"""Start ibis with arguments, capturing what it prints."""
+	env = dict(os.environ, PYTHONPATH=top)
+	command = [sys.executable, os.path.join(top, 'bin', 'ibis')] + list(args)
+	return subprocess.Popen(command, stdout=subprocess.PIPE,
+		stderr=subprocess.STDOUT, env=env)
+
+def results(process):
+	"""Wait for ibis to finish; return its exit status and report."""
+	(output, _) = process.communicate(timeout=60)
+	report = []
+	for line in output.decode('utf-8').splitlines():
+		if line.startswith('{'):
+			result = json.loads(line)
+			# Timings differ from run to run
+			del result['time']
+			report.append(result)
+	return (process.returncode, report)
+
+class TestDistributed(unittest.TestCase):
+	
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		write(os.path.join(self.directory, 'sum.bs'), 'A{Nr}|+s')
+		write(os.path.join(self.directory, 'square.bs'), 'A{Nr,*}|+s')
+		write(os.path.join(self.directory, 'nine.txt'), '9\n')
+		jobs = [{'script': 'sum.bs', 'args': ['4', '5'],
+			'expected': 'nine.txt'}]
+		jobs.extend({'script': 'square.bs', 'args': [str(n)]}
+			for n in range(10))
+		jobs.append({'script': 'nope.bs'})
+		self.manifest = os.path.join(self.directory, 'manifest.jsonl')
+		write(self.manifest, ''.join(json.dumps(job) + '\n' for job in jobs))
+	
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+	
+	@unittest.skipIf(sys.version_info < (3, 3), 'needs communicate timeout')
+	def test_coordinator_matches_batch(self):
+		address = '127.0.0.1:{}'.format(free_port())
+		coordinator = ibis('--batch', self.manifest, '--coordinator', address)
+		workers = [ibis('--worker', address, '--workers', '1')
+			for _ in range(2)]
+		try:
+			distributed = results(coordinator)
+		finally:
+			for process in workers:
+				process.communicate(timeout=60)
+		local = results(ibis('--batch', self.manifest, '--workers', '2'))
+		self.assertEqual(distributed, local)
+		(status, report) = local
+		self.assertEqual(status, 1)
+		self.assertEqual(len(report), 12)
+		self.assertTrue(report[0]['passed'])
+		self.assertEqual([r['stdout'] for r in report[1:4]],
+			['0\n', '1\n', '4\n'])
+	
+	def test_no_workers_fails_remaining_jobs(self):
+		address = '127.0.0.1:{}'.format(free_port())
+		settings = (distributed.idle_timeout, distributed.heartbeat_interval)
+		(distributed.idle_timeout, distributed.heartbeat_interval) = (0.2, 0.05)
+		(stdout, sys.stdout) = (sys.stdout, io.StringIO())
+		try:
+			with self.assertRaises(SystemExit) as caught:
+				distributed.coordinate(self.manifest, address)
+		finally:
+			(sys.stdout, output) = (stdout, sys.stdout.getvalue())
+			(distributed.idle_timeout,
+				distributed.heartbeat_interval) = settings
+		self.assertEqual(caught.exception.code, 1)
+		report = [json.loads(line) for line in output.splitlines()]
+		self.assertEqual(len(report), 12)
+		self.assertEqual([r['status'] for r in report], [1] * 12)
+		self.assertEqual(report[0]['stdout'], 'Error: no workers\n')
+		self.assertNotEqual(report[-1]['stdout'], 'Error: no workers\n')
+
+if __name__ == '__main__':
+	unittest.main()
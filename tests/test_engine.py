@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import sys
+import unittest
+
+from birdiescript import engine
+
+from . import stack_of, BScript
+
+# Scripts whose higher-order builtins have step versions in the engine
+scripts = [
+	'0 5{)}*', '[1 2 3 4]{+}*', '`abc`{+}*', '1 0{)}*',
+	'[1 2 3]{2*}-', '4{,*}-', '`ab`{)}-',
+	'[1 2 3]{,}|', '5{2*}|', '`abc`{)}|', '3{;}|',
+	'[1 2 3 4]{2%}&', '6{3%}&', '`abcd`{98>}&', '[]{1}&',
+	'[[1 2][3 4]]{{+}*}|', '3{{)}*}|', '5{2%}&{,*}|+s',
+	'[1 2 3]{.}-', '{)}Itr {,*}| {2%}& 5<',
+]
+
+def stepped(source):
+	"""Run a script through the engine; return the reprs of its stack."""
+	(context, _) = BScript(source).context()
+	engine.run_stepped(context)
+	return [repr(x) for x in context.stack]
+
+class TestEngine(unittest.TestCase):
+	
+	def test_steps_match_builtins(self):
+		for source in scripts:
+			self.assertEqual(stepped(source), stack_of(source), source)
+	
+	@unittest.skipIf(sys.version_info < (3, 5), 'needs asyncio')
+	def test_concurrent_scripts(self):
+		import asyncio
+		from birdiescript import aio
+		sources = ['{}U{{,*}}|+s 0.001Sp'.format(i % 50 + 1)
+			for i in range(1000)]
+		loop = asyncio.new_event_loop()
+		asyncio.set_event_loop(loop)
+		try:
+			results = loop.run_until_complete(asyncio.gather(
+				*[aio.run(source) for source in sources]))
+		finally:
+			asyncio.set_event_loop(None)
+			loop.close()
+		self.assertEqual([[repr(x) for x in r.stack] for r in results],
+			[stack_of(source[:-7]) for source in sources])
+
+if __name__ == '__main__':
+	unittest.main()
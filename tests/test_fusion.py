@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import sys
+import unittest
+
+from birdiescript import fusion
+
+from . import stack_of
+
+def staged(source, seed=None):
+	"""Run a script with chains run stage by stage."""
+	fusion.enabled = False
+	try:
+		return stack_of(source, seed)
+	finally:
+		fusion.enabled = True
+
+class TestFusion(unittest.TestCase):
+	
+	def assertFusedLikeStaged(self, source, seed=None):
+		self.assertEqual(stack_of(source, seed), staged(source, seed))
+	
+	def test_pure_chains(self):
+		self.assertFusedLikeStaged('10{,*}|{3%}&+s')
+		self.assertFusedLikeStaged('[5 3 8 1]{2*}|{,}-')
+		self.assertFusedLikeStaged('10U{1+}|{2%}&{,*}|+s')
+	
+	def test_rollback(self):
+		self.assertFusedLikeStaged('7 5U{+}|{2%}&')
+	
+	def test_block_arguments(self):
+		self.assertFusedLikeStaged('4U{2%!}&{5*}| V _w')
+		self.assertFusedLikeStaged('1 2 3 4 5 6 7 4U{2%!}&{5*}| V _w _x _y _z')
+	
+	def test_each_after_map_and_filter(self):
+		self.assertFusedLikeStaged('10U{;1}&{_w}|{1+}-')
+		self.assertEqual(stack_of('3U{;1}&{_w}|{1+}-'),
+			['1', '1', '2', '1', '3', '1'])
+	
+	def test_in_place_changes(self):
+		source = '[[1 2 3][4 5 6]]:A;A{(;}|{0[g 5={1 1}{1}I}&A'
+		self.assertFusedLikeStaged(source)
+		self.assertEqual(stack_of(source),
+			['1', '[[2 3] [5 6]]', '[[2 3] [5 6]]'])
+	
+	def test_seeded_random_draws(self):
+		for seed in range(5):
+			self.assertFusedLikeStaged('8U{10H+}|{;10H 5<}&', seed)
+			self.assertFusedLikeStaged('8U{Ra+}|{;Ra .5<}&', seed)
+			self.assertFusedLikeStaged('8U{10H+}|+s', seed)
+			self.assertFusedLikeStaged('6U{L}|{,}&', seed)
+	
+	@unittest.skipIf(sys.version_info < (3, 2),
+		'baseline drawn with the Python 3 random module')
+	def test_seeded_script_matches_baseline(self):
+		self.assertEqual(stack_of('1Rd 8U{10H+}|{;10H 5<}&'), ['[10 3 5]'])
+
+if __name__ == '__main__':
+	unittest.main()
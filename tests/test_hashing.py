@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import unittest
+
+from birdiescript.core import BInt, BList
+
+from . import BScript
+
+# A list to change, and scripts which change it in place
+mutations = [
+	('[3 1 2]', '0 9[s'),
+	('[3 1 2]', '1m 9[s'),
+	('[3 1 2]', '(;'),
+	('[3 1 2]', ');'),
+	('[3 1 2]', '1Rm'),
+	('[3 1 2]', '0[d'),
+	('[[1 2][3 4]]', '1 5#s'),
+]
+
+def value_of(source):
+	"""Run a script and return the last thing it leaves on the stack."""
+	return BScript(source).run().stack[-1]
+
+class TestHashing(unittest.TestCase):
+
+	def test_cache_follows_changes(self):
+		for (start, change) in mutations:
+			inner = value_of(start)
+			outer = BList([inner, BInt(4)])
+			(hash(inner), hash(outer))
+			result = BScript(change).run(stack=[inner])
+			self.assertIs(result.stack[-1], inner, change)
+			# Hashes must match freshly built lists with the same items
+			self.assertEqual(hash(inner), hash(value_of(repr(inner))), change)
+			self.assertEqual(hash(outer), hash(value_of(repr(outer))), change)
+
+	def test_cache_survives_unrelated_changes(self):
+		rows = value_of('[[1 2][3 4]]')
+		hash(rows)
+		cached = rows.hashed
+		BScript('(;(;').run(stack=[value_of('[5 6 7]')])
+		# Still current, so hashing again does not recompute it
+		self.assertIs(rows.hashed, cached)
+		self.assertIs(cached[0], BList.epoch)
+	
+	def test_packed_cache_follows_changes(self):
+		vector = value_of('3U')
+		outer = BList([vector])
+		hash(outer)
+		BScript('0 9[s').run(stack=[vector])
+		self.assertEqual(hash(outer), hash(value_of('[[9 1 2]]')))
+	
+	def test_equal_lists_hash_equally(self):
+		self.assertEqual(hash(value_of('[[1 2][3]]')),
+			hash(value_of('[[1 2][3]]')))
+		self.assertEqual(hash(value_of('[1 2 3]{}%')),
+			hash(value_of('[1 2 3]')))
+
+	def test_mode_after_change(self):
+		# Mode counts rows by hash, so a changed row must be recounted
+		rows = value_of('[[1 2][1 2][1 2][5 6][5 6][3 4][3 4]]')
+		self.assertEqual(repr(BScript('Mo').run(stack=[rows]).stack[-1]),
+			'[1 2]')
+		for row in rows.value[3:5]:
+			BScript('0 3[s 1 4[s').run(stack=[row])
+		self.assertEqual(repr(BScript('Mo').run(stack=[rows]).stack[-1]),
+			'[3 4]')
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import io
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+from birdiescript import judge
+
+from .test_batch import write
+
+class TestJudge(unittest.TestCase):
+	
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.cases = os.path.join(self.directory, 'cases')
+		os.mkdir(self.cases)
+	
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+	
+	def judge(self, source, cases, **options):
+		"""
+		Judge a script against cases given as (name, input, expected output)
+		triples; return the results, the summary and the exit status.
+		"""
+		filename = os.path.join(self.directory, 'script.bs')
+		write(filename, source)
+		for (name, stdin, expected) in cases:
+			if stdin is not None:
+				write(os.path.join(self.cases, name + '.in'), stdin)
+			if expected is not None:
+				write(os.path.join(self.cases, name + '.out'), expected)
+		(stdout, sys.stdout) = (sys.stdout, io.StringIO())
+		try:
+			judge.judge(filename, self.cases, **options)
+			status = 0
+		except SystemExit as ex:
+			status = ex.code
+		finally:
+			(sys.stdout, output) = (stdout, sys.stdout.getvalue())
+		lines = [json.loads(line) for line in output.splitlines()]
+		return (lines[:-1], lines[-1], status)
+	
+	def test_passing_cases(self):
+		(results, summary, status) = self.judge('>m>m+', [
+			('1', '3 4', '7\n'), ('2', '10 20', '30\n'), ('3', '1 1', None)])
+		self.assertEqual([r['passed'] for r in results], [True, True, None])
+		self.assertEqual((summary['passed'], summary['failed']), (2, 0))
+		self.assertEqual(status, 0)
+	
+	def test_wrong_output_fails(self):
+		(results, summary, status) = self.judge('>m>m+', [
+			('1', '3 4', '7\n'), ('2', '3 4', '8\n')])
+		self.assertEqual([r['passed'] for r in results], [True, False])
+		self.assertEqual(results[1]['stdout'], '7\n')
+		self.assertEqual((summary['passed'], summary['failed']), (1, 1))
+		self.assertEqual(status, 1)
+	
+	def test_error_without_expected_output_fails(self):
+		(results, summary, status) = self.judge('>m[]0[g', [
+			('1', '5', None)])
+		self.assertIsNone(results[0]['passed'])
+		self.assertEqual(results[0]['status'], 1)
+		self.assertIn('Error', results[0]['stdout'])
+		self.assertEqual((summary['passed'], summary['failed']), (0, 1))
+		self.assertEqual(status, 1)
+	
+	def test_timeout_fails(self):
+		(results, summary, status) = self.judge('>m{}{1}W', [
+			('1', '1', '1\n'), ('2', '2', None)], timeout=0.2)
+		self.assertEqual([r['timeout'] for r in results], [True, True])
+		self.assertEqual((summary['judged'], summary['failed']), (2, 2))
+		self.assertEqual(status, 1)
+	
+	def test_fail_fast(self):
+		(results, summary, status) = self.judge('>m>m+', [
+			('1', '1 1', '3\n'), ('2', '3 4', '7\n')], fail_fast=True)
+		self.assertEqual(len(results), 1)
+		self.assertEqual((summary['cases'], summary['judged']), (2, 1))
+		self.assertEqual(status, 1)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import importlib
+import unittest
+
+from birdiescript.core import BTypeError
+
+from . import BScript, stack_of
+
+definitions = importlib.import_module('birdiescript.builtins')
+
+def defined(source):
+	"""Run a script with builtins computed by their definitions."""
+	definitions.natively = False
+	try:
+		return stack_of(source)
+	finally:
+		definitions.natively = True
+
+class TestLinearAlgebra(unittest.TestCase):
+	
+	def assertNativeLikeDefined(self, source):
+		self.assertEqual(stack_of(source), defined(source))
+	
+	def test_missing_operands(self):
+		# The definition runs on the stack as it was
+		self.assertEqual(stack_of('1 I ^m [1.5 2]'), ['[1.5 2]'])
+	
+	def test_errors_name_packed_lists_as_lists(self):
+		with self.assertRaises(BTypeError) as caught:
+			BScript('[1 2]*d').run()
+		self.assertIn("'BList'", str(caught.exception))
+		self.assertNotIn('BVector', str(caught.exception))
+	
+	def test_empty_operands(self):
+		for source in ['[1 2][]*o', '[][1 2]*o', '[[1 2]][]*m', '[][[1 2]]*m',
+			'[[1 2]][[]]*m']:
+			self.assertEqual(stack_of(source), ['[]'])
+			self.assertNativeLikeDefined(source)
+	
+	def test_integers(self):
+		self.assertNativeLikeDefined('[[1 2][3 4]],*m')
+		self.assertNativeLikeDefined('[[1 2][3 4]]5^m')
+		self.assertNativeLikeDefined('[1 2 3][4 5 6]*d')
+	
+	def test_floats(self):
+		self.assertNativeLikeDefined('[[.1 .2][.3 .4]],*m')
+		self.assertNativeLikeDefined('[[.1 .2][.3 .4]]5^m')
+		self.assertNativeLikeDefined('[[1.5 2][3 4]]3^m')
+		self.assertNativeLikeDefined('[.1 .2 .3][.4 .5 .6]*d')
+
+if __name__ == '__main__':
+	unittest.main()
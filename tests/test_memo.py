@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import unittest
+
+from . import stack_of
+
+fibonacci = '{,2<{}{,(F$2-F+}I}1 0Mm:F;'
+
+class TestMemo(unittest.TestCase):
+	
+	def test_deep_recursion(self):
+		self.assertEqual(stack_of(fibonacci + '80F 23416728348467685='),
+			['1'])
+		self.assertEqual(stack_of(fibonacci + '300F '
+			'222232244629420445529739893461909967206666939096499764990979600='),
+			['1'])
+	
+	def test_recursion_in_blocks(self):
+		self.assertEqual(stack_of(fibonacci + '[10 20]{F}|'),
+			['[55 6765]'])
+	
+	def test_conversions(self):
+		self.assertEqual(stack_of('[1 2]\\{3}1 0Mm+'), ['\\{1 2 3}'])
+		self.assertEqual(stack_of('5\\{3}1 0Mm+'), ['\\{5 3}'])
+	
+	def test_cached_closures(self):
+		# Blocks returned from the cache still see the call that made them
+		self.assertEqual(stack_of('\\{:B;{B}}1 0Mm:M; 3MX 7MX 3MX'),
+			['3', '7', '3'])
+
+if __name__ == '__main__':
+	unittest.main()
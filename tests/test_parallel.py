@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import unittest
+
+from . import stack_of
+
+class TestParallel(unittest.TestCase):
+	
+	def test_serial_fallback_keeps_random_state(self):
+		# Impure blocks run serially, drawing as | would
+		for seed in range(3):
+			self.assertEqual(stack_of('20U{Ra}Pm 1000H', seed),
+				stack_of('20U{Ra}| 1000H', seed))
+			self.assertEqual(stack_of('[1 2]{;Ra}Pm 1000H', seed),
+				stack_of('[1 2]{;Ra}| 1000H', seed))
+	
+	def test_parallel_map(self):
+		self.assertEqual(stack_of('20U{2*}Pm'), stack_of('20U{2*}|'))
+
+if __name__ == '__main__':
+	unittest.main()
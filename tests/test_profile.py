@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from birdiescript.core import BProfile
+from birdiescript import engine
+
+from . import stack_of, BScript
+
+# Scripts whose builtins have fast paths, with operand types that change
+# between runs of the same call site
+scripts = [
+	'1 2+ 3* 4- 5%', '1.5 2+ .5* 3-', '10U{3%}|', '[1 2.5 3]{1+}|',
+	'5{,*7%)}*', '7 0%', '3 4< 4 3> 2 2=', '[1 2]{2<}& [3]1+',
+	'10{1.5+}* 1+', '`a` 1+ [1] 2*',
+]
+
+def profiled(source, profile, stepped=False):
+	"""
+	Run a script with a type profile; return the reprs of its stack, or the
+	message of the error it raised.
+	"""
+	(context, _) = BScript(source).context()
+	profile.attach(context.tokens)
+	context.profile = profile
+	try:
+		if stepped:
+			engine.run_stepped(context)
+		else:
+			context.execute()
+	except Exception as ex:
+		return str(ex)
+	return [repr(x) for x in context.stack]
+
+def unprofiled(source):
+	try:
+		return stack_of(source)
+	except Exception as ex:
+		return str(ex)
+
+class TestProfile(unittest.TestCase):
+	
+	def test_profiled_runs_agree(self):
+		for source in scripts:
+			expected = unprofiled(source)
+			self.assertEqual(profiled(source, BProfile()), expected, source)
+			self.assertEqual(profiled(source, BProfile(), True), expected,
+				source)
+	
+	def test_overflow_is_not_hidden(self):
+		source = '[1 2 3 4 5 6 7 8 9 10 400Pow]{1.5+}|'
+		expected = unprofiled(source)
+		self.assertIn('too large', expected)
+		self.assertEqual(profiled(source, BProfile()), expected)
+	
+	def test_saved_profile_agrees(self):
+		directory = tempfile.mkdtemp()
+		try:
+			path = os.path.join(directory, 'script.bs' + BProfile.extension)
+			for source in scripts:
+				expected = unprofiled(source)
+				profile = BProfile(path)
+				self.assertEqual(profiled(source, profile), expected)
+				profile.save()
+				# Later runs bind call sites from the saved counts
+				profile = BProfile(path)
+				profile.load()
+				self.assertTrue(profile.counts)
+				self.assertEqual(profiled(source, profile), expected)
+				os.remove(path)
+		finally:
+			shutil.rmtree(directory)
+
+if __name__ == '__main__':
+	unittest.main()
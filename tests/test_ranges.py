@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import unittest
+
+from birdiescript.core import BLazyList
+
+from . import stack_of, BScript
+
+class TestLazyRanges(unittest.TestCase):
+	
+	def test_step_is_lazy(self):
+		self.assertEqual(stack_of('10000000000U 5% 3<'), ['[0 5 10]'])
+		result = BScript('20U U 1000000%').run()
+		self.assertIsInstance(result.stack[-1], BLazyList)
+		self.assertEqual(stack_of('4U U 7% 2<'),
+			['[[0 1 2 3] [1 0 3 2]]'])
+	
+	def test_step(self):
+		self.assertEqual(stack_of('10U3%'), ['[0 3 6 9]'])
+		self.assertEqual(stack_of('[1 2 3 4]2%'), ['[1 3]'])
+		self.assertEqual(stack_of('`abcdef`2%'), ["'ace"])
+	
+	def test_count(self):
+		self.assertEqual(stack_of('10U 3#n'), ['1'])
+		self.assertEqual(stack_of('10U 10#n'), ['0'])
+		self.assertEqual(stack_of('10U 3.#n'), ['1'])
+		self.assertEqual(stack_of('10000000000000000000000U 7#n'), ['1'])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import unittest
+
+from birdiescript.core import BCoercionError, BStr, BRopeStr, BTypeError
+
+from . import BScript
+
+def joined(source):
+	return BScript(source).run().stack[-1]
+
+class TestRopes(unittest.TestCase):
+	
+	def test_short_strings_stay_plain(self):
+		s = joined("`a` 1000* `b`+")
+		self.assertNotIsInstance(s, BRopeStr)
+		self.assertEqual(s.value, 'a' * 1000 + 'b')
+	
+	def test_long_strings_join_with_ropes(self):
+		n = BRopeStr.threshold
+		s = joined("`a` {}* `b`+".format(n))
+		self.assertIsInstance(s, BRopeStr)
+		self.assertEqual(s.value, 'a' * n + 'b')
+	
+	def test_short_slices_of_ropes_are_plain(self):
+		n = BRopeStr.threshold
+		s = joined("`a` {}* `b`+ 10<".format(n))
+		self.assertIsInstance(s, BStr)
+		self.assertNotIsInstance(s, BRopeStr)
+		self.assertEqual(s.value, 'a' * 10)
+	
+	def test_errors_name_ropes_as_strings(self):
+		n = BRopeStr.threshold
+		s = joined("`a` {}* `b`+".format(n))
+		self.assertIn("'BStr'", str(BTypeError('+', (s,))))
+		self.assertIn("'BStr'", str(BCoercionError(s, s)))
+		self.assertNotIn('BRope', str(BTypeError('+', s)))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import unittest
+
+from birdiescript.scheduler import BScheduler
+
+from . import stack_of
+
+def stack(task):
+	return [repr(x) for x in task.result.stack]
+
+class TestScheduler(unittest.TestCase):
+	
+	def test_blocked_task_is_fed(self):
+		scheduler = BScheduler()
+		reader = scheduler.spawn('>n>n+', stdin=None)
+		other = scheduler.spawn('10U+s')
+		scheduler.run()
+		# The reader is parked without holding up the other task
+		self.assertEqual(reader.state, 'blocked')
+		self.assertEqual(stack(other), ['45'])
+		scheduler.feed(reader, 'ab')
+		scheduler.run()
+		self.assertEqual(reader.state, 'blocked')
+		scheduler.feed(reader, 'c\nd')
+		scheduler.run()
+		self.assertEqual(reader.state, 'blocked')
+		scheduler.feed(reader, 'e', eof=True)
+		scheduler.run()
+		self.assertEqual(stack(reader), ['`abc\nde`'])
+	
+	def test_read_all_waits_for_end_of_input(self):
+		scheduler = BScheduler()
+		task = scheduler.spawn('>i', stdin=None)
+		scheduler.run()
+		scheduler.feed(task, '1 2\n')
+		scheduler.run()
+		self.assertEqual(task.state, 'blocked')
+		scheduler.feed(task, '3', eof=True)
+		scheduler.run()
+		self.assertEqual(stack(task), ['`1 2\n3`'])
+	
+	def test_round_robin(self):
+		scheduler = BScheduler(budget=10)
+		tasks = [scheduler.spawn('0 200{)}*') for _ in range(3)]
+		order = []
+		while scheduler.ready:
+			order.append(scheduler.ready[0])
+			scheduler.step()
+		# Tasks take turns until each is done
+		self.assertEqual(order[:6], tasks + tasks)
+		self.assertEqual(len(set(t.slices for t in tasks)), 1)
+		self.assertTrue(all(stack(t) == ['200'] for t in tasks))
+	
+	def test_short_task_is_not_starved(self):
+		scheduler = BScheduler(budget=10)
+		long = scheduler.spawn('0 5000{)}*')
+		short = scheduler.spawn('1 2+')
+		scheduler.step()
+		scheduler.step()
+		self.assertEqual(long.state, 'ready')
+		self.assertEqual(stack(short), ['3'])
+	
+	def test_sleeping_task_lets_others_run(self):
+		scheduler = BScheduler()
+		sleeper = scheduler.spawn('.05Sp 1')
+		other = scheduler.spawn('2')
+		scheduler.step()
+		self.assertEqual(sleeper.state, 'sleeping')
+		scheduler.run()
+		self.assertLess(other.finished, sleeper.finished)
+		self.assertEqual(stack(sleeper), ['1'])
+	
+	def test_results_match_ordinary_runs(self):
+		sources = ['10U{,*}|+s', '[3 1 2]$', '`abc`-1%', '1{,100<}{2*}W',
+			'[]0[g']
+		scheduler = BScheduler(budget=3)
+		tasks = [scheduler.spawn(source, seed=0) for source in sources]
+		scheduler.run()
+		for (source, task) in zip(sources[:-1], tasks):
+			self.assertEqual(stack(task), stack_of(source, 0), source)
+		# An error stops only the task that raised it
+		self.assertEqual(tasks[-1].state, 'done')
+		self.assertIsInstance(tasks[-1].error, IndexError)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import unittest
+
+from birdiescript import parallel
+
+from . import stack_of
+
+# Sequences, the candidates to search them for in parallel and serially,
+# and predicates
+searches = [
+	('[1 2 3 4]', '\\U', 'U', '{0[g 3=}'),
+	('[1 2 3 4 5 6]', '\\U', 'U', '{,0[g 4=$5[g 2=*}'),
+	('[1 2 3 4 5]', '\\C', 'C', '{[0]+ +s 7=}'),
+	('[1 2 3 4 5]', '2', '2Ch', '{+s 9=}'),
+	('`abcde`', '3', '3Ch', '{`c`=}'),
+	('[1 2 3]', '\\U', 'U', '{0[g 9=}'),
+]
+
+class TestSearch(unittest.TestCase):
+	
+	def setUp(self):
+		# Small chunks, so hits are spread across many of them
+		self.chunk_size = parallel.search_chunk_size
+		parallel.search_chunk_size = 7
+	
+	def tearDown(self):
+		parallel.search_chunk_size = self.chunk_size
+	
+	def test_first_hit_matches_serial_find(self):
+		for (seq, kind, serial, pred) in searches:
+			self.assertEqual(stack_of(seq + kind + pred + 'Psearch'),
+				stack_of(seq + serial + pred + 'F'), seq + kind + pred)
+	
+	def test_all_hits_match_serial_filter(self):
+		for (seq, kind, serial, pred) in searches:
+			self.assertEqual(stack_of(seq + kind + pred + 'Psearchall'),
+				stack_of(seq + serial + pred + '&'), seq + kind + pred)
+	
+	def test_impure_predicate_runs_serially(self):
+		for seed in range(3):
+			self.assertEqual(stack_of('[1 2 3 4]\\U{;Ra .3<}Psearchall 100H',
+				seed), stack_of('[1 2 3 4]U{;Ra .3<}& 100H', seed))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import unittest
+
+from birdiescript import server
+
+@unittest.skipIf(server.resource is None, 'needs resource limits')
+class TestServer(unittest.TestCase):
+	
+	def test_request(self):
+		limits = server.BLimits()
+		response = server.handle_request({'script': '1 2+'}, 'utf-8', limits)
+		self.assertEqual(response, {'stdout': '3\n', 'status': 0})
+		self.assertFalse(limits.exceeded)
+	
+	def test_memory_limit(self):
+		limits = server.BLimits(memory=64)
+		limits.install()
+		response = server.handle_request({'script': '[0] 100000000*'},
+			'utf-8', limits)
+		self.assertEqual(response, {'stdout': 'Error: memory limit exceeded\n',
+			'status': 1})
+		self.assertTrue(limits.exceeded)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import unittest
+
+from birdiescript.core import BStream
+
+from . import stack_of, BScript
+
+class TestLazyStreams(unittest.TestCase):
+	
+	def test_unfold_is_lazy(self):
+		result = BScript('1\\{5<}\\{)}/').run()
+		self.assertIsInstance(result.stack[-1], BStream)
+		self.assertEqual(stack_of('1\\{5<}\\{)}/'), ['[1 2 3 4]'])
+	
+	def test_shared_scope_unfold_is_eager(self):
+		# Its blocks are left with the arguments they last saw
+		self.assertEqual(stack_of('1{5<}{)}/ _w'), ['[1 2 3 4]', '5'])
+	
+	def test_infinite_pipeline(self):
+		self.assertEqual(stack_of('1{)}Itr {,*}| {2%}& 5<'),
+			['[1 9 25 49 81]'])
+	
+	def test_unspool_reaching_below(self):
+		self.assertEqual(stack_of('7 1{5<}{+}/'), ['[1]'])
+	
+	def test_unspool_leaving_extra_values(self):
+		self.assertEqual(stack_of('1{5<}{,)}/'),
+			['1', '2', '3', '4', '[1 2 3 4]'])
+	
+	def test_predicate_leaving_extra_values(self):
+		self.assertEqual(stack_of('1{0}{)}/'), ['1', '[]'])
+	
+	def test_map_reaching_below(self):
+		self.assertEqual(stack_of('5 1{5<}{)}/ {+}|'), ['15', '[]'])
+	
+	def test_filter_reaching_below(self):
+		self.assertEqual(stack_of('5 1{5<}{)}/ {+}&'), ['[1 2 3 4]'])
+	
+	def test_drop_while_reaching_below(self):
+		self.assertEqual(stack_of('5 1{5<}{)}/ {+2%}>'), ['[1 2 3 4]'])
+	
+	def test_later_items_cannot_reach_below(self):
+		with self.assertRaises(TypeError):
+			stack_of('5 1{)}Itr {,3<{}{;+}I}& 5<')
+	
+	def test_cycle_changed_in_place(self):
+		# The stream keeps the items the list had when it was made
+		self.assertEqual(stack_of('[1 2 3]:A; ACy A(;; 5<'),
+			['[1 2 3 1 2]'])
+	
+	def test_repeated_copies(self):
+		for source in ['[1 2]Rpt 3<', '[[1 2]]Cy 3<']:
+			items = BScript(source).run().stack[-1].value
+			self.assertEqual(len(set(map(id, items))), 3, source)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import sys
+import unittest
+
+from birdiescript.core import BInt, BList, BStr
+from birdiescript.bench import string_cases, code_points
+
+from . import BScript
+
+# Strings to run each case on; narrow builds split astral characters in two
+texts = ['hello world', '', 'aAbB']
+if sys.maxunicode > 0xFFFF:
+	texts.append('a\U0001F600b')
+
+# Cases beyond the benchmarked ones, which index from the end or overflow
+cases = string_cases + [
+	('Each', '{)}%', []),
+	('Get negative', '1m[g', []),
+	('Get outside', '99[g', []),
+]
+
+def as_string(x):
+	"""Convert a list of code points to a string, and leave others alone."""
+	if isinstance(x, BList) and all(isinstance(v, BInt) for v in x.value):
+		return x.convert(BStr())
+	return x
+
+def outcome(script, stack):
+	"""Run a script and return what it leaves, or the error it raises."""
+	try:
+		result = script.run(stack=stack)
+	except Exception as e:
+		return (type(e).__name__, str(e))
+	return [repr(as_string(x)) for x in result.stack]
+
+class TestStrings(unittest.TestCase):
+
+	def test_cases_match_code_points(self):
+		for text in texts:
+			for (name, source, args) in cases:
+				script = BScript(source)
+				self.assertEqual(
+					outcome(script, [BStr(text)] + [BStr(a) for a in args]),
+					outcome(script, [code_points(text)] +
+						[code_points(a) for a in args]),
+					'{} on {!r}'.format(name, text))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import unittest
+
+from birdiescript.core import BTypeError
+
+from . import stack_of
+
+class TestThreads(unittest.TestCase):
+	
+	def test_join_order(self):
+		# The threads that started first finish last, but join in order
+		self.assertEqual(stack_of('[3 1 2]{{,.05*Sp 10*}Spawn}|Tj'),
+			['[30 10 20]'])
+	
+	def test_shared_variables(self):
+		self.assertEqual(stack_of('5{:X; [3 2 1]{X*}|}Spawn Tj'),
+			['[15 10 5]'])
+	
+	def test_error_raised_on_join(self):
+		# The error waits for the join, whenever the thread finishes
+		(thread, after) = stack_of('1{;1Tj}Spawn 2')
+		self.assertIn(thread, ['<thread>', '<thread done>'])
+		self.assertEqual(after, '2')
+		with self.assertRaises(BTypeError):
+			stack_of('1{;1Tj}Spawn Tj')
+		with self.assertRaises(BTypeError):
+			stack_of('[1 2]{{1Tj}Spawn}|Tj')
+	
+	def test_exit_in_thread(self):
+		self.assertEqual(stack_of('1{Ex}Spawn .1Sp; 7'), ['7'])
+		self.assertEqual(stack_of('1{{Ex}Spawn Tj 4}Spawn Tj 7'),
+			['1', '4', '7'])
+	
+	def test_channels(self):
+		# Receiving waits for a value to be sent
+		self.assertEqual(stack_of('Chan:C; 1{.1Sp C$Send}Spawn; C Recv'),
+			['1'])
+		self.assertEqual(stack_of(
+			'Chan:C; 1{;[1 2 3]{C$Send}-}Spawn Tj C Recv C Recv C Recv'),
+			['1', '2', '3'])
+	
+	def test_sent_closures(self):
+		# Blocks keep the scope they were made in when sent
+		self.assertEqual(stack_of('Chan:C; 3\\{:B;{B}}X C$Send '
+			'7\\{:B;{B}}X C$Send C Recv X C Recv X'), ['3', '7'])
+	
+	def test_equality(self):
+		self.assertEqual(stack_of('Chan,='), ['1'])
+		self.assertEqual(stack_of('Chan Chan='), ['0'])
+		self.assertEqual(stack_of('1{1+}Spawn:T; T T='), ['1'])
+	
+	def test_lock(self):
+		self.assertEqual(stack_of('0:N; 8U{{;100{{N1+:N;}Lk}*}Spawn}|Tj; N'),
+			['800'])
+		self.assertEqual(stack_of('1{{2}Lk}Lk'), ['1', '2'])
+
+if __name__ == '__main__':
+	unittest.main()
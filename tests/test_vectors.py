@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import unittest
+
+from birdiescript.core import BVector
+
+from . import stack_of, BScript
+
+# Lists of integers and floats which are packed
+vectors = ['10U', '5D', '3 9Ui', '10U{2*}|', '10U{2.5*}|', '[1.5 2.5 .5]{1m*}|']
+
+# Arithmetic, statistics and reads on them
+reads = ['', '+s', '*s', 'M', 'N', 'Mn', 'Mi', 'Vr', 'Vd', ',+v', ',*v', ',-v',
+	'{1+}|', '{.5*}|+s', '3%', '2m%', '3<', '3>', '#', '2#n', '[1 1m 2]Ss',
+	',+', '3U<', '3U>', ',=', '(', ')', '0[g']
+
+# Results which overflow 64 bits
+overflows = ['10U{9223372036854775807*}|', '10U{9223372036854775807*}|+s',
+	'[9223372036854775807 1]+s', '20U{1+}|*s', '3U{9223372036854775807+}|,+v']
+
+def boxed(source):
+	"""Run a script with lists of numbers boxed, as they were before."""
+	BVector.enabled = False
+	try:
+		return stack_of(source)
+	finally:
+		BVector.enabled = True
+
+class TestVectors(unittest.TestCase):
+
+	def test_vectors_are_packed(self):
+		for source in vectors:
+			result = BScript(source).run()
+			self.assertIsInstance(result.stack[-1], BVector, source)
+			self.assertIsNotNone(result.stack[-1].packed, source)
+
+	def test_reads_match_boxed_lists(self):
+		for vector in vectors:
+			for read in reads:
+				source = vector + ' ' + read
+				self.assertEqual(stack_of(source), boxed(source), source)
+
+	def test_overflows_match_boxed_lists(self):
+		for source in overflows:
+			self.assertEqual(stack_of(source), boxed(source), source)
+		self.assertEqual(stack_of('[9223372036854775807 1]+s'),
+			stack_of('9223372036854775808'))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, generators, nested_scopes,
+	print_function, unicode_literals, with_statement)
+
+import types
+import unittest
+
+from birdiescript.core import BInt, BList, BVector, BRopeStr, builtins
+from birdiescript import fusion, linalg, verify
+
+class TestVerify(unittest.TestCase):
+	
+	def test_agreement(self):
+		for script in ['1 2+', '10{,*}|{3%}&+s', '[[1 2][3 4]],*m',
+			'1{5<}{)}/ {2*}|', '5U{)}%', '`ab` 150000*`c`+ 10>']:
+			self.assertIsNone(verify.verify_script(script))
+	
+	def test_reference_mode_switches_off_fast_paths(self):
+		with verify.BReferenceMode():
+			self.assertFalse(fusion.enabled)
+			self.assertFalse(BVector.enabled)
+			self.assertFalse(BRopeStr.enabled)
+			self.assertFalse(builtins['+'].specialized)
+			self.assertFalse(BList.caching)
+		self.assertTrue(fusion.enabled)
+		self.assertTrue(BVector.enabled)
+		self.assertTrue(BRopeStr.enabled)
+		self.assertTrue(builtins['+'].specialized)
+		self.assertTrue(BList.caching)
+	
+	def test_catches_broken_native_builtin(self):
+		dot_of = linalg.dot_of
+		linalg.dot_of = lambda a, b: BInt(0)
+		try:
+			divergence = verify.verify_script('[1 2][3 4]*d')
+		finally:
+			linalg.dot_of = dot_of
+		self.assertIsNotNone(divergence)
+		self.assertEqual(divergence.field, 'stack')
+	
+	def test_catches_broken_fusion(self):
+		fold = fusion.fold
+		fusion.fold = lambda f, xs, isolation: [BInt(0)]
+		try:
+			divergence = verify.verify_script('10{,*}|{3%}&+s')
+		finally:
+			fusion.fold = fold
+		self.assertIsNotNone(divergence)
+	
+	def test_catches_broken_specialization(self):
+		add = builtins['+']
+		specialization = add.specializations[(BInt, BInt)]
+		add.specializations[(BInt, BInt)] = types.MethodType(
+			lambda self, context, looping=False: context.push(BInt(0)), add)
+		try:
+			divergence = verify.verify_script('1 2+')
+		finally:
+			add.specializations[(BInt, BInt)] = specialization
+		self.assertIsNotNone(divergence)
+		self.assertEqual(divergence.field, 'stack')
+
+if __name__ == '__main__':
+	unittest.main()